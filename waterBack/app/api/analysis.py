@@ -1,17 +1,44 @@
-from fastapi import APIRouter, HTTPException, Path
-from fastapi.responses import FileResponse, JSONResponse
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Path, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from typing import Optional
 from datetime import datetime
 
+from app.config import settings
 from app.models.responses import AnalysisStatus, AnalysisResult, AnalysisPreview, ApiError
 from app.utils.validation import validate_analysis_id
 from app.utils.logger import log_debug, log_error, log_info
 from app.services.workflow_manager import workflow_manager
 from app.services.report_generator import report_generator
 from app.services.report_cleanup import cleanup_service
+from app.services.job_scheduler import job_scheduler
+from app.services.knowledge_base import knowledge_base
+from app.services.report_storage import report_storage
+from app.services.html_preview import build_html_body, preview_cache
+from app.utils.http_cache import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, cached_body_response, digest_matches
+from app.utils.file_transfer import (
+    FileRangeResponse, RangeNotSatisfiable, content_range, if_range_matches, offload_headers, parse_range
+)
+from app.utils.single_flight import SingleFlight
 
 router = APIRouter()
 
+# Concurrent downloads of the same analysis share a single on-demand render
+report_renders = SingleFlight()
+
+async def _render_report_on_demand(analysis_id: str, session):
+    """Render the PDF for a completed analysis (lazy mode)"""
+    log_info(f"Rendering PDF on demand for {analysis_id}", "ANALYSIS_API")
+    appendix_pdf = await knowledge_base.get_pdf_pages()
+    
+    async with job_scheduler.stage_slot("render"):
+        stored = await report_generator.generate_pdf_report(analysis_id, session.context, session.result, appendix_pdf=appendix_pdf)
+    
+    cleanup_service.schedule_report(analysis_id, stored.created_at)
+    session.context.metadata["reportRendered"] = True
+    await workflow_manager.update_context(analysis_id, session.context)
+
 @router.get("/status/{analysis_id}", response_model=AnalysisStatus)
 async def get_analysis_status(
     analysis_id: str = Path(..., description="Analysis ID")
@@ -28,7 +55,7 @@ async def get_analysis_status(
             )
         
         # Get status from workflow manager
-        status = workflow_manager.get_analysis_status(analysis_id)
+        status = await workflow_manager.get_analysis_status(analysis_id)
         
         if not status:
             raise HTTPException(
@@ -36,6 +63,14 @@ async def get_analysis_status(
                 detail="Analysis not found"
             )
         
+        # Add queue position and ETA while the job is scheduled
+        job_info = job_scheduler.get_job_info(analysis_id)
+        if job_info:
+            status.queuePosition = job_info["queuePosition"]
+            status.etaSeconds = job_info["etaSeconds"]
+            if job_info["state"] == "queued":
+                status.message = f"W kolejce (pozycja {job_info['queuePosition']})"
+        
         log_debug(f"Status requested for {analysis_id}: {status.status}", "ANALYSIS_API")
         return status
         
@@ -64,7 +99,7 @@ async def get_analysis_result(
             )
         
         # Get session
-        session = workflow_manager.get_session(analysis_id)
+        session = await workflow_manager.get_session(analysis_id)
         
         if not session:
             raise HTTPException(
@@ -78,16 +113,16 @@ async def get_analysis_result(
                 detail=f"Analysis not completed. Current status: {session.status}"
             )
         
-        # Check if report exists and is not expired
-        report_status = cleanup_service.get_report_status(analysis_id)
+        # Check if report exists and is not expired (lazy reports are rendered on download)
+        report_status = await cleanup_service.get_report_status(analysis_id)
         
-        if not report_status["exists"]:
+        if not report_status["exists"] and not report_status["render_on_demand"]:
             raise HTTPException(
                 status_code=404,
                 detail="Analysis report not found or expired"
             )
         
-        if report_status["expired"]:
+        if report_status["exists"] and report_status["expired"]:
             raise HTTPException(
                 status_code=410,
                 detail=f"Analysis report expired (available for 10 minutes only). Age: {report_status['age_minutes']:.1f} minutes"
@@ -99,7 +134,7 @@ async def get_analysis_result(
         result = AnalysisResult(
             id=analysis_id,
             originalFilename=session.context.originalFilename,
-            analysisMarkdown=session.result,
+            analysisMarkdown=knowledge_base.compose_markdown(session.result),
             analysisDate=datetime.now(),
             processingTime=processing_time,
             pdfUrl=f"/api/download/{analysis_id}",
@@ -134,7 +169,7 @@ async def get_analysis_preview(
             )
         
         # Get session
-        session = workflow_manager.get_session(analysis_id)
+        session = await workflow_manager.get_session(analysis_id)
         
         if not session:
             raise HTTPException(
@@ -153,12 +188,14 @@ async def get_analysis_preview(
         
         preview = AnalysisPreview(
             id=analysis_id,
-            markdown=session.result,
+            markdown=knowledge_base.compose_markdown(session.result),
             metadata={
                 "originalFilename": session.context.originalFilename,
                 "analysisDate": datetime.now().isoformat(),
                 "processingTime": processing_time
-            }
+            },
+            htmlUrl=f"/api/preview/{analysis_id}/html",
+            knowledgeBaseUrl=knowledge_base.html_url
         )
         
         log_info(f"Analysis preview retrieved for {analysis_id}", "ANALYSIS_API")
@@ -173,12 +210,85 @@ async def get_analysis_preview(
             detail="Failed to get analysis preview"
         )
 
-@router.get("/download/{analysis_id}")
+@router.get("/preview/{analysis_id}/html")
+async def get_analysis_preview_html(
+    request: Request,
+    analysis_id: str = Path(..., description="Analysis ID")
+):
+    """
+    Get analysis preview as sanitised HTML (without the knowledge base, see Link header).
+    Rendered once per analysis, served with a strong ETag and brotli/gzip encoding.
+    """
+    try:
+        # Validate analysis ID
+        if not validate_analysis_id(analysis_id):
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid analysis ID format"
+            )
+        
+        # Get session
+        session = await workflow_manager.get_session(analysis_id)
+        
+        if not session:
+            preview_cache.discard(analysis_id)
+            raise HTTPException(
+                status_code=404,
+                detail="Analysis not found"
+            )
+        
+        if session.status != "completed":
+            raise HTTPException(
+                status_code=400,
+                detail=f"Analysis not completed. Current status: {session.status}"
+            )
+        
+        body = preview_cache.get(analysis_id)
+        if body is None:
+            body = await asyncio.to_thread(build_html_body, session.result)
+            preview_cache.put(analysis_id, body)
+        
+        headers = {}
+        if knowledge_base.html_url:
+            headers["Link"] = f'<{knowledge_base.html_url}>; rel="related"'
+        
+        return cached_body_response(request, body, REVALIDATE_CACHE_CONTROL, headers)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        log_error(f"Get HTML preview failed for {analysis_id}: {str(e)}", "ANALYSIS_API")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to get analysis preview"
+        )
+
+@router.get("/knowledge-base/{version}.html")
+async def get_knowledge_base_html(
+    request: Request,
+    version: str = Path(..., description="Knowledge base content hash")
+):
+    """
+    Get knowledge base section as sanitised HTML.
+    The URL changes with the content, so responses are cacheable forever.
+    """
+    body = await knowledge_base.get_html()
+    
+    if body is None or version != body.digest:
+        raise HTTPException(
+            status_code=404,
+            detail="Knowledge base version not found"
+        )
+    
+    return cached_body_response(request, body, IMMUTABLE_CACHE_CONTROL)
+
+@router.api_route("/download/{analysis_id}", methods=["GET", "HEAD"])
 async def download_analysis_pdf(
+    request: Request,
     analysis_id: str = Path(..., description="Analysis ID")
 ):
     """
-    Download analysis PDF report
+    Download analysis PDF report (supports Range, If-Range and If-None-Match)
     """
     try:
         # Validate analysis ID
@@ -188,8 +298,14 @@ async def download_analysis_pdf(
                 detail="Invalid analysis ID format"
             )
         
+        session = await workflow_manager.get_session(analysis_id)
+        
         # Check if report exists and is not expired
-        report_status = cleanup_service.get_report_status(analysis_id)
+        report_status = await cleanup_service.get_report_status(analysis_id)
+        
+        if report_status["render_on_demand"]:
+            await report_renders.do(analysis_id, _render_report_on_demand, analysis_id, session)
+            report_status = await cleanup_service.get_report_status(analysis_id)
         
         if not report_status["exists"]:
             raise HTTPException(
@@ -203,28 +319,68 @@ async def download_analysis_pdf(
                 detail=f"Analysis report expired (available for 10 minutes only). Age: {report_status['age_minutes']:.1f} minutes"
             )
         
-        # Get report path
-        report_path = report_generator.get_report_path(analysis_id)
-        
         # Get original filename for download
-        session = workflow_manager.get_session(analysis_id)
         original_filename = "water_analysis_report.pdf"
         
         if session and session.context:
             original_filename = f"analiza_{session.context.originalFilename.replace('.pdf', '')}.pdf"
         
-        # Mark as downloaded for faster cleanup
-        cleanup_service.mark_report_downloaded(analysis_id)
+        report = await asyncio.to_thread(report_storage.stat, analysis_id)
+        if report is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Analysis report not found or expired"
+            )
         
-        log_info(f"PDF download started for {analysis_id} (marked as downloaded)", "ANALYSIS_API")
+        # Strong ETag from the content hash (computed at save, hashed once after a restart)
+        digest = report.digest or await asyncio.to_thread(report_storage.digest, analysis_id)
+        etag = f'"{digest}"'
+        headers = {
+            "Content-Disposition": f"attachment; filename={original_filename}",
+            "ETag": etag,
+            "Accept-Ranges": "bytes",
+            "Cache-Control": REVALIDATE_CACHE_CONTROL
+        }
         
-        return FileResponse(
-            path=report_path,
-            filename=original_filename,
+        if digest_matches(request.headers.get("if-none-match"), digest):
+            return Response(status_code=304, headers=headers)
+        
+        if request.method == "GET":
+            # Mark as downloaded for faster cleanup (every resumed range refreshes it)
+            cleanup_service.mark_report_downloaded(analysis_id)
+        
+        offload = report.path and offload_headers(
+            settings.DOWNLOAD_OFFLOAD, report.path, settings.REPORTS_FOLDER, settings.DOWNLOAD_OFFLOAD_PREFIX
+        )
+        if offload:
+            # The fronting proxy sends the file (and handles ranges) itself
+            log_info(f"PDF download for {analysis_id} offloaded to proxy", "ANALYSIS_API")
+            return Response(media_type="application/pdf", headers={**headers, **offload})
+        
+        try:
+            byte_range = None
+            if if_range_matches(request.headers.get("if-range"), etag):
+                byte_range = parse_range(request.headers.get("range"), report.size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{report.size}"})
+        
+        start, end = byte_range or (0, report.size)
+        status_code = 206 if byte_range else 200
+        if byte_range:
+            headers["Content-Range"] = content_range(start, end, report.size)
+        
+        log_info(f"PDF download started for {analysis_id} (bytes {start}-{end - 1}/{report.size})", "ANALYSIS_API")
+        
+        if report.path:
+            return FileRangeResponse(report.path, start, end, status_code, headers, "application/pdf")
+        
+        # Memory backend: stream straight from the store, no temp file
+        headers["Content-Length"] = str(end - start)
+        return StreamingResponse(
+            report_storage.iter_range(analysis_id, start, end),
+            status_code=status_code,
             media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={original_filename}"
-            }
+            headers=headers
         )
         
     except HTTPException:
@@ -252,7 +408,7 @@ async def get_report_status(
             )
         
         # Get report status
-        report_status = cleanup_service.get_report_status(analysis_id)
+        report_status = await cleanup_service.get_report_status(analysis_id)
         
         return {
             "analysisId": analysis_id,
@@ -260,6 +416,7 @@ async def get_report_status(
             "expired": report_status["expired"],
             "ageMinutes": report_status.get("age_minutes", 0),
             "downloaded": report_status.get("downloaded", False),
+            "renderOnDemand": report_status["render_on_demand"],
             "expiresIn": max(0, 10 - report_status.get("age_minutes", 0)) if report_status["exists"] else 0
         }
         
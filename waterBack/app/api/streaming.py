@@ -1,22 +1,56 @@
 import asyncio
 import json
-from fastapi import APIRouter, HTTPException, Path
+from fastapi import APIRouter, Header, HTTPException, Path, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
-from typing import Optional
+from typing import Dict, List, Optional
 
+from app.config import settings
 from app.utils.validation import validate_analysis_id
 from app.utils.logger import log_debug, log_error, log_info
 from app.services.workflow_manager import workflow_manager
+from app.services.event_bus import Subscription, encode_sse
 from app.models.responses import AnalysisWorkflow
 
 router = APIRouter()
 
+HEARTBEAT = b": heartbeat\n\n"
+
+def _format_event(data: dict, event_id: Optional[int] = None) -> bytes:
+    return encode_sse(json.dumps(data), event_id)
+
+def _is_final(update: AnalysisWorkflow) -> bool:
+    return update.status == "error" or (update.step == "complete" and update.status == "completed")
+
+async def _status_event(analysis_id: str) -> Optional[dict]:
+    """Synthetic event with the current status, sent when there is nothing to replay"""
+    current_status = await workflow_manager.get_analysis_status(analysis_id)
+    if not current_status:
+        return None
+    return {
+        "step": "status",
+        "status": current_status.status,
+        "message": f"Aktualny status: {current_status.status}",
+        "progress": current_status.progress,
+        "elapsedTime": 0
+    }
+
+def _final_event(session) -> dict:
+    return {
+        "step": "complete" if session.status == "completed" else "error",
+        "status": session.status,
+        "message": "Analiza zakończona" if session.status == "completed" else session.error,
+        "progress": 100 if session.status == "completed" else session.progress,
+        "elapsedTime": 0
+    }
+
 @router.get("/stream/{analysis_id}")
 async def stream_analysis_progress(
-    analysis_id: str = Path(..., description="Analysis ID")
+    analysis_id: str = Path(..., description="Analysis ID"),
+    last_event_id: Optional[str] = Header(None, description="ID of the last event received (sent by EventSource on reconnect)")
 ):
     """
-    Stream analysis progress using Server-Sent Events (SSE)
+    Stream analysis progress using Server-Sent Events (SSE).
+    With Last-Event-ID only the missed updates are replayed.
     """
     try:
         # Validate analysis ID
@@ -27,74 +61,79 @@ async def stream_analysis_progress(
             )
         
         # Check if analysis exists
-        session = workflow_manager.get_session(analysis_id)
+        session = await workflow_manager.get_session(analysis_id)
         if not session:
             raise HTTPException(
                 status_code=404,
                 detail="Analysis not found"
             )
         
+        resume_from = int(last_event_id) if last_event_id and last_event_id.strip().isdigit() else None
+        
         log_info(f"SSE stream started for {analysis_id}", "STREAMING_API")
         
         # Create SSE generator
         async def event_generator():
-            """Generate SSE events for analysis progress"""
-            
-            # Buffer to store events for this client
-            event_buffer = []
-            
-            # Callback function to receive workflow updates
-            def workflow_callback(update: AnalysisWorkflow):
-                event_data = {
-                    "step": update.step,
-                    "status": update.status,
-                    "message": update.message,
-                    "progress": update.progress,
-                    "elapsedTime": update.elapsedTime
-                }
-                event_buffer.append(event_data)
-            
-            # Register callback
-            workflow_manager.register_sse_callback(analysis_id, workflow_callback)
+            """Generate SSE events for analysis progress (pushed by the workflow manager)"""
+            # Subscribe before reading the status so no update is missed in between
+            subscription = workflow_manager.subscribe(analysis_id)
             
             try:
-                # Send initial status
-                current_status = workflow_manager.get_analysis_status(analysis_id)
-                if current_status:
-                    initial_data = {
-                        "step": "status",
-                        "status": current_status.status,
-                        "message": f"Aktualny status: {current_status.status}",
-                        "progress": current_status.progress,
-                        "elapsedTime": 0
-                    }
+                replayed = None
+                if resume_from is not None:
+                    replayed = workflow_manager.replay_events(analysis_id, resume_from)
+                
+                if replayed is not None:
+                    # Reconnect: send only the updates the client missed
+                    log_debug(f"Resuming SSE for {analysis_id} after event {resume_from} ({len(replayed)} missed)", "STREAMING_API")
+                    last_sent = resume_from
+                    for event in replayed:
+                        yield event.frame
+                        last_sent = event.event_id
+                        if _is_final(event.data):
+                            return
+                    
+                    # The final update was already delivered before the reconnect
+                    session = await workflow_manager.get_session(analysis_id)
+                    if session and session.status in ['completed', 'error']:
+                        return
+                else:
+                    # Send initial status, tagged with the latest event ID to resume from
+                    last_sent = workflow_manager.latest_event_id(analysis_id)
+                    initial_data = await _status_event(analysis_id)
+                    if initial_data:
+                        yield _format_event(initial_data, last_sent or None)
                     
-                    yield f"data: {json.dumps(initial_data)}\n\n"
+                    # Already finished: send the final event right away
+                    session = await workflow_manager.get_session(analysis_id)
+                    if session and session.status in ['completed', 'error']:
+                        yield _format_event(_final_event(session), last_sent or None)
+                        return
                 
-                # Stream updates
+                # Stream updates as they are published
                 while True:
-                    # Send buffered events
-                    while event_buffer:
-                        event_data = event_buffer.pop(0)
-                        yield f"data: {json.dumps(event_data)}\n\n"
+                    event = await subscription.next(settings.SSE_HEARTBEAT_SECONDS)
                     
-                    # Check if analysis is complete or error
-                    session = workflow_manager.get_session(analysis_id)
-                    if session and session.status in ['completed', 'error']:
-                        # Send final event and break
-                        final_data = {
-                            "step": "complete" if session.status == "completed" else "error",
-                            "status": session.status,
-                            "message": "Analiza zakończona" if session.status == "completed" else session.error,
-                            "progress": 100 if session.status == "completed" else session.progress,
-                            "elapsedTime": 0
-                        }
-                        
-                        yield f"data: {json.dumps(final_data)}\n\n"
-                        break
+                    if event is None:
+                        session = await workflow_manager.get_session(analysis_id)
+                        if session is None:
+                            break
+                        # Finished by another worker sharing the session store
+                        if session.status in ['completed', 'error']:
+                            yield _format_event(_final_event(session), last_sent or None)
+                            break
+                        # Comment line keeps proxies from closing an idle stream
+                        yield HEARTBEAT
+                        continue
+                    
+                    if event.event_id <= last_sent:
+                        continue
+                    last_sent = event.event_id
                     
-                    # Wait before next check
-                    await asyncio.sleep(1)
+                    yield event.frame
+                    
+                    if _is_final(event.data):
+                        break
                     
             except asyncio.CancelledError:
                 log_debug(f"SSE stream cancelled for {analysis_id}", "STREAMING_API")
@@ -108,10 +147,10 @@ async def stream_analysis_progress(
                     "progress": 0,
                     "elapsedTime": 0
                 }
-                yield f"data: {json.dumps(error_data)}\n\n"
+                yield _format_event(error_data)
             finally:
-                # Unregister callback
-                workflow_manager.unregister_sse_callback(analysis_id)
+                # Only this client's subscription is removed
+                workflow_manager.unsubscribe(subscription)
                 log_debug(f"SSE stream ended for {analysis_id}", "STREAMING_API")
         
         # Return SSE response
@@ -133,4 +172,180 @@ async def stream_analysis_progress(
         raise HTTPException(
             status_code=500,
             detail="Failed to setup progress stream"
-        ) 
\ No newline at end of file
+        ) 
+
+def _ws_item(analysis_id: str, payload_json: str) -> str:
+    # Payloads are already serialised, only the envelope is added
+    return f'{{"analysisId":{json.dumps(analysis_id)},"event":{payload_json}}}'
+
+class _AnalysisWatcher:
+    """Subscriptions of one WebSocket connection, drained together into batched frames"""
+    
+    def __init__(self):
+        self.wakeup = asyncio.Event()
+        self.subscriptions: Dict[str, Subscription] = {}
+        self.last_sent: Dict[str, int] = {}
+        self.control: List[str] = []
+        self.items: List[str] = []
+    
+    async def subscribe(self, analysis_id: str, last_event_id: Optional[int]) -> Optional[str]:
+        """Start watching an analysis, returns the rejection reason if it cannot be watched"""
+        if not validate_analysis_id(analysis_id):
+            return "invalid_id"
+        if analysis_id in self.subscriptions:
+            return None
+        session = await workflow_manager.get_session(analysis_id)
+        if not session:
+            return "not_found"
+        if len(self.subscriptions) >= settings.WS_MAX_SUBSCRIPTIONS:
+            return "too_many_subscriptions"
+        
+        # Same event source and replay rules as the SSE stream
+        subscription = workflow_manager.subscribe(analysis_id, wakeup=self.wakeup)
+        replayed = workflow_manager.replay_events(analysis_id, last_event_id) if last_event_id is not None else None
+        
+        finished = False
+        if replayed is not None:
+            last_sent = last_event_id
+            for event in replayed:
+                self.items.append(_ws_item(analysis_id, event.payload_json))
+                last_sent = event.event_id
+                finished = finished or _is_final(event.data)
+            finished = finished or session.status in ['completed', 'error']
+        else:
+            last_sent = workflow_manager.latest_event_id(analysis_id)
+            status_data = await _status_event(analysis_id)
+            if status_data:
+                self.items.append(_ws_item(analysis_id, json.dumps({**status_data, "eventId": last_sent or None})))
+            if session.status in ['completed', 'error']:
+                self.items.append(_ws_item(analysis_id, json.dumps({**_final_event(session), "eventId": last_sent or None})))
+                finished = True
+        
+        if finished:
+            # Nothing more will be published for this analysis
+            workflow_manager.unsubscribe(subscription)
+        else:
+            self.subscriptions[analysis_id] = subscription
+            self.last_sent[analysis_id] = last_sent
+        return None
+    
+    def unsubscribe(self, analysis_id: str):
+        subscription = self.subscriptions.pop(analysis_id, None)
+        self.last_sent.pop(analysis_id, None)
+        if subscription:
+            workflow_manager.unsubscribe(subscription)
+    
+    def send_control(self, message: dict):
+        self.control.append(json.dumps(message))
+        self.wakeup.set()
+    
+    def drain(self) -> List[str]:
+        """Frames to send: control messages, then one batch with every pending update"""
+        frames, self.control = self.control, []
+        items, self.items = self.items, []
+        
+        for analysis_id, subscription in list(self.subscriptions.items()):
+            for event in subscription.drain():
+                if event.event_id <= self.last_sent[analysis_id]:
+                    continue
+                self.last_sent[analysis_id] = event.event_id
+                items.append(_ws_item(analysis_id, event.payload_json))
+                if _is_final(event.data):
+                    self.unsubscribe(analysis_id)
+                    break
+        
+        if items:
+            frames.append('{"type":"updates","events":[' + ",".join(items) + "]}")
+        return frames
+    
+    async def finish_stale(self) -> bool:
+        """Final events for watched analyses finished or removed by another worker sharing the session store"""
+        finished = False
+        for analysis_id, subscription in list(self.subscriptions.items()):
+            if subscription.pending:
+                continue
+            session = await workflow_manager.get_session(analysis_id)
+            if session is not None and session.status not in ['completed', 'error']:
+                continue
+            if session is not None:
+                self.items.append(_ws_item(analysis_id, json.dumps(_final_event(session))))
+            self.unsubscribe(analysis_id)
+            finished = True
+        return finished
+    
+    def close(self):
+        for analysis_id in list(self.subscriptions):
+            self.unsubscribe(analysis_id)
+
+@router.websocket("/ws/analyses")
+async def watch_analyses(websocket: WebSocket):
+    """
+    Watch many analyses over one WebSocket.
+    Client messages: {"action": "subscribe", "analysisIds": [...], "lastEventIds": {id: n}} and
+    {"action": "unsubscribe", "analysisIds": [...]}. Server frames: "subscribed"/"unsubscribed"
+    acknowledgements, batched {"type": "updates", "events": [{"analysisId", "event"}]},
+    "heartbeat" and "error".
+    """
+    await websocket.accept()
+    watcher = _AnalysisWatcher()
+    log_info("Analysis watch WebSocket connected", "STREAMING_API")
+    
+    async def send_frames():
+        while True:
+            try:
+                async with asyncio.timeout(settings.SSE_HEARTBEAT_SECONDS):
+                    await watcher.wakeup.wait()
+            except TimeoutError:
+                if await watcher.finish_stale():
+                    watcher.wakeup.set()
+                else:
+                    await websocket.send_text('{"type":"heartbeat"}')
+                continue
+            
+            # Let a burst of updates land in the same frame
+            await asyncio.sleep(settings.WS_BATCH_MS / 1000)
+            watcher.wakeup.clear()
+            for frame in watcher.drain():
+                await websocket.send_text(frame)
+    
+    sender = asyncio.create_task(send_frames())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                action = message.get("action")
+                analysis_ids = message.get("analysisIds") or []
+                if not isinstance(analysis_ids, list) or not all(isinstance(value, str) for value in analysis_ids):
+                    raise ValueError("analysisIds must be a list of strings")
+            except (ValueError, AttributeError) as e:
+                watcher.send_control({"type": "error", "message": f"Invalid message: {str(e)}"})
+                continue
+            
+            if action == "subscribe":
+                last_event_ids = message.get("lastEventIds") or {}
+                accepted, rejected = [], {}
+                for analysis_id in analysis_ids:
+                    last_event_id = last_event_ids.get(analysis_id) if isinstance(last_event_ids, dict) else None
+                    reason = await watcher.subscribe(analysis_id, last_event_id if isinstance(last_event_id, int) else None)
+                    if reason:
+                        rejected[analysis_id] = reason
+                    else:
+                        accepted.append(analysis_id)
+                watcher.send_control({"type": "subscribed", "analysisIds": accepted, "rejected": rejected})
+            elif action == "unsubscribe":
+                for analysis_id in analysis_ids:
+                    watcher.unsubscribe(analysis_id)
+                watcher.send_control({"type": "unsubscribed", "analysisIds": analysis_ids})
+            else:
+                watcher.send_control({"type": "error", "message": f"Unknown action: {action}"})
+            
+            log_debug(f"Analysis watch WebSocket: {action} {len(analysis_ids)} IDs ({len(watcher.subscriptions)} watched)", "STREAMING_API")
+    
+    except WebSocketDisconnect:
+        log_debug("Analysis watch WebSocket disconnected", "STREAMING_API")
+    except Exception as e:
+        log_error(f"Analysis watch WebSocket error: {str(e)}", "STREAMING_API")
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+        watcher.close()
@@ -1,32 +1,120 @@
+import os
 import uuid
 import asyncio
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException
 from fastapi.responses import JSONResponse
-from typing import Optional
+from typing import Any, Dict, Optional, Set
 from datetime import datetime
 
+from app.config import settings
 from app.models.responses import PDFUploadResponse, ApiError
-from app.models.water_data import AnalysisContext
+from app.models.water_data import AnalysisContext, WaterTestData
 from app.utils.validation import validate_pdf_file, ValidationError
 from app.utils.file_handler import file_handler
 from app.utils.logger import log_debug, log_error, log_info
-from app.services.workflow_manager import workflow_manager
+from app.services.workflow_manager import workflow_manager, PipelineStage
 from app.services.pdf_processor import pdf_processor
 from app.services.ai_analyzer import ai_analyzer
 from app.services.report_generator import report_generator
+from app.services.report_cleanup import cleanup_service
+from app.services.report_storage import report_storage
+from app.services.knowledge_base import knowledge_base
+from app.services.render_pool import render_pool
+from app.services.job_scheduler import job_scheduler, JobRejectedError
+from app.services.job_journal import job_journal
+from app.services.upload_dedup import upload_dedup
+from app.services.admission_controller import admission_controller
 
 router = APIRouter()
 
+# Analyses reserved in upload_dedup whose session is still being created
+_starting: Set[str] = set()
+
+async def _reusable_analysis(analysis_id: Optional[str]) -> bool:
+    """A repeated upload can attach to this analysis: still running, or completed with a report to serve"""
+    if analysis_id is None:
+        return False
+    if analysis_id in _starting:
+        return True
+    session = await workflow_manager.get_session(analysis_id)
+    if session is None or session.status == "error":
+        return False
+    if session.status == "processing":
+        return True
+    lazy_pending = settings.REPORT_RENDER_MODE == "lazy" and not session.context.metadata.get("reportRendered")
+    return lazy_pending or await asyncio.to_thread(report_storage.stat, analysis_id) is not None
+
+def _key_reused_response() -> JSONResponse:
+    return JSONResponse(
+        status_code=422,
+        content=ApiError(
+            message="Idempotency-Key was already used for a different file",
+            status=422,
+            code="IDEMPOTENCY_KEY_REUSED"
+        ).dict()
+    )
+
+def _duplicate_response(analysis_id: str) -> PDFUploadResponse:
+    return PDFUploadResponse(
+        success=True,
+        analysisId=analysis_id,
+        message="PDF already uploaded. Returning the existing analysis.",
+        duplicate=True
+    )
+
 @router.post("/upload-pdf", response_model=PDFUploadResponse)
 async def upload_pdf(
-    background_tasks: BackgroundTasks,
     pdf: UploadFile = File(...),
-    userId: Optional[str] = Form(None)
+    userId: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """
-    Upload PDF file for water analysis
+    Upload PDF file for water analysis.
+    Repeats (same Idempotency-Key with the same PDF, or the same PDF from the same userId while its
+    analysis is running or its report is still available) return the existing analysis instead of
+    a new one. An Idempotency-Key reused for a different PDF is rejected with 422.
     """
     try:
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= 255:
+            raise ValidationError("Idempotency-Key must be 1-255 characters")
+        
+        # A retried request gets its analysis even while the server is busy or draining,
+        # but only for the file the key was first sent with
+        key_entry = upload_dedup.find_by_key(userId, idempotency_key) if idempotency_key else None
+        if key_entry is not None:
+            existing_id, key_hash = key_entry
+            if await file_handler.hash_upload(pdf) != key_hash:
+                return _key_reused_response()
+            if await _reusable_analysis(existing_id):
+                upload_dedup.record_hit(existing_id, "Idempotency-Key")
+                return _duplicate_response(existing_id)
+        
+        # Draining for shutdown: refuse before the upload is stored
+        if not job_scheduler.accepting:
+            return JSONResponse(
+                status_code=503,
+                headers={"Retry-After": "30"},
+                content=ApiError(
+                    message="Server is shutting down, try again shortly",
+                    status=503,
+                    code="SHUTTING_DOWN"
+                ).dict()
+            )
+        
+        # Shed load before doing any work when the server is saturated
+        decision = admission_controller.check()
+        if not decision.admitted:
+            log_error(f"PDF upload rejected (overloaded): {', '.join(decision.reasons)}", "UPLOAD_API")
+            return JSONResponse(
+                status_code=503,
+                headers={"Retry-After": str(decision.retry_after)},
+                content=ApiError(
+                    message="Server is busy, please retry shortly",
+                    status=503,
+                    code="SERVER_OVERLOADED"
+                ).dict()
+            )
+        
         log_info(f"PDF upload started: {pdf.filename}", "UPLOAD_API")
         
         # Validate PDF file
@@ -37,8 +125,31 @@ async def upload_pdf(
         # Generate analysis ID
         analysis_id = f"analysis_{uuid.uuid4().hex[:12]}"
         
-        # Save uploaded file
-        file_path = await file_handler.save_uploaded_file(pdf, analysis_id)
+        # Save uploaded file (hashed while it is copied)
+        file_path, content_hash = await file_handler.save_uploaded_file(pdf, analysis_id)
+        
+        # Same key sent concurrently, or the same PDF already in flight or recently analysed for this user: attach to it.
+        # Looked up again after every await, so nothing yields between the last lookup and the reservation below
+        checked_id = None
+        while True:
+            key_entry = upload_dedup.find_by_key(userId, idempotency_key) if idempotency_key else None
+            if key_entry is not None and key_entry[1] != content_hash:
+                file_handler.delete_file(file_path)
+                return _key_reused_response()
+            existing_id = key_entry[0] if key_entry else upload_dedup.find_by_content(userId, content_hash)
+            if existing_id is None or existing_id == checked_id:
+                break
+            if await _reusable_analysis(existing_id):
+                file_handler.delete_file(file_path)
+                upload_dedup.register(existing_id, userId, content_hash, idempotency_key)
+                upload_dedup.record_hit(existing_id, "Idempotency-Key" if key_entry else "same content")
+                return _duplicate_response(existing_id)
+            checked_id = existing_id
+        
+        # Reserve the key and content hash before the session is stored (which may yield),
+        # so concurrent repeats attach to this analysis instead of starting their own
+        upload_dedup.register(analysis_id, userId, content_hash, idempotency_key)
+        _starting.add(analysis_id)
         
         # Create analysis context
         context = AnalysisContext(
@@ -53,12 +164,40 @@ async def upload_pdf(
         )
         
         # Start workflow
-        workflow_manager.start_analysis(analysis_id, context)
+        try:
+            await workflow_manager.start_analysis(analysis_id, context)
+        except Exception:
+            upload_dedup.forget(analysis_id)
+            raise
+        finally:
+            _starting.discard(analysis_id)
         
-        # Start background processing
-        background_tasks.add_task(process_pdf_analysis, analysis_id, file_path)
+        # Queue background processing
+        try:
+            queue_position = job_scheduler.submit(analysis_id, process_pdf_analysis, analysis_id, file_path)
+        except JobRejectedError as e:
+            upload_dedup.forget(analysis_id)
+            await workflow_manager.cleanup_session(analysis_id)
+            file_handler.delete_file(file_path)
+            log_error(f"PDF upload rejected: {str(e)}", "UPLOAD_API")
+            return JSONResponse(
+                status_code=503,
+                headers={"Retry-After": str(e.retry_after)},
+                content=ApiError(
+                    message=str(e),
+                    status=503,
+                    code="QUEUE_FULL"
+                ).dict()
+            )
         
-        log_info(f"PDF upload completed: {analysis_id}", "UPLOAD_API")
+        await job_journal.submitted(analysis_id, {
+            "originalFilename": pdf.filename,
+            "userId": userId,
+            "uploadTime": context.metadata['uploadTime'],
+            "filePath": file_path
+        })
+        
+        log_info(f"PDF upload completed: {analysis_id} (queue position {queue_position})", "UPLOAD_API")
         
         return PDFUploadResponse(
             success=True,
@@ -88,55 +227,120 @@ async def upload_pdf(
             ).dict()
         )
 
-async def process_pdf_analysis(analysis_id: str, file_path: str):
+async def process_pdf_analysis(analysis_id: str, file_path: str, recovered: Optional[Dict[str, Dict[str, Any]]] = None):
     """
-    Background task to process PDF analysis
+    Background task to process PDF analysis.
+    Runs as a DAG so the knowledge base and report header are prepared while the LLM works:
+
+        extract ──> llm ─────────┐
+           └─────> header ───────┼──> render
+        knowledge_base ──────────┘
+
+    Completed extract and llm stages are journaled; `recovered` holds their outputs when the job
+    is resumed after a restart, and those stages are not run again.
     """
+    recovered = recovered or {}
     try:
         log_info(f"Starting PDF analysis for {analysis_id}", "UPLOAD_API")
         
-        # Step 1: Extract text from PDF
-        workflow_manager.update_step(analysis_id, "parsing", "processing", "Wyodrębnianie tekstu z PDF...")
-        
-        extracted_text = await pdf_processor.extract_text_from_pdf(file_path)
+        session = await workflow_manager.get_session(analysis_id)
+        if not session or not session.context:
+            raise Exception("Analysis session not found")
+        context = session.context
         
-        # Parse water data
-        water_data = await pdf_processor.parse_water_data(extracted_text)
+        def resumable(stage_id: str, step_id: str, func):
+            # Stage finished before the restart: reuse its journaled output
+            if stage_id not in recovered:
+                return func
+            
+            async def replay(results: dict):
+                log_info(f"Reusing journaled {stage_id} stage for {analysis_id}", "UPLOAD_API")
+                await workflow_manager.update_step(analysis_id, step_id, "completed", "Wznowiono po restarcie serwera")
+                job_scheduler.mark_stage_done(analysis_id, stage_id)
+                return recovered[stage_id].get("result")
+            return replay
         
-        workflow_manager.update_step(analysis_id, "parsing", "completed", "Tekst wyodrębniony pomyślnie")
+        async def extract_stage(results: dict):
+            # Step 1: Extract text from PDF
+            await workflow_manager.update_step(analysis_id, "parsing", "processing", "Wyodrębnianie tekstu z PDF...")
+            
+            async with job_scheduler.stage_slot("extract"):
+                extracted_text = await pdf_processor.extract_text_from_pdf(file_path)
+                
+                # Parse water data
+                water_data = await pdf_processor.parse_water_data(extracted_text)
+            
+            # Update context with extracted data
+            context.extractedText = extracted_text
+            context.waterData = water_data
+            await workflow_manager.update_context(analysis_id, context)
+            await job_journal.stage_done(analysis_id, "extract", {
+                "extractedText": extracted_text,
+                "waterData": water_data.model_dump(mode="json") if water_data else None
+            })
+            
+            await workflow_manager.update_step(analysis_id, "parsing", "completed", "Tekst wyodrębniony pomyślnie")
         
-        # Step 2: AI Analysis
-        workflow_manager.update_step(analysis_id, "analysis", "processing", "Analiza wyników badań z wykorzystaniem AI...")
+        async def knowledge_base_stage(results: dict):
+            # Knowledge base pages are pre-rendered once and only merged into the report
+            try:
+                return await knowledge_base.get_pdf_pages()
+            except Exception as e:
+                log_error(f"Could not load knowledge base for {analysis_id}: {str(e)}", "UPLOAD_API")
+                return None
         
-        # Update context with extracted data
-        session = workflow_manager.get_session(analysis_id)
-        if session and session.context:
-            session.context.extractedText = extracted_text
-            session.context.waterData = water_data
+        async def header_stage(results: dict):
+            # Report header only needs the parsed document data (render workers build their own)
+            if render_pool.enabled:
+                return None
+            return report_generator.build_header_story(context)
         
-        # Perform AI analysis
-        analysis_result_markdown = await ai_analyzer.analyze_water_data(session.context)
+        async def llm_stage(results: dict):
+            # Step 2: AI Analysis
+            await workflow_manager.update_step(analysis_id, "analysis", "processing", "Analiza wyników badań z wykorzystaniem AI...")
+            
+            async with job_scheduler.stage_slot("llm"):
+                analysis_result_markdown = await ai_analyzer.analyze_water_data(context)
+            await job_journal.stage_done(analysis_id, "llm", {"result": analysis_result_markdown})
+            job_scheduler.mark_stage_done(analysis_id, "llm")
+            
+            await workflow_manager.update_step(analysis_id, "analysis", "completed", "Analiza AI zakończona")
+            return analysis_result_markdown
         
-        # Append the knowledge base from complex_schema.md
-        try:
-            knowledge_base_content = await file_handler.read_file_async("prompts/complex_schema.md")
-            final_report_markdown = analysis_result_markdown + "\n\n---\n\n" + knowledge_base_content
-            log_info(f"Appended knowledge base to the report for {analysis_id}", "UPLOAD_API")
-        except Exception as e:
-            log_error(f"Could not append knowledge base for {analysis_id}: {str(e)}", "UPLOAD_API")
-            final_report_markdown = analysis_result_markdown # Fallback to AI result only
+        async def render_stage(results: dict):
+            # Step 3: Generate PDF report
+            await workflow_manager.update_step(analysis_id, "generation", "processing", "Generowanie raportu PDF...")
             
-        workflow_manager.update_step(analysis_id, "analysis", "completed", "Analiza AI zakończona")
+            async with job_scheduler.stage_slot("render"):
+                stored = await report_generator.generate_pdf_report(
+                    analysis_id,
+                    context,
+                    results["llm"],
+                    header_story=results["header"],
+                    appendix_pdf=results["knowledge_base"]
+                )
+            
+            cleanup_service.schedule_report(analysis_id, stored.created_at)
+            await workflow_manager.update_step(analysis_id, "generation", "completed", "Raport PDF wygenerowany")
         
-        # Step 3: Generate PDF report
-        workflow_manager.update_step(analysis_id, "generation", "processing", "Generowanie raportu PDF...")
+        stages = [
+            PipelineStage("extract", resumable("extract", "parsing", extract_stage)),
+            PipelineStage("llm", resumable("llm", "analysis", llm_stage), depends_on=["extract"])
+        ]
         
-        report_path = await report_generator.generate_pdf_report(analysis_id, session.context, final_report_markdown)
+        # In lazy mode the PDF is rendered on the first download request
+        if settings.REPORT_RENDER_MODE != "lazy":
+            stages += [
+                PipelineStage("knowledge_base", knowledge_base_stage),
+                PipelineStage("header", header_stage, depends_on=["extract"]),
+                PipelineStage("render", render_stage, depends_on=["llm", "header", "knowledge_base"])
+            ]
         
-        workflow_manager.update_step(analysis_id, "generation", "completed", "Raport PDF wygenerowany")
+        results = await workflow_manager.run_pipeline(analysis_id, stages)
         
-        # Step 4: Complete analysis
-        workflow_manager.complete_analysis(analysis_id, final_report_markdown)
+        # Step 4: Complete analysis (the knowledge base is appended when the result is served)
+        await workflow_manager.complete_analysis(analysis_id, results["llm"])
+        await job_journal.finished(analysis_id, "completed")
         
         # Cleanup uploaded file
         file_handler.delete_file(file_path)
@@ -145,8 +349,63 @@ async def process_pdf_analysis(analysis_id: str, file_path: str):
         
     except Exception as e:
         log_error(f"PDF analysis failed for {analysis_id}: {str(e)}", "UPLOAD_API")
-        workflow_manager.error_analysis(analysis_id, str(e))
+        await workflow_manager.error_analysis(analysis_id, str(e))
+        await job_journal.finished(analysis_id, "error")
         
         # Cleanup on error
         file_handler.delete_file(file_path)
-        report_generator.delete_report(analysis_id) 
\ No newline at end of file
+        await asyncio.to_thread(report_generator.delete_report, analysis_id)
+
+
+async def resume_interrupted_jobs():
+    """
+    Requeue analyses the journal recorded as unfinished (process restarted or drain deadline hit).
+    Sessions lost with the old process are recreated under the same ID, so clients can keep polling.
+    """
+    jobs = await job_journal.recover()
+    resumed = 0
+    
+    for job in jobs:
+        analysis_id = job.analysis_id
+        file_path = job.submitted.get("filePath", "")
+        session = await workflow_manager.get_session(analysis_id)
+        
+        if session is not None and session.status != "processing":
+            await job_journal.finished(analysis_id, session.status)
+            continue
+        
+        if session is None:
+            context = AnalysisContext(
+                analysisId=analysis_id,
+                originalFilename=job.submitted.get("originalFilename") or "document.pdf",
+                extractedText="",
+                metadata={
+                    'userId': job.submitted.get("userId"),
+                    'uploadTime': job.submitted.get("uploadTime"),
+                    'filePath': file_path,
+                    'resumed': True
+                }
+            )
+            session = await workflow_manager.start_analysis(analysis_id, context)
+        
+        extract = job.stages.get("extract")
+        if extract is not None:
+            session.context.extractedText = extract.get("extractedText") or ""
+            if extract.get("waterData"):
+                session.context.waterData = WaterTestData.model_validate(extract["waterData"])
+            await workflow_manager.update_context(analysis_id, session.context)
+        elif not os.path.exists(file_path):
+            await workflow_manager.error_analysis(analysis_id, "Uploaded file was lost during a server restart")
+            await job_journal.finished(analysis_id, "error")
+            continue
+        
+        try:
+            job_scheduler.submit(analysis_id, process_pdf_analysis, analysis_id, file_path, job.stages)
+            resumed += 1
+        except JobRejectedError as e:
+            await workflow_manager.error_analysis(analysis_id, str(e))
+            await job_journal.finished(analysis_id, "error")
+            file_handler.delete_file(file_path)
+    
+    if jobs:
+        log_info(f"Resumed {resumed} of {len(jobs)} interrupted analyses", "UPLOAD_API")
@@ -15,6 +15,9 @@ class Settings:
     UPLOAD_FOLDER: str = os.getenv('UPLOAD_FOLDER', 'uploads')
     TEMP_FOLDER: str = os.getenv('TEMP_FOLDER', 'temp')
     REPORTS_FOLDER: str = os.getenv('REPORTS_FOLDER', 'reports')
+    KNOWLEDGE_BASE_PATH: str = os.getenv('KNOWLEDGE_BASE_PATH', 'prompts/complex_schema.md')
+    # Pre-parsed TTF metrics keyed by font file hash (empty disables the cache)
+    FONT_CACHE_DIR: str = os.getenv('FONT_CACHE_DIR', os.path.join(TEMP_FOLDER, 'font_cache'))
     
     # CORS
     CORS_ORIGINS: list = os.getenv('CORS_ORIGINS', 'http://localhost:3001,http://localhost:3000').split(',')
@@ -25,8 +28,75 @@ class Settings:
     
     # Report Cleanup
     REPORT_LIFETIME_MINUTES: int = int(os.getenv('REPORT_LIFETIME_MINUTES', '10'))
-    CLEANUP_INTERVAL_MINUTES: int = int(os.getenv('CLEANUP_INTERVAL_MINUTES', '5'))
     POST_DOWNLOAD_CLEANUP_MINUTES: int = int(os.getenv('POST_DOWNLOAD_CLEANUP_MINUTES', '1'))
+    SESSION_LIFETIME_MINUTES: int = int(os.getenv('SESSION_LIFETIME_MINUTES', '60'))
+    # Reports and sessions expire on their own deadlines; this sweep only catches orphans
+    CLEANUP_RECONCILE_MINUTES: int = int(os.getenv('CLEANUP_RECONCILE_MINUTES', '60'))
+    
+    # Job Scheduling
+    JOB_WORKERS: int = int(os.getenv('JOB_WORKERS', '8'))
+    JOB_QUEUE_SIZE: int = int(os.getenv('JOB_QUEUE_SIZE', '50'))
+    STAGE_WORKERS_EXTRACT: int = int(os.getenv('STAGE_WORKERS_EXTRACT', '2'))
+    STAGE_WORKERS_LLM: int = int(os.getenv('STAGE_WORKERS_LLM', '8'))
+    STAGE_WORKERS_RENDER: int = int(os.getenv('STAGE_WORKERS_RENDER', '2'))
+    SHUTDOWN_DRAIN_SECONDS: int = int(os.getenv('SHUTDOWN_DRAIN_SECONDS', '30'))
+    # Repeated uploads (same PDF and user, or same Idempotency-Key) reuse the existing analysis
+    UPLOAD_DEDUP_MINUTES: int = int(os.getenv('UPLOAD_DEDUP_MINUTES', '10'))
+    UPLOAD_DEDUP_MAX_ENTRIES: int = int(os.getenv('UPLOAD_DEDUP_MAX_ENTRIES', '10000'))
+    # Append-only record of job stages; unfinished jobs resume after a restart (empty disables)
+    JOB_JOURNAL_PATH: str = os.getenv('JOB_JOURNAL_PATH', os.path.join(TEMP_FOLDER, 'jobs.journal'))
+    JOB_JOURNAL_FSYNC: bool = os.getenv('JOB_JOURNAL_FSYNC', 'false').lower() == 'true'
+    JOB_JOURNAL_COMPACT_MB: int = int(os.getenv('JOB_JOURNAL_COMPACT_MB', '16'))
+    
+    # PDF Rendering (0 workers = render inline on the event loop)
+    # eager: render during the analysis, lazy: render on the first download
+    REPORT_RENDER_MODE: str = os.getenv('REPORT_RENDER_MODE', 'eager').lower()
+    RENDER_POOL_SIZE: int = int(os.getenv('RENDER_POOL_SIZE', '2'))
+    RENDER_TIMEOUT_SECONDS: int = int(os.getenv('RENDER_TIMEOUT_SECONDS', '60'))
+    # Analyses longer than this are split at top-level sections and rendered in parallel workers
+    RENDER_PARALLEL_MIN_CHARS: int = int(os.getenv('RENDER_PARALLEL_MIN_CHARS', '60000'))
+    RENDER_MAX_SEGMENTS: int = int(os.getenv('RENDER_MAX_SEGMENTS', str(RENDER_POOL_SIZE)))
+    
+    # Report Storage (file: REPORTS_FOLDER, memory: compressed in-process store bounded by size and lifetime)
+    REPORT_STORAGE_BACKEND: str = os.getenv('REPORT_STORAGE_BACKEND', 'file').lower()
+    REPORT_MEMORY_MAX_MB: int = int(os.getenv('REPORT_MEMORY_MAX_MB', '256'))
+    
+    # Report downloads (none: served by the app, x-accel: nginx X-Accel-Redirect, x-sendfile: Apache/lighttpd X-Sendfile)
+    DOWNLOAD_OFFLOAD: str = os.getenv('DOWNLOAD_OFFLOAD', 'none').lower()
+    # Internal location the proxy maps to REPORTS_FOLDER (x-accel only)
+    DOWNLOAD_OFFLOAD_PREFIX: str = os.getenv('DOWNLOAD_OFFLOAD_PREFIX', '/protected-reports/')
+    
+    # Progress streaming (per-subscriber queue bound, SSE heartbeat comment interval)
+    SSE_QUEUE_SIZE: int = int(os.getenv('SSE_QUEUE_SIZE', '64'))
+    SSE_HEARTBEAT_SECONDS: float = float(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+    # Recent updates kept per analysis for Last-Event-ID replay on reconnect
+    SSE_REPLAY_EVENTS: int = int(os.getenv('SSE_REPLAY_EVENTS', '32'))
+    # Multiplexed WebSocket (updates gathered for WS_BATCH_MS into one frame)
+    WS_BATCH_MS: int = int(os.getenv('WS_BATCH_MS', '50'))
+    WS_MAX_SUBSCRIPTIONS: int = int(os.getenv('WS_MAX_SUBSCRIPTIONS', '500'))
+    
+    # Session store (memory: this process only, sqlite: shared by all workers on the host,
+    # redis: shared by all nodes, progress events relayed between nodes)
+    SESSION_STORE_BACKEND: str = os.getenv('SESSION_STORE_BACKEND', 'memory').lower()
+    SESSION_DB_PATH: str = os.getenv('SESSION_DB_PATH', os.path.join(TEMP_FOLDER, 'sessions.db'))
+    # Sessions kept parsed in each worker's read-through cache
+    SESSION_CACHE_SIZE: int = int(os.getenv('SESSION_CACHE_SIZE', '256'))
+    # Memory backend bound; finished sessions are compressed and evicted least recently used first
+    SESSION_MEMORY_MAX_MB: int = int(os.getenv('SESSION_MEMORY_MAX_MB', '64'))
+    REDIS_URL: str = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    REDIS_KEY_PREFIX: str = os.getenv('REDIS_KEY_PREFIX', 'water:')
+    
+    # HTML preview (rendered once per analysis, kept compressed)
+    PREVIEW_CACHE_SIZE: int = int(os.getenv('PREVIEW_CACHE_SIZE', '256'))
+    
+    # Admission Control (load shedding on upload)
+    ADMISSION_ENABLED: bool = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_MAX_LOOP_LAG_MS: float = float(os.getenv('ADMISSION_MAX_LOOP_LAG_MS', '250'))
+    ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '40'))
+    ADMISSION_MAX_RSS_MB: int = int(os.getenv('ADMISSION_MAX_RSS_MB', '1536'))
+    ADMISSION_MAX_LLM_QUEUE: int = int(os.getenv('ADMISSION_MAX_LLM_QUEUE', '20'))
+    ADMISSION_LAG_SAMPLE_MS: int = int(os.getenv('ADMISSION_LAG_SAMPLE_MS', '200'))
+    ADMISSION_RETRY_AFTER_SECONDS: int = int(os.getenv('ADMISSION_RETRY_AFTER_SECONDS', '15'))
 
 class OpenRouterConfig:
     # API Configuration
@@ -48,6 +118,17 @@ class OpenRouterConfig:
     MAX_TOKENS: int = int(os.getenv('MODEL_MAX_TOKENS', '4000'))
     TOP_P: float = float(os.getenv('MODEL_TOP_P', '1.0'))
     
+    # Prompt caching (static master prompt prefix sent as a cacheable system message)
+    PROMPT_CACHE_ENABLED: bool = os.getenv('PROMPT_CACHE_ENABLED', 'true').lower() == 'true'
+    PROMPT_CACHE_HINT_PREFIXES: list = os.getenv('PROMPT_CACHE_HINT_PREFIXES', 'anthropic/,google/').split(',')
+    
+    @classmethod
+    def supports_cache_control(cls, model_name: str) -> bool:
+        """Check if the provider needs explicit cache_control breakpoints"""
+        if not cls.PROMPT_CACHE_ENABLED or not model_name:
+            return False
+        return any(model_name.startswith(prefix.strip()) for prefix in cls.PROMPT_CACHE_HINT_PREFIXES if prefix.strip())
+    
     @classmethod
     def get_model_name(cls, model_type: str) -> str:
         """Get model name by type"""
@@ -91,4 +172,5 @@ if settings.DEBUG_MODE:
     print(f"   📁 Upload folder: {settings.UPLOAD_FOLDER}")
     print(f"   🤖 Default model: {openrouter_config.get_model_name(openrouter_config.DEFAULT_MODEL)}")
     print(f"   🔄 Fallback model: {openrouter_config.get_model_name(openrouter_config.FALLBACK_MODEL)}")
-    print(f"   🗑️ Report cleanup: {settings.REPORT_LIFETIME_MINUTES}min lifetime, {settings.CLEANUP_INTERVAL_MINUTES}min interval") 
\ No newline at end of file
+    print(f"   🧵 Job workers: {settings.JOB_WORKERS} (queue {settings.JOB_QUEUE_SIZE}, extract/llm/render {settings.STAGE_WORKERS_EXTRACT}/{settings.STAGE_WORKERS_LLM}/{settings.STAGE_WORKERS_RENDER})")
+    print(f"   🗑️ Report cleanup: {settings.REPORT_LIFETIME_MINUTES}min lifetime, {settings.CLEANUP_RECONCILE_MINUTES}min reconciliation") 
\ No newline at end of file
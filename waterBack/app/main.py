@@ -1,3 +1,4 @@
+import asyncio
 import os
 import time
 from fastapi import FastAPI, HTTPException
@@ -8,6 +9,14 @@ from contextlib import asynccontextmanager
 from app.config import settings, openrouter_config
 from app.models.responses import HealthResponse, ApiError
 from app.services.report_cleanup import cleanup_service
+from app.services.job_scheduler import job_scheduler
+from app.services.job_journal import job_journal
+from app.services.admission_controller import admission_controller
+from app.services.knowledge_base import knowledge_base
+from app.services.render_pool import render_pool
+from app.services.report_generator import report_generator
+from app.services.workflow_manager import workflow_manager
+from app.api.upload import resume_interrupted_jobs
 
 
 # Create necessary directories
@@ -31,13 +40,28 @@ async def lifespan(app: FastAPI):
         print(f"   🌐 CORS origins: {settings.CORS_ORIGINS}")
         print(f"   🤖 AI Model: {openrouter_config.get_model_name(openrouter_config.DEFAULT_MODEL)}")
     
-    # Start cleanup service
+    # Load fonts and styles off the event loop, then pre-render static knowledge base pages
+    await asyncio.to_thread(report_generator.initialize)
+    await knowledge_base.load()
+    
+    # Start render workers, event relay, job workers (resuming journaled jobs) and cleanup service
+    await render_pool.start()
+    await workflow_manager.start()
+    await job_scheduler.start()
+    await resume_interrupted_jobs()
+    await admission_controller.start()
     await cleanup_service.start_cleanup_service()
     
     yield
     
-    # Shutdown
+    # Shutdown - stop accepting uploads and drain in-flight analyses before stopping services;
+    # jobs cut off by the deadline stay unfinished in the journal and resume on the next start
+    await job_scheduler.shutdown(settings.SHUTDOWN_DRAIN_SECONDS)
+    await job_journal.close()
+    await render_pool.stop()
+    await admission_controller.stop()
     await cleanup_service.stop_cleanup_service()
+    await workflow_manager.stop()
     
     if settings.DEBUG_MODE:
         print("👋 [Shutdown] Water Test Analyzer Backend")
@@ -57,6 +81,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Link", "ETag", "Content-Range", "Accept-Ranges"],
 )
 
 # Global exception handler
@@ -85,6 +110,33 @@ async def health_check():
         timestamp=int(time.time())
     )
 
+# Readiness endpoint for load balancers
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness check - 503 while saturated or draining"""
+    decision = admission_controller.check()
+    content = {
+        "ready": decision.admitted,
+        "reasons": decision.reasons,
+        "signals": decision.signals,
+        "timestamp": int(time.time())
+    }
+    
+    if not decision.admitted:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(decision.retry_after)},
+            content=content
+        )
+    
+    return content
+
+# Session memory diagnostics
+@app.get("/api/diagnostics/sessions")
+async def session_diagnostics(limit: int = 20):
+    """Session store usage: totals and the largest sessions by bytes held"""
+    return await workflow_manager.sessions.usage(max(1, min(limit, 200)))
+
 # Root endpoint
 @app.get("/")
 async def root():
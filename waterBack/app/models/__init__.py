@@ -1,3 +1,2 @@
-from .requests import *
 from .responses import *
-from .water_data import * 
\ No newline at end of file
+from .water_data import * 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Literal
+from typing import Optional, Literal, Dict, List
 from datetime import datetime
 
 class PDFUploadResponse(BaseModel):
@@ -7,6 +7,7 @@ class PDFUploadResponse(BaseModel):
     success: bool = Field(..., description="Upload success status")
     analysisId: str = Field(..., description="Unique analysis identifier")
     message: str = Field(..., description="Response message")
+    duplicate: bool = Field(False, description="Existing analysis of the same upload was returned")
     error: Optional[str] = Field(None, description="Error message if any")
     
     class Config:
@@ -28,6 +29,10 @@ class AnalysisStatus(BaseModel):
     startTime: datetime = Field(..., description="Analysis start time")
     completedTime: Optional[datetime] = Field(None, description="Analysis completion time")
     error: Optional[str] = Field(None, description="Error message if status is error")
+    queuePosition: Optional[int] = Field(None, description="Position in the job queue (0 = running)")
+    etaSeconds: Optional[float] = Field(None, description="Estimated seconds until the analysis completes")
+    stageTimings: Optional[Dict[str, Dict[str, float]]] = Field(None, description="Pipeline stage timings in seconds")
+    criticalPath: Optional[List[str]] = Field(None, description="Stages on the pipeline critical path")
     
     class Config:
         json_schema_extra = {
@@ -38,7 +43,9 @@ class AnalysisStatus(BaseModel):
                 "message": "Analyzing water parameters...",
                 "startTime": "2024-01-15T10:30:00Z",
                 "completedTime": None,
-                "error": None
+                "error": None,
+                "queuePosition": 0,
+                "etaSeconds": 18.5
             }
         }
 
@@ -70,6 +77,8 @@ class AnalysisPreview(BaseModel):
     id: str = Field(..., description="Analysis ID")
     markdown: str = Field(..., description="Analysis results in markdown format")
     metadata: dict = Field(..., description="Analysis metadata")
+    htmlUrl: Optional[str] = Field(None, description="Cacheable sanitised HTML of the analysis")
+    knowledgeBaseUrl: Optional[str] = Field(None, description="Immutable URL of the knowledge base HTML")
     
     class Config:
         json_schema_extra = {
@@ -91,6 +100,7 @@ class AnalysisWorkflow(BaseModel):
     message: str = Field(..., description="Step message")
     progress: int = Field(..., description="Overall progress (0-100)")
     elapsedTime: float = Field(..., description="Elapsed time in seconds")
+    eventId: Optional[int] = Field(None, description="Monotonically increasing event ID within the analysis (SSE id)")
     
     class Config:
         json_schema_extra = {
@@ -99,7 +109,8 @@ class AnalysisWorkflow(BaseModel):
                 "status": "processing",
                 "message": "Analyzing water parameters with AI...",
                 "progress": 65,
-                "elapsedTime": 23.5
+                "elapsedTime": 23.5,
+                "eventId": 4
             }
         }
 
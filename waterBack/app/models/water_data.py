@@ -88,6 +88,8 @@ class AnalysisSession(BaseModel):
     context: Optional[AnalysisContext] = Field(None, description="Analysis context")
     result: Optional[str] = Field(None, description="Analysis result")
     error: Optional[str] = Field(None, description="Error message")
+    stageTimings: Dict[str, Dict[str, float]] = Field(default_factory=dict, description="Pipeline stage timings (start/end/duration in seconds)")
+    criticalPath: List[str] = Field(default_factory=list, description="Stages on the pipeline critical path")
     
     class Config:
         json_schema_extra = {
@@ -1,4 +1,2 @@
-from .pdf_processor import PDFProcessor
-from .ai_analyzer import WaterAnalysisAI
-from .report_generator import ReportGenerator
-from .workflow_manager import WorkflowManager 
\ No newline at end of file
+# Modules are imported directly (app.services.<module>); nothing is imported here so render
+# pool workers that only need report_generator do not load the AI client or the session store
@@ -0,0 +1,128 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.utils.logger import log_debug, log_info
+from app.services.job_scheduler import job_scheduler
+
+@dataclass
+class AdmissionDecision:
+    """Result of an admission check"""
+    admitted: bool
+    reasons: List[str] = field(default_factory=list)
+    retry_after: int = 0
+    signals: Dict[str, Any] = field(default_factory=dict)
+
+class AdmissionController:
+    """Saturation-aware admission for new uploads (load shedding)"""
+
+    def __init__(self):
+        self.enabled = settings.ADMISSION_ENABLED
+        self.max_loop_lag_ms = settings.ADMISSION_MAX_LOOP_LAG_MS
+        self.max_in_flight = settings.ADMISSION_MAX_IN_FLIGHT
+        self.max_rss_mb = settings.ADMISSION_MAX_RSS_MB
+        self.max_llm_queue = settings.ADMISSION_MAX_LLM_QUEUE
+        self.retry_after = settings.ADMISSION_RETRY_AFTER_SECONDS
+        self.sample_interval = settings.ADMISSION_LAG_SAMPLE_MS / 1000
+
+        self.loop_lag_ms = 0.0
+        self.rejected_count = 0
+        self.monitor_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start event-loop lag monitor"""
+        if self.monitor_task:
+            return
+
+        self.monitor_task = asyncio.create_task(self._monitor_loop_lag())
+        log_info(
+            f"Started admission controller (lag {self.max_loop_lag_ms}ms, in-flight {self.max_in_flight}, "
+            f"RSS {self.max_rss_mb}MB, LLM queue {self.max_llm_queue})",
+            "ADMISSION"
+        )
+
+    async def stop(self):
+        """Stop event-loop lag monitor"""
+        if self.monitor_task:
+            self.monitor_task.cancel()
+            self.monitor_task = None
+
+    async def _monitor_loop_lag(self):
+        """Measure how late the loop wakes us up compared to the requested sleep"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                started = loop.time()
+                await asyncio.sleep(self.sample_interval)
+                lag_ms = max(0.0, (loop.time() - started - self.sample_interval) * 1000)
+                # Decaying peak: spikes register immediately and fade over a few samples
+                self.loop_lag_ms = max(lag_ms, self.loop_lag_ms * 0.7)
+            except asyncio.CancelledError:
+                break
+
+    def get_signals(self) -> Dict[str, Any]:
+        """Current saturation signals"""
+        return {
+            "loopLagMs": round(self.loop_lag_ms, 1),
+            "inFlightJobs": job_scheduler.in_flight_count(),
+            "rssMb": round(self._read_rss_mb(), 1),
+            # Queued and running jobs still ahead of (or inside) their LLM call
+            "llmQueueDepth": job_scheduler.stage_backlog('llm'),
+            "accepting": job_scheduler.accepting
+        }
+
+    def check(self) -> AdmissionDecision:
+        """Decide whether a new job can be admitted"""
+        signals = self.get_signals()
+        reasons = []
+
+        if not signals["accepting"]:
+            reasons.append("server is draining")
+
+        if self.enabled:
+            if signals["loopLagMs"] > self.max_loop_lag_ms:
+                reasons.append(f"event loop lag {signals['loopLagMs']}ms > {self.max_loop_lag_ms}ms")
+            if signals["inFlightJobs"] >= self.max_in_flight:
+                reasons.append(f"in-flight jobs {signals['inFlightJobs']} >= {self.max_in_flight}")
+            if self.max_rss_mb > 0 and signals["rssMb"] > self.max_rss_mb:
+                reasons.append(f"RSS {signals['rssMb']}MB > {self.max_rss_mb}MB")
+            if signals["llmQueueDepth"] >= self.max_llm_queue:
+                reasons.append(f"LLM queue depth {signals['llmQueueDepth']} >= {self.max_llm_queue}")
+
+        if reasons:
+            self.rejected_count += 1
+            log_debug(f"Admission rejected: {', '.join(reasons)}", "ADMISSION")
+            return AdmissionDecision(False, reasons, self.retry_after, signals)
+
+        return AdmissionDecision(True, [], 0, signals)
+
+    def _read_rss_mb(self) -> float:
+        """Resident set size in MB of this process and its children (render pool workers); peak of this process off Linux"""
+        page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 0
+        self_pages = self._resident_pages('self')
+        if self_pages is not None:
+            child_pages = sum(self._resident_pages(str(child.pid)) or 0 for child in multiprocessing.active_children())
+            return (self_pages + child_pages) * page_size / (1024 * 1024)
+        
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is in bytes on macOS, kilobytes on Linux
+            return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+        except ImportError:
+            return 0.0
+    
+    @staticmethod
+    def _resident_pages(pid: str) -> Optional[int]:
+        try:
+            with open(f'/proc/{pid}/statm', 'r') as f:
+                return int(f.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            return None
+
+# Global admission controller instance
+admission_controller = AdmissionController()
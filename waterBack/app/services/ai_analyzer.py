@@ -1,7 +1,7 @@
 import os
 import asyncio
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
 from langchain.prompts import PromptTemplate
@@ -18,6 +18,15 @@ class WaterAnalysisAI:
         self.llm = self._create_llm()
         self.prompts_dir = Path("prompts")
         self.master_prompt_template = self._load_master_prompt()
+        self.prompt_prefix, self.prompt_suffix = self._split_master_prompt(self.master_prompt_template)
+        self.system_message = self._build_system_message()
+        self.token_usage_stats: Dict[str, int] = {
+            'calls': 0,
+            'input_tokens': 0,
+            'cached_input_tokens': 0,
+            'uncached_input_tokens': 0,
+            'output_tokens': 0
+        }
         
         # Ensure prompts directory exists
         if not self.prompts_dir.exists():
@@ -41,6 +50,7 @@ class WaterAnalysisAI:
             old_model = self.config['model_name']
             self.config = OpenRouterConfig.get_model_config(model_type)
             self.llm = self._create_llm()
+            self.system_message = self._build_system_message()
             log_info(f"Switched model from {old_model} to {self.config['model_name']}", "AI_ANALYZER")
         except Exception as e:
             log_error(f"Failed to switch model: {str(e)}", "AI_ANALYZER")
@@ -64,6 +74,81 @@ class WaterAnalysisAI:
             log_error(f"Failed to load master prompt: {str(e)}", "AI_ANALYZER")
             return self._get_default_prompt()
 
+    def _split_master_prompt(self, template: str) -> tuple:
+        """Split the master prompt into a static prefix and the part following {data_summary}"""
+        if '{data_summary}' not in template:
+            log_warning("Master prompt has no {data_summary} placeholder, appending data at the end", "AI_ANALYZER")
+            return template.rstrip(), ""
+        
+        prefix, suffix = template.split('{data_summary}', 1)
+        return prefix.rstrip(), suffix.strip()
+    
+    def _build_system_message(self) -> SystemMessage:
+        """
+        Build the static system message. Its content must stay byte-identical
+        between calls so the provider can serve it from the prompt cache.
+        """
+        if OpenRouterConfig.supports_cache_control(self.config.get('model_name')):
+            return SystemMessage(content=[{
+                "type": "text",
+                "text": self.prompt_prefix,
+                "cache_control": {"type": "ephemeral"}
+            }])
+        
+        # OpenAI-style providers cache long prefixes automatically
+        return SystemMessage(content=self.prompt_prefix)
+    
+    def _build_messages(self, data_summary: str) -> List:
+        """Static instructions first, variable analysis data last"""
+        human_content = data_summary
+        if self.prompt_suffix:
+            human_content = f"{data_summary}\n\n{self.prompt_suffix}"
+        
+        return [
+            self.system_message,
+            HumanMessage(content=human_content)
+        ]
+    
+    def _record_token_usage(self, context: AnalysisContext, response) -> Dict[str, int]:
+        """Extract cached vs uncached input tokens from the LLM response"""
+        input_tokens = 0
+        cached_tokens = 0
+        output_tokens = 0
+        
+        generation = response.generations[0][0]
+        usage_metadata = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+        
+        if usage_metadata:
+            input_tokens = usage_metadata.get('input_tokens', 0) or 0
+            output_tokens = usage_metadata.get('output_tokens', 0) or 0
+            cached_tokens = (usage_metadata.get('input_token_details') or {}).get('cache_read', 0) or 0
+        else:
+            token_usage = (response.llm_output or {}).get('token_usage') or {}
+            input_tokens = token_usage.get('prompt_tokens', 0) or 0
+            output_tokens = token_usage.get('completion_tokens', 0) or 0
+            cached_tokens = (token_usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0) or 0
+        
+        usage = {
+            'inputTokens': input_tokens,
+            'cachedInputTokens': cached_tokens,
+            'uncachedInputTokens': max(0, input_tokens - cached_tokens),
+            'outputTokens': output_tokens
+        }
+        context.metadata['tokenUsage'] = usage
+        
+        self.token_usage_stats['calls'] += 1
+        self.token_usage_stats['input_tokens'] += usage['inputTokens']
+        self.token_usage_stats['cached_input_tokens'] += usage['cachedInputTokens']
+        self.token_usage_stats['uncached_input_tokens'] += usage['uncachedInputTokens']
+        self.token_usage_stats['output_tokens'] += usage['outputTokens']
+        
+        log_info(
+            f"Token usage for {context.analysisId}: {input_tokens} input "
+            f"({cached_tokens} cached, {usage['uncachedInputTokens']} uncached), {output_tokens} output",
+            "AI_ANALYZER"
+        )
+        return usage
+
     async def analyze_water_data(self, context: AnalysisContext) -> str:
         """
         Analyze water test data using AI with the master prompt.
@@ -75,20 +160,18 @@ class WaterAnalysisAI:
             # Prepare data for analysis
             data_summary = self._prepare_data_summary(context)
             
-            # Create messages from the master prompt
-            system_message_content = self.master_prompt_template.format(data_summary=data_summary)
-            
-            # In new LangChain versions, it's better to use a single HumanMessage 
-            # or a structured prompt rather than System + Human for this kind of task.
-            # We'll put the whole template into a HumanMessage for the model to process.
-            messages = [
-                HumanMessage(content=system_message_content)
-            ]
+            # Static master prompt as a cacheable system prefix, data as the human turn
+            messages = self._build_messages(data_summary)
             
             # Call LLM
             response = await self.llm.agenerate([messages])
             result = response.generations[0][0].text
             
+            try:
+                self._record_token_usage(context, response)
+            except Exception as usage_error:
+                log_warning(f"Could not read token usage: {str(usage_error)}", "AI_ANALYZER")
+            
             log_info(f"AI analysis completed for {context.analysisId}", "AI_ANALYZER")
             return result
             
@@ -161,7 +244,9 @@ Przepraszamy za niedogodności.
         return {
             "model_name": self.config.get('model_name'),
             "temperature": self.config.get('temperature'),
-            "max_tokens": self.config.get('max_tokens')
+            "max_tokens": self.config.get('max_tokens'),
+            "prompt_cache_hints": OpenRouterConfig.supports_cache_control(self.config.get('model_name')),
+            "token_usage": dict(self.token_usage_stats)
         }
     
     def _get_default_prompt(self) -> str:
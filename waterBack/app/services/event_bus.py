@@ -0,0 +1,162 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from app.utils.logger import log_debug, log_warning
+
+def encode_sse(payload_json: str, event_id: Optional[int] = None) -> bytes:
+    """SSE wire frame, with an id line when the event can be resumed from"""
+    if event_id is None:
+        return f"data: {payload_json}\n\n".encode()
+    return f"id: {event_id}\ndata: {payload_json}\n\n".encode()
+
+@dataclass
+class BusEvent:
+    """Published event, serialised once and shared by every subscriber"""
+    event_id: int
+    data: Any
+    payload_json: str
+    frame: bytes  # SSE wire bytes
+    coalescable: bool = False  # may be replaced by a newer coalescable event still queued
+
+@dataclass
+class _Channel:
+    """Per-analysis event ID counter and ring buffer of recent events for replay"""
+    history: Deque[BusEvent]
+    last_id: int = 0
+
+class Subscription:
+    """
+    One subscriber's bounded event queue. A coalescable update replaces a coalescable one still
+    waiting at the tail, so a slow client gets the latest progress instead of a backlog; when the
+    queue is full the oldest coalescable (else oldest) event is dropped.
+    Subscriptions can share a wakeup event to be drained together (multiplexed connections).
+    """
+
+    def __init__(self, analysis_id: str, max_queue: int, wakeup: Optional[asyncio.Event] = None):
+        self.analysis_id = analysis_id
+        self.max_queue = max_queue
+        self.pending: Deque[BusEvent] = deque()
+        self.wakeup = wakeup or asyncio.Event()
+        self.dropped = 0
+        self.coalesced = 0
+
+    def deliver(self, event: BusEvent):
+        pending = self.pending
+        if event.coalescable and pending and pending[-1].coalescable:
+            pending[-1] = event
+            self.coalesced += 1
+        else:
+            if len(pending) >= self.max_queue:
+                self._drop_one()
+            pending.append(event)
+        self.wakeup.set()
+
+    def _drop_one(self):
+        for index, queued in enumerate(self.pending):
+            if queued.coalescable:
+                del self.pending[index]
+                break
+        else:
+            self.pending.popleft()
+        self.dropped += 1
+
+    async def next(self, timeout: float) -> Optional[BusEvent]:
+        """Next event, or None if nothing was published within timeout (time for a heartbeat)"""
+        if not self.pending:
+            self.wakeup.clear()
+            try:
+                # asyncio.timeout avoids the extra task wait_for creates per wait
+                async with asyncio.timeout(timeout):
+                    await self.wakeup.wait()
+            except TimeoutError:
+                return None
+        return self.pending.popleft()
+
+    def drain(self) -> List[BusEvent]:
+        """All queued events, oldest first"""
+        events = list(self.pending)
+        self.pending.clear()
+        return events
+
+class EventBus:
+    """In-process pub/sub keyed by analysis ID; publishing wakes waiting subscribers immediately"""
+
+    def __init__(self, max_queue: int, replay_size: int):
+        self.max_queue = max_queue
+        self.replay_size = replay_size
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+        self.channels: Dict[str, _Channel] = {}
+
+    def subscribe(self, analysis_id: str, wakeup: Optional[asyncio.Event] = None) -> Subscription:
+        subscription = Subscription(analysis_id, self.max_queue, wakeup)
+        self.subscribers.setdefault(analysis_id, set()).add(subscription)
+        log_debug(f"Subscribed to {analysis_id} ({len(self.subscribers[analysis_id])} subscribers)", "EVENT_BUS")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove one subscriber, other subscribers of the same analysis keep receiving"""
+        subscribers = self.subscribers.get(subscription.analysis_id)
+        if not subscribers:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self.subscribers[subscription.analysis_id]
+        if subscription.dropped:
+            log_warning(
+                f"Subscriber of {subscription.analysis_id} dropped {subscription.dropped} events (slow client)",
+                "EVENT_BUS"
+            )
+        elif subscription.coalesced:
+            log_debug(f"Subscriber of {subscription.analysis_id} coalesced {subscription.coalesced} updates", "EVENT_BUS")
+
+    def next_id(self, analysis_id: str) -> int:
+        """Reserve the next event ID of an analysis"""
+        channel = self.channels.get(analysis_id)
+        if channel is None:
+            channel = self.channels[analysis_id] = _Channel(deque(maxlen=self.replay_size))
+        channel.last_id += 1
+        return channel.last_id
+
+    def publish(self, analysis_id: str, event_id: int, data: Any, payload_json: str,
+                coalescable: bool = False) -> BusEvent:
+        """
+        Encode the event once, record it for replay and deliver it to current subscribers.
+        Also used for events numbered by another node (relayed), which advance the channel's last ID.
+        """
+        event = BusEvent(event_id, data, payload_json, encode_sse(payload_json, event_id), coalescable)
+        channel = self.channels.get(analysis_id)
+        if channel is None:
+            channel = self.channels[analysis_id] = _Channel(deque(maxlen=self.replay_size))
+        channel.last_id = max(channel.last_id, event_id)
+        channel.history.append(event)
+        for subscription in self.subscribers.get(analysis_id, ()):
+            subscription.deliver(event)
+        return event
+
+    def last_id(self, analysis_id: str) -> int:
+        channel = self.channels.get(analysis_id)
+        return channel.last_id if channel else 0
+
+    def replay(self, analysis_id: str, last_event_id: int) -> Optional[List[BusEvent]]:
+        """
+        Events published after last_event_id, or None when the ring buffer no longer
+        covers the gap (or the ID is unknown) and the caller has to resync from status
+        """
+        channel = self.channels.get(analysis_id)
+        if channel is None or last_event_id > channel.last_id:
+            return None
+        missed = [event for event in channel.history if event.event_id > last_event_id]
+        if channel.last_id - last_event_id != len(missed):
+            return None
+        return missed
+
+    def discard(self, analysis_id: str):
+        """Forget the event history of an analysis"""
+        self.channels.pop(analysis_id, None)
+
+    def subscriber_count(self, analysis_id: Optional[str] = None) -> int:
+        if analysis_id is not None:
+            return len(self.subscribers.get(analysis_id, ()))
+        return sum(map(len, self.subscribers.values()))
@@ -0,0 +1,104 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+from xml.etree.ElementTree import Element
+
+import markdown
+from markdown.treeprocessors import Treeprocessor
+
+from app.config import settings
+from app.utils.http_cache import CachedBody
+from app.utils.logger import log_debug
+
+ALLOWED_TAGS = {
+    "p", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "li", "strong", "em", "code", "pre",
+    "blockquote", "hr", "br", "table", "thead", "tbody", "tr", "th", "td", "a", "del"
+}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title"},
+    "th": {"style"},
+    "td": {"style"},
+    "ol": {"start"},
+}
+SAFE_URL = re.compile(r'^(?:https?:|mailto:|#|/(?!/))', re.IGNORECASE)
+SAFE_STYLE = re.compile(r'^text-align: (?:left|center|right);?$')
+
+class _SanitizeTreeprocessor(Treeprocessor):
+    """Allowlist tags, attributes and link targets in the rendered tree"""
+
+    def run(self, root: Element):
+        self._sanitize(root)
+
+    def _sanitize(self, parent: Element):
+        for child in list(parent):
+            if child.tag not in ALLOWED_TAGS:
+                # Images and anything unexpected are dropped, their tail text is kept
+                self._drop(parent, child)
+                continue
+
+            allowed = ALLOWED_ATTRIBUTES.get(child.tag, set())
+            for name in list(child.attrib):
+                value = child.attrib[name]
+                if (name not in allowed
+                        or (name == "href" and not SAFE_URL.match(value.strip()))
+                        or (name == "style" and not SAFE_STYLE.match(value))):
+                    del child.attrib[name]
+            if child.tag == "a" and "href" in child.attrib:
+                child.set("rel", "nofollow noopener noreferrer")
+
+            self._sanitize(child)
+
+    @staticmethod
+    def _drop(parent: Element, child: Element):
+        if child.tail:
+            index = list(parent).index(child)
+            if index > 0:
+                previous = parent[index - 1]
+                previous.tail = (previous.tail or "") + child.tail
+            else:
+                parent.text = (parent.text or "") + child.tail
+        parent.remove(child)
+
+def render_html(markdown_text: str) -> str:
+    """Render markdown to sanitised HTML (raw HTML in the source is escaped, not passed through)"""
+    md = markdown.Markdown(extensions=["tables", "sane_lists"], output_format="html")
+    md.preprocessors.deregister("html_block")
+    md.inlinePatterns.deregister("html")
+    md.treeprocessors.register(_SanitizeTreeprocessor(md), "sanitize", 0)
+    return md.convert(markdown_text or "")
+
+def build_html_body(markdown_text: str) -> CachedBody:
+    """Render and precompress an HTML fragment"""
+    return CachedBody.build(render_html(markdown_text).encode("utf-8"), "text/html; charset=utf-8")
+
+class PreviewCache:
+    """Pre-rendered, compressed analysis previews (LRU bounded, one render per analysis)"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, analysis_id: str) -> Optional[CachedBody]:
+        with self.lock:
+            body = self.entries.get(analysis_id)
+            if body is not None:
+                self.entries.move_to_end(analysis_id)
+            return body
+
+    def put(self, analysis_id: str, body: CachedBody):
+        with self.lock:
+            self.entries[analysis_id] = body
+            self.entries.move_to_end(analysis_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        encoded = ", ".join(f"{name} {len(data)}" for name, data in body.encoded.items())
+        log_debug(f"Cached preview for {analysis_id} ({len(body.identity)} bytes; {encoded})", "HTML_PREVIEW")
+
+    def discard(self, analysis_id: str):
+        with self.lock:
+            self.entries.pop(analysis_id, None)
+
+# Global preview cache instance
+preview_cache = PreviewCache(settings.PREVIEW_CACHE_SIZE)
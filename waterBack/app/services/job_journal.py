@@ -0,0 +1,225 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, TextIO, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: single worker, no slot locking
+    fcntl = None
+
+from app.config import settings
+from app.utils.logger import log_debug, log_error, log_info, log_warning
+
+@dataclass
+class JournaledJob:
+    """Unfinished job read back from the journal"""
+    analysis_id: str
+    submitted: Dict[str, Any]  # upload details needed to rebuild the session
+    stages: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # completed stage -> its output
+
+class JobJournal:
+    """
+    Append-only JSON-lines record of job transitions: submitted, stage completed (with the stage
+    output needed to skip it) and finished. Lines of unfinished jobs are also kept in memory so the
+    file can be rewritten without finished jobs once it grows past JOB_JOURNAL_COMPACT_MB.
+    Records are queued to a single writer task that writes (and fsyncs) each batch and compacts in
+    a thread, so file I/O never runs on the event loop; callers await their record being written.
+    Each worker process owns one journal file (slot), claimed with an exclusive lock, so a restarted
+    worker recovers the slot left behind by the one it replaces.
+    """
+
+    MAX_SLOTS = 64
+
+    def __init__(self, path: str, fsync: bool, compact_bytes: int):
+        self.base_path = path
+        self.fsync = fsync
+        self.compact_bytes = compact_bytes
+        self.path: Optional[str] = None
+        self.file: Optional[TextIO] = None
+        self.lock_file: Optional[TextIO] = None
+        self.jobs: Set[str] = set()  # submitted and not finished, including records still queued
+        self.active: Dict[str, List[str]] = {}  # analysis_id -> written journal lines
+        self.written = 0
+        self.queue: Optional[asyncio.Queue] = None
+        self.writer: Optional[asyncio.Task] = None
+
+    def _slot_path(self, slot: int) -> str:
+        if slot == 0:
+            return self.base_path
+        root, ext = os.path.splitext(self.base_path)
+        return f"{root}.{slot}{ext}"
+
+    def _claim_slot(self) -> Optional[str]:
+        for slot in range(self.MAX_SLOTS if fcntl else 1):
+            path = self._slot_path(slot)
+            lock_file = open(path + ".lock", "a")
+            if fcntl:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    lock_file.close()
+                    continue
+            self.lock_file = lock_file
+            return path
+        return None
+
+    async def recover(self) -> List[JournaledJob]:
+        """Claim a journal slot, start the writer and return the jobs the slot holds that never finished"""
+        if not self.base_path or self.file is not None:
+            return []
+
+        jobs = await asyncio.to_thread(self._recover)
+        if self.file is not None:
+            self.jobs = {job.analysis_id for job in jobs}
+            self.queue = asyncio.Queue()
+            self.writer = asyncio.create_task(self._write_loop())
+        return jobs
+
+    def _recover(self) -> List[JournaledJob]:
+        directory = os.path.dirname(self.base_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = self._claim_slot()
+        if self.path is None:
+            log_error(f"No free job journal slot next to {self.base_path}, journal disabled", "JOB_JOURNAL")
+            return []
+
+        jobs: Dict[str, JournaledJob] = {}
+        self.active = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write
+                        log_warning(f"Skipping unreadable job journal line in {self.path}", "JOB_JOURNAL")
+                        continue
+                    self._replay(record, line if line.endswith("\n") else line + "\n", jobs)
+
+        self._compact(self._active_lines())
+        log_info(f"Job journal {self.path}: {len(jobs)} unfinished jobs", "JOB_JOURNAL")
+        return list(jobs.values())
+
+    def _replay(self, record: Dict[str, Any], line: str, jobs: Dict[str, JournaledJob]):
+        analysis_id = record.get("id")
+        event = record.get("event")
+        if event == "submitted":
+            jobs[analysis_id] = JournaledJob(analysis_id, record.get("data") or {})
+            self.active[analysis_id] = [line]
+        elif analysis_id in jobs and event == "stage":
+            jobs[analysis_id].stages[record["stage"]] = record.get("data") or {}
+            self.active[analysis_id].append(line)
+        elif event == "finished":
+            jobs.pop(analysis_id, None)
+            self.active.pop(analysis_id, None)
+
+    def _active_lines(self) -> List[str]:
+        return [line for lines in self.active.values() for line in lines]
+
+    def _compact(self, lines: List[str]):
+        """Rewrite the journal with only the given lines (those of unfinished jobs), in a thread"""
+        if self.file is not None:
+            self.file.close()
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as journal:
+            journal.writelines(lines)
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temp_path, self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.written = 0
+
+    def _write(self, lines: List[str]):
+        """Append a batch of lines with one flush (and fsync), in a thread"""
+        self.file.writelines(lines)
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self.queue.get()]
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            closing = None in batch
+            batch = [item for item in batch if item is not None]
+            if batch:
+                await self._write_batch(batch)
+            if closing:
+                return
+
+    async def _write_batch(self, batch: List[Tuple[str, str, str, asyncio.Future]]):
+        try:
+            await asyncio.to_thread(self._write, [line for _, _, line, _ in batch])
+            written = True
+        except Exception as e:
+            log_error(f"Job journal write failed for {len(batch)} records: {str(e)}", "JOB_JOURNAL")
+            written = False
+
+        finished = False
+        for analysis_id, event, line, future in batch:
+            if written:
+                self.written += len(line)
+                if event == "finished":
+                    self.active.pop(analysis_id, None)
+                    finished = True
+                else:
+                    self.active.setdefault(analysis_id, []).append(line)
+            if not future.done():
+                future.set_result(None)
+
+        if finished and self.written > self.compact_bytes:
+            try:
+                await asyncio.to_thread(self._compact, self._active_lines())
+                log_debug(f"Compacted job journal ({len(self.active)} unfinished jobs)", "JOB_JOURNAL")
+            except Exception as e:
+                log_error(f"Job journal compaction failed: {str(e)}", "JOB_JOURNAL")
+
+    async def _append(self, analysis_id: str, record: Dict[str, Any]):
+        if self.queue is None:
+            return
+        record["t"] = round(time.time(), 3)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        written = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((analysis_id, record["event"], line, written))
+        await written
+
+    async def submitted(self, analysis_id: str, data: Dict[str, Any]):
+        self.jobs.add(analysis_id)
+        await self._append(analysis_id, {"event": "submitted", "id": analysis_id, "data": data})
+
+    async def stage_done(self, analysis_id: str, stage: str, data: Optional[Dict[str, Any]] = None):
+        if analysis_id in self.jobs:
+            await self._append(analysis_id, {"event": "stage", "id": analysis_id, "stage": stage, "data": data})
+
+    async def finished(self, analysis_id: str, status: str):
+        if analysis_id in self.jobs:
+            self.jobs.discard(analysis_id)
+            await self._append(analysis_id, {"event": "finished", "id": analysis_id, "status": status})
+
+    async def close(self):
+        """Write what is still queued and close the journal; unfinished jobs are resumed on the next start"""
+        if self.writer is not None:
+            self.queue.put_nowait(None)
+            await self.writer
+            self.writer = None
+            self.queue = None
+        if self.file is not None:
+            if self.active:
+                log_info(f"Job journal closed with {len(self.active)} unfinished jobs", "JOB_JOURNAL")
+            self.file.close()
+            self.file = None
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+# Global job journal instance
+job_journal = JobJournal(
+    settings.JOB_JOURNAL_PATH,
+    settings.JOB_JOURNAL_FSYNC,
+    settings.JOB_JOURNAL_COMPACT_MB * 1024 * 1024
+)
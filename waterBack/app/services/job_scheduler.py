@@ -0,0 +1,230 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.config import settings
+from app.utils.logger import log_debug, log_error, log_info, log_warning
+from app.services.workflow_manager import workflow_manager
+
+class JobRejectedError(Exception):
+    """Raised when a job cannot be accepted (queue full or scheduler draining)"""
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+@dataclass
+class Job:
+    """Queued analysis job"""
+    analysis_id: str
+    func: Callable[..., Awaitable[Any]]
+    args: tuple = ()
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+
+class JobScheduler:
+    """Bounded job queue with a fixed worker pool and per-stage concurrency limits"""
+
+    STAGES = ('extract', 'llm', 'render')
+
+    def __init__(self):
+        self.worker_count = settings.JOB_WORKERS
+        self.max_queue_size = settings.JOB_QUEUE_SIZE
+        self.stage_limits: Dict[str, int] = {
+            'extract': settings.STAGE_WORKERS_EXTRACT,
+            'llm': settings.STAGE_WORKERS_LLM,
+            'render': settings.STAGE_WORKERS_RENDER
+        }
+        self.stage_semaphores: Dict[str, asyncio.Semaphore] = {
+            stage: asyncio.Semaphore(limit) for stage, limit in self.stage_limits.items()
+        }
+        self.stage_waiting: Dict[str, int] = {stage: 0 for stage in self.STAGES}
+        self.stage_active: Dict[str, int] = {stage: 0 for stage in self.STAGES}
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.pending: "OrderedDict[str, Job]" = OrderedDict()
+        self.running: Dict[str, Job] = {}
+        self.finished_stages: Dict[str, Set[str]] = {}  # running job -> stages it has completed
+        self.workers: List[asyncio.Task] = []
+        self.accepting = False
+
+        # Moving average of end-to-end job duration, seeded from the workflow estimates
+        self.avg_job_seconds = sum(step.estimated_duration for step in workflow_manager.workflow_steps)
+
+    async def start(self):
+        """Start worker pool"""
+        if self.workers:
+            return
+
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.accepting = True
+        self.workers = [
+            asyncio.create_task(self._worker_loop(index)) for index in range(self.worker_count)
+        ]
+        log_info(
+            f"Started job scheduler ({self.worker_count} workers, queue {self.max_queue_size}, "
+            f"stages {self.stage_limits})",
+            "JOB_SCHEDULER"
+        )
+
+    async def shutdown(self, timeout: float):
+        """Stop accepting jobs and drain queued/running jobs within the deadline"""
+        if not self.workers:
+            return
+
+        self.accepting = False
+        log_info(f"Draining job scheduler ({self.queue_depth()} queued, {len(self.running)} running)", "JOB_SCHEDULER")
+
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+            log_info("Job scheduler drained", "JOB_SCHEDULER")
+        except asyncio.TimeoutError:
+            log_warning(
+                f"Drain deadline ({timeout}s) exceeded, cancelling {len(self.running)} running jobs",
+                "JOB_SCHEDULER"
+            )
+
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def submit(self, analysis_id: str, func: Callable[..., Awaitable[Any]], *args) -> int:
+        """
+        Enqueue a job. Returns its 1-based queue position.
+        Raises JobRejectedError when the queue is full or the scheduler is draining.
+        """
+        if not self.accepting or self.queue is None:
+            raise JobRejectedError("Server is shutting down, try again shortly", retry_after=30)
+
+        job = Job(analysis_id=analysis_id, func=func, args=args)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobRejectedError(
+                f"Analysis queue is full ({self.max_queue_size} jobs waiting)",
+                retry_after=self._retry_after_seconds()
+            )
+
+        self.pending[analysis_id] = job
+        position = len(self.pending)
+        log_debug(f"Queued job {analysis_id} at position {position}", "JOB_SCHEDULER")
+        return position
+
+    @asynccontextmanager
+    async def stage_slot(self, stage: str):
+        """Limit how many jobs run a given stage (extract, llm, render) concurrently"""
+        semaphore = self.stage_semaphores[stage]
+        self.stage_waiting[stage] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.stage_waiting[stage] -= 1
+
+        self.stage_active[stage] += 1
+        try:
+            yield
+        finally:
+            self.stage_active[stage] -= 1
+            semaphore.release()
+
+    def get_job_info(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Queue position and ETA for a job, None if the scheduler does not know it"""
+        if analysis_id in self.running:
+            job = self.running[analysis_id]
+            elapsed = time.time() - job.started_at
+            return {
+                "state": "running",
+                "queuePosition": 0,
+                "etaSeconds": round(max(0.0, self.avg_job_seconds - elapsed), 1)
+            }
+
+        if analysis_id in self.pending:
+            position = list(self.pending).index(analysis_id) + 1
+            # Jobs ahead of us are processed in waves of `worker_count`
+            waves = math.ceil(position / max(1, self.worker_count))
+            return {
+                "state": "queued",
+                "queuePosition": position,
+                "etaSeconds": round(waves * self.avg_job_seconds, 1)
+            }
+
+        return None
+
+    def mark_stage_done(self, analysis_id: str, stage: str):
+        """Record that a running job has finished a stage (feeds the per-stage backlog)"""
+        if analysis_id in self.running:
+            self.finished_stages.setdefault(analysis_id, set()).add(stage)
+
+    def stage_backlog(self, stage: str) -> int:
+        """Jobs queued or running that have not finished the given stage yet"""
+        running = sum(1 for analysis_id in self.running if stage not in self.finished_stages.get(analysis_id, ()))
+        return len(self.pending) + running
+
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return len(self.pending)
+
+    def in_flight_count(self) -> int:
+        """Number of jobs queued or running"""
+        return len(self.pending) + len(self.running)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Scheduler statistics"""
+        return {
+            "accepting": self.accepting,
+            "workers": self.worker_count,
+            "queued": len(self.pending),
+            "running": len(self.running),
+            "queueCapacity": self.max_queue_size,
+            "avgJobSeconds": round(self.avg_job_seconds, 1),
+            "stages": {
+                stage: {
+                    "limit": self.stage_limits[stage],
+                    "active": self.stage_active[stage],
+                    "waiting": self.stage_waiting[stage]
+                } for stage in self.STAGES
+            }
+        }
+
+    async def _worker_loop(self, index: int):
+        """Pull jobs from the queue and run them one at a time"""
+        while True:
+            job = await self.queue.get()
+            self.pending.pop(job.analysis_id, None)
+            job.started_at = time.time()
+            self.running[job.analysis_id] = job
+
+            try:
+                log_debug(f"Worker {index} running {job.analysis_id}", "JOB_SCHEDULER")
+                await job.func(*job.args)
+                # Pipelines report their own failures on the session; only completed runs shape the ETA
+                if await self._completed(job.analysis_id):
+                    self._record_duration(time.time() - job.started_at)
+            except asyncio.CancelledError:
+                log_warning(f"Job {job.analysis_id} cancelled", "JOB_SCHEDULER")
+                raise
+            except Exception as e:
+                log_error(f"Job {job.analysis_id} failed: {str(e)}", "JOB_SCHEDULER")
+            finally:
+                self.running.pop(job.analysis_id, None)
+                self.finished_stages.pop(job.analysis_id, None)
+                self.queue.task_done()
+
+    async def _completed(self, analysis_id: str) -> bool:
+        session = await workflow_manager.get_session(analysis_id)
+        return session is not None and session.status == "completed"
+
+    def _record_duration(self, duration: float):
+        """Update the exponential moving average used for ETAs"""
+        self.avg_job_seconds = 0.8 * self.avg_job_seconds + 0.2 * duration
+
+    def _retry_after_seconds(self) -> int:
+        """Rough time until a queue slot frees up"""
+        return max(1, int(self.avg_job_seconds / max(1, self.worker_count)))
+
+# Global job scheduler instance
+job_scheduler = JobScheduler()
@@ -0,0 +1,103 @@
+import asyncio
+from pathlib import Path
+from typing import Optional, Tuple
+
+from app.config import settings
+from app.utils.logger import log_error, log_info
+from app.utils.file_handler import file_handler
+from app.utils.http_cache import CachedBody
+from app.services.html_preview import build_html_body
+from app.services.report_generator import report_generator
+
+class KnowledgeBase:
+    """Static knowledge base appended to every report, pre-rendered to PDF pages once"""
+
+    SEPARATOR = "\n\n---\n\n"
+
+    def __init__(self):
+        self.source_path = Path(settings.KNOWLEDGE_BASE_PATH)
+        self.markdown: Optional[str] = None
+        self.pdf_pages: Optional[bytes] = None
+        self.html: Optional[CachedBody] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        """Read and pre-render the knowledge base (at startup)"""
+        await self.refresh_if_changed()
+
+    async def refresh_if_changed(self):
+        """Re-render when the source file changed since the last render"""
+        signature = self._read_signature()
+        if signature is not None and signature == self._signature:
+            return
+
+        async with self._lock:
+            signature = self._read_signature()
+            if signature is None:
+                if self._signature is not None:
+                    log_error(f"Knowledge base file disappeared: {self.source_path}", "KNOWLEDGE_BASE")
+                self.markdown = None
+                self.pdf_pages = None
+                self.html = None
+                self._signature = None
+                return
+
+            if signature == self._signature:
+                return
+
+            try:
+                markdown = await file_handler.read_file_async(str(self.source_path))
+                # Layout is CPU-bound, keep it off the event loop
+                pdf_pages = await asyncio.to_thread(report_generator.render_appendix_pdf, markdown)
+                html = await asyncio.to_thread(build_html_body, markdown)
+            except Exception as e:
+                log_error(f"Failed to render knowledge base: {str(e)}", "KNOWLEDGE_BASE")
+                return
+
+            self.markdown = markdown
+            self.pdf_pages = pdf_pages
+            self.html = html
+            self._signature = signature
+            log_info(
+                f"Rendered knowledge base {self.source_path} ({len(markdown)} chars -> {len(pdf_pages)} bytes PDF)",
+                "KNOWLEDGE_BASE"
+            )
+
+    async def get_markdown(self) -> Optional[str]:
+        """Knowledge base markdown, None if unavailable"""
+        await self.refresh_if_changed()
+        return self.markdown
+
+    async def get_pdf_pages(self) -> Optional[bytes]:
+        """Pre-rendered knowledge base pages, None if unavailable"""
+        await self.refresh_if_changed()
+        return self.pdf_pages
+
+    async def get_html(self) -> Optional[CachedBody]:
+        """Pre-rendered, compressed knowledge base HTML, None if unavailable"""
+        await self.refresh_if_changed()
+        return self.html
+    
+    @property
+    def html_url(self) -> Optional[str]:
+        """Immutable URL of the current knowledge base HTML (changes with the content)"""
+        if self.html is None:
+            return None
+        return f"/api/knowledge-base/{self.html.digest}.html"
+    
+    def compose_markdown(self, analysis_markdown: Optional[str]) -> Optional[str]:
+        """Full report markdown: analysis followed by the knowledge base"""
+        if analysis_markdown is None or not self.markdown:
+            return analysis_markdown
+        return analysis_markdown + self.SEPARATOR + self.markdown
+
+    def _read_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.source_path.stat()
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+# Global knowledge base instance
+knowledge_base = KnowledgeBase()
@@ -0,0 +1,294 @@
+import copy
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from reportlab.lib.colors import HexColor
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle, StyleSheet1
+from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+
+# Block-level tokens, matched once per (left-stripped) line
+_BLOCK_PATTERN = re.compile(
+    r'(?P<separator>(?:-\s*){3,}$)'
+    r'|(?P<heading>#{1,6})\s*(?P<heading_text>.*)'
+    r'|(?P<table>\|.*)'
+    r'|(?:(?P<bullet>[-*+•])|(?P<number>\d+)[.)])\s+(?P<item_text>.*)'
+)
+_TOP_LEVEL_HEADING = re.compile(r'^[ \t]*#{1,2}[ \t]', re.MULTILINE)
+_BLOCK_KINDS = {'separator': 'separator', 'heading_text': 'heading', 'table': 'table', 'item_text': 'item'}
+_TABLE_DELIMITER = re.compile(r'^\|?\s*:?-{3,}:?\s*(?:\|\s*:?-{3,}:?\s*)*\|?\s*$')
+_TABLE_CELL_SPLIT = re.compile(r'(?<!\\)\|')
+
+# Inline formatting
+_BOLD = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC = re.compile(r'\*(.*?)\*')
+_LIST_BULLET = re.compile(r'^\s*[\*\-\+]\s+(.+)$', re.MULTILINE)
+_LIST_NUMBER = re.compile(r'^\s*(\d+)\.\s+(.+)$', re.MULTILINE)
+
+# Status keywords highlighted in list items (case-folded, warnings take precedence)
+_WARNING_KEYWORDS = ('niebezpieczn', 'błąd', 'niezgodne', 'przekroczenie')
+_SUCCESS_KEYWORDS = ('dobra', 'bezpieczn', 'w normie', 'doskonały')
+_KEYWORD_PATTERN = re.compile(
+    '(?P<warning>' + '|'.join(map(re.escape, _WARNING_KEYWORDS)) + ')'
+    '|(?P<success>' + '|'.join(map(re.escape, _SUCCESS_KEYWORDS)) + ')'
+)
+
+SEPARATOR_LINE = "━" * 91
+BULLETS = ('•', '◦', '▪')
+INDENT_STEP = 15
+
+def format_inline(text: str) -> str:
+    """Escape XML and convert **bold** / *italic* to ReportLab markup"""
+    if not text:
+        return ""
+    text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    if '*' not in text:
+        return text
+    text = _BOLD.sub(r'<b>\1</b>', text)
+    return _ITALIC.sub(r'<i>\1</i>', text)
+
+def to_reportlab_markup(text: str) -> str:
+    """Convert a whole markdown fragment to a single paragraph of ReportLab markup"""
+    text = format_inline(text)
+    text = _LIST_BULLET.sub(r'• \1', text)
+    text = _LIST_NUMBER.sub(r'\1. \2', text)
+    return text.replace('\n', '<br/>')
+
+def split_sections(markdown: str) -> List[str]:
+    """Split markdown before every top-level (# / ##) heading; text before the first heading stays with it"""
+    starts = [match.start() for match in _TOP_LEVEL_HEADING.finditer(markdown) if match.start() > 0]
+    bounds = [0] + starts + [len(markdown)]
+    return [markdown[start:end] for start, end in zip(bounds, bounds[1:]) if markdown[start:end].strip()]
+
+def group_sections(sections: List[str], count: int) -> List[str]:
+    """Join consecutive sections into at most count groups of roughly equal length"""
+    if count <= 1 or len(sections) <= 1:
+        return [''.join(sections)]
+
+    target = sum(map(len, sections)) / min(count, len(sections))
+    groups: List[str] = []
+    current: List[str] = []
+    current_size = 0
+    for index, section in enumerate(sections):
+        current.append(section)
+        current_size += len(section)
+        groups_left = count - len(groups) - 1
+        sections_left = len(sections) - index - 1
+        if groups_left and sections_left and (current_size >= target or sections_left <= groups_left - 1):
+            groups.append(''.join(current))
+            current, current_size = [], 0
+    if current:
+        groups.append(''.join(current))
+    return groups
+
+def classify_status(text: str) -> Optional[str]:
+    """'warning', 'success' or None based on status keywords in the text"""
+    status = None
+    for match in _KEYWORD_PATTERN.finditer(text.casefold()):
+        if match.lastgroup == 'warning':
+            return 'warning'
+        status = 'success'
+    return status
+
+@dataclass
+class _ListItem:
+    depth: int
+    marker: str
+    lines: List[str] = field(default_factory=list)
+
+class MarkdownFlowables:
+    """Single-pass markdown to ReportLab flowables converter (headings, lists, tables, separators)"""
+
+    STATUS_STYLES = {'warning': 'WarningText', 'success': 'SuccessText', None: 'ParameterText'}
+    HEADING_STYLES = {1: 'SectionHeader', 2: 'SubsectionHeader'}
+
+    def __init__(self, styles: StyleSheet1, available_width: float, base_font: str, bold_font: str):
+        self.styles = styles
+        self.available_width = available_width
+        self.base_font = base_font
+        self.bold_font = bold_font
+        self._list_styles: Dict[Tuple[str, int], ParagraphStyle] = {}
+        self._cell_styles: Dict[Tuple[bool, int], ParagraphStyle] = {}
+        self._separator = Paragraph(SEPARATOR_LINE, styles['Separator'])
+
+    def convert(self, content: str, story: list):
+        """Append flowables for the markdown content to story"""
+        paragraph: List[str] = []
+        item: Optional[_ListItem] = None
+        indent_stack: List[int] = []
+        table_rows: List[str] = []
+
+        def flush_paragraph(spacer: bool):
+            if paragraph:
+                story.append(Paragraph(format_inline(' '.join(paragraph)), self.styles['ReportBodyText']))
+                if spacer:
+                    story.append(Spacer(1, 6))
+                paragraph.clear()
+
+        def flush_item():
+            nonlocal item
+            if item is not None:
+                self._append_list_item(story, item)
+                item = None
+
+        def flush_table():
+            if table_rows:
+                self._append_table(story, table_rows)
+                table_rows.clear()
+
+        for raw_line in content.split('\n'):
+            line = raw_line.strip()
+
+            if not line:
+                flush_item()
+                flush_table()
+                flush_paragraph(spacer=True)
+                continue
+
+            match = _BLOCK_PATTERN.match(line)
+            kind = _BLOCK_KINDS.get(match.lastgroup) if match else None
+
+            if kind == 'table':
+                if not table_rows:
+                    flush_item()
+                    flush_paragraph(spacer=False)
+                table_rows.append(line)
+                continue
+            flush_table()
+
+            if kind == 'item':
+                flush_item()
+                flush_paragraph(spacer=False)
+                expanded = raw_line.expandtabs(4)
+                indent = len(expanded) - len(expanded.lstrip())
+                while indent_stack and indent < indent_stack[-1]:
+                    indent_stack.pop()
+                if not indent_stack or indent > indent_stack[-1]:
+                    indent_stack.append(indent)
+                depth = min(len(indent_stack) - 1, len(BULLETS) - 1)
+                number = match.group('number')
+                item = _ListItem(depth, f"{number}." if number else BULLETS[depth], [match.group('item_text')])
+                continue
+
+            if kind is None and item is not None and raw_line[:1].isspace():
+                # Indented continuation of the current list item
+                item.lines.append(line)
+                continue
+
+            flush_item()
+            indent_stack.clear()
+
+            if kind == 'separator':
+                flush_paragraph(spacer=False)
+                story.append(Spacer(1, 10))
+                story.append(copy.copy(self._separator))
+                story.append(Spacer(1, 10))
+            elif kind == 'heading':
+                flush_paragraph(spacer=False)
+                style = self.HEADING_STYLES.get(len(match.group('heading')), 'MinorHeader')
+                story.append(Paragraph(format_inline(match.group('heading_text').strip()), self.styles[style]))
+            else:
+                paragraph.append(line)
+
+        flush_item()
+        flush_table()
+        flush_paragraph(spacer=True)
+
+    def _append_list_item(self, story: list, item: _ListItem):
+        text = ' '.join(item.lines)
+        style = self._list_style(self.STATUS_STYLES[classify_status(text)], item.depth)
+        story.append(Paragraph(f"{item.marker} {format_inline(text)}", style))
+        story.append(Spacer(1, 4))
+
+    def _list_style(self, base_name: str, depth: int) -> ParagraphStyle:
+        """List item style for a nesting depth (depth 0 is the base style itself)"""
+        base = self.styles[base_name]
+        if depth == 0:
+            return base
+        key = (base_name, depth)
+        style = self._list_styles.get(key)
+        if style is None:
+            style = ParagraphStyle(
+                name=f"{base_name}Level{depth}",
+                parent=base,
+                leftIndent=base.leftIndent + depth * INDENT_STEP,
+                spaceAfter=max(2, base.spaceAfter - 2)
+            )
+            self._list_styles[key] = style
+        return style
+
+    def _append_table(self, story: list, rows: List[str]):
+        cells = [self._split_row(row) for row in rows]
+        header = None
+        alignments: List[int] = []
+
+        if len(cells) > 1 and _TABLE_DELIMITER.match(rows[1]):
+            header = cells[0]
+            alignments = [self._column_alignment(spec) for spec in cells[1]]
+            cells = cells[2:]
+
+        column_count = max(len(row) for row in ([header] if header else []) + cells)
+        alignments += [TA_LEFT] * (column_count - len(alignments))
+
+        data = []
+        if header:
+            data.append(self._table_row(header, column_count, alignments, bold=True))
+        data.extend(self._table_row(row, column_count, alignments, bold=False) for row in cells)
+
+        table = Table(data, colWidths=[self.available_width / column_count] * column_count, repeatRows=1 if header else 0)
+        commands = [
+            ('GRID', (0, 0), (-1, -1), 0.5, HexColor('#e5e7eb')),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+        ]
+        if header:
+            commands.append(('BACKGROUND', (0, 0), (-1, 0), HexColor('#dbeafe')))
+            commands.append(('ROWBACKGROUNDS', (0, 1), (-1, -1), [HexColor('#f9fafb'), HexColor('#ffffff')]))
+        table.setStyle(TableStyle(commands))
+
+        story.append(table)
+        story.append(Spacer(1, 10))
+
+    def _table_row(self, row: List[str], column_count: int, alignments: List[int], bold: bool) -> List[Paragraph]:
+        row = row + [''] * (column_count - len(row))
+        return [
+            Paragraph(format_inline(cell), self._cell_style(bold, alignments[index]))
+            for index, cell in enumerate(row[:column_count])
+        ]
+
+    def _cell_style(self, bold: bool, alignment: int) -> ParagraphStyle:
+        key = (bold, alignment)
+        style = self._cell_styles.get(key)
+        if style is None:
+            style = ParagraphStyle(
+                name=f"TableCell{'Header' if bold else ''}{alignment}",
+                parent=self.styles['Normal'],
+                fontName=self.bold_font if bold else self.base_font,
+                fontSize=9,
+                leading=11,
+                textColor=HexColor('#1e40af') if bold else HexColor('#000000'),
+                alignment=alignment
+            )
+            self._cell_styles[key] = style
+        return style
+
+    @staticmethod
+    def _split_row(row: str) -> List[str]:
+        row = row.strip()
+        if row.startswith('|'):
+            row = row[1:]
+        if row.endswith('|') and not row.endswith('\\|'):
+            row = row[:-1]
+        return [cell.strip().replace('\\|', '|') for cell in _TABLE_CELL_SPLIT.split(row)]
+
+    @staticmethod
+    def _column_alignment(spec: str) -> int:
+        if spec.startswith(':') and spec.endswith(':'):
+            return TA_CENTER
+        if spec.endswith(':'):
+            return TA_RIGHT
+        return TA_LEFT
@@ -1,3 +1,4 @@
+import asyncio
 import pypdf
 import pdfplumber
 import re
@@ -19,9 +20,10 @@ class PDFProcessor:
         try:
             log_info(f"Extracting text from PDF: {file_path}", "PDF_PROCESSOR")
             
+            # Parsing is CPU-bound, keep it off the event loop
             # Try pdfplumber first (better for tables)
             try:
-                text = self._extract_with_pdfplumber(file_path)
+                text = await asyncio.to_thread(self._extract_with_pdfplumber, file_path)
                 if text and len(text.strip()) > 100:  # Reasonable amount of text
                     return text
             except Exception as e:
@@ -29,7 +31,7 @@ class PDFProcessor:
             
             # Fallback to pypdf
             try:
-                text = self._extract_with_pypdf(file_path)
+                text = await asyncio.to_thread(self._extract_with_pypdf, file_path)
                 if text and len(text.strip()) > 50:
                     return text
             except Exception as e:
@@ -0,0 +1,249 @@
+import asyncio
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from app.models.water_data import AnalysisSession
+from app.services.event_bus import BusEvent
+from app.services.session_store import SessionStore, estimate_size
+from app.utils.logger import log_debug, log_error, log_info, log_warning
+
+# Statuses a session can move between (each has its own index)
+SESSION_STATUSES = ("processing", "completed", "error")
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions as Redis hashes, shared by every node (asyncio client, so a slow Redis never
+    stalls the event loop). Indexed by start time and by status (sorted sets scored by
+    start time). Parsed sessions are cached per node while the
+    event relay is subscribed: every save publishes the session ID, and other nodes drop
+    their cached copy when it arrives. The cache is off whenever that subscription is down.
+    """
+
+    def __init__(self, url: str, prefix: str, cache_size: int):
+        self.client = aioredis.from_url(url, socket_timeout=5.0, socket_connect_timeout=5.0)
+        self.prefix = prefix
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, AnalysisSession]" = OrderedDict()
+        self.cache_enabled = False
+        self.invalidations = 0  # bumped on every invalidation, a read spanning one is not cached
+        self.node_id = uuid.uuid4().hex[:12]
+        self.changes_channel = f"{prefix}sessions:changed"
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, analysis_id: str) -> str:
+        return f"{self.prefix}session:{analysis_id}"
+
+    def _status_index(self, status: str) -> str:
+        return f"{self.prefix}sessions:status:{status}"
+
+    def _started_index(self) -> str:
+        return f"{self.prefix}sessions:started"
+
+    def set_cache_enabled(self, enabled: bool):
+        """Cached sessions are only trusted while change notifications are received"""
+        self.cache.clear()
+        self.cache_enabled = enabled
+        self.invalidations += 1
+
+    def invalidate(self, analysis_id: str):
+        self.cache.pop(analysis_id, None)
+        self.invalidations += 1
+
+    def _remember(self, session: AnalysisSession):
+        if not self.cache_enabled:
+            return
+        self.cache[session.id] = session
+        self.cache.move_to_end(session.id)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def get(self, analysis_id: str) -> Optional[AnalysisSession]:
+        session = self.cache.get(analysis_id) if self.cache_enabled else None
+        if session is not None:
+            self.cache.move_to_end(analysis_id)
+            self.hits += 1
+            return session
+
+        self.misses += 1
+        invalidations = self.invalidations
+        data = await self.client.hget(self._key(analysis_id), "data")
+        if data is None:
+            return None
+        session = AnalysisSession.model_validate_json(data)
+        # The copy read may already be stale if a change notification arrived meanwhile
+        if invalidations == self.invalidations:
+            self._remember(session)
+        return session
+
+    async def save(self, session: AnalysisSession):
+        started = session.startTime.timestamp()
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(self._key(session.id), mapping={
+            "data": session.model_dump_json(),
+            "status": session.status,
+            "start_time": started
+        })
+        pipe.hincrby(self._key(session.id), "version", 1)
+        pipe.zadd(self._started_index(), {session.id: started})
+        for status in SESSION_STATUSES:
+            if status != session.status:
+                pipe.zrem(self._status_index(status), session.id)
+        pipe.zadd(self._status_index(session.status), {session.id: started})
+        pipe.publish(self.changes_channel, f"{self.node_id} {session.id}")
+        await pipe.execute()
+        self._remember(session)
+
+    async def delete(self, analysis_id: str) -> bool:
+        self.cache.pop(analysis_id, None)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self._key(analysis_id))
+        pipe.zrem(self._started_index(), analysis_id)
+        for status in SESSION_STATUSES:
+            pipe.zrem(self._status_index(status), analysis_id)
+        pipe.publish(self.changes_channel, f"{self.node_id} {analysis_id}")
+        return (await pipe.execute())[0] > 0
+
+    async def list_ids(self, status: Optional[str] = None, started_before: Optional[datetime] = None) -> List[str]:
+        index = self._status_index(status) if status is not None else self._started_index()
+        maximum = f"({started_before.timestamp()}" if started_before is not None else "+inf"
+        return [member.decode() for member in await self.client.zrangebyscore(index, "-inf", maximum)]
+
+    async def count(self, status: Optional[str] = None) -> int:
+        index = self._status_index(status) if status is not None else self._started_index()
+        return await self.client.zcard(index)
+
+    async def usage(self, limit: int = 20) -> Dict[str, Any]:
+        ids = [member.decode() for member in await self.client.zrange(self._started_index(), 0, -1)]
+        pipe = self.client.pipeline(transaction=False)
+        for analysis_id in ids:
+            pipe.hget(self._key(analysis_id), "status")
+            pipe.hstrlen(self._key(analysis_id), "data")
+        replies = await pipe.execute()
+        sizes = [
+            {"id": analysis_id, "status": (status or b"").decode(), "bytes": size}
+            for analysis_id, status, size in zip(ids, replies[::2], replies[1::2])
+        ]
+        sizes.sort(key=lambda item: item["bytes"], reverse=True)
+        return {
+            "backend": "redis",
+            "sessions": len(ids),
+            "bytes": sum(item["bytes"] for item in sizes),
+            "cachedSessions": len(self.cache),
+            "cachedBytes": sum(estimate_size(session) for session in self.cache.values()),
+            "cacheHits": self.hits,
+            "cacheMisses": self.misses,
+            "largest": sizes[:limit]
+        }
+
+    async def close(self):
+        await self.client.aclose()
+
+class RedisEventRelay:
+    """
+    Carries progress events between nodes over Redis pub/sub. Local updates are queued and
+    published in pipelined batches off the request path; updates from other nodes are handed
+    to on_event. The same subscription receives session change notifications for the store's cache.
+    """
+
+    def __init__(self, url: str, prefix: str, store: RedisSessionStore,
+                 on_event: Callable[[str, int, bool, str], None]):
+        self.url = url
+        self.store = store
+        self.on_event = on_event
+        self.events_channel = f"{prefix}events"
+        self.outbox: Deque[Tuple[str, str]] = deque(maxlen=10000)
+        self.wakeup: Optional[asyncio.Event] = None
+        self.client: Optional[aioredis.Redis] = None
+        self.tasks: List[asyncio.Task] = []
+        self.relayed = 0
+        self.received = 0
+
+    async def start(self):
+        self.client = aioredis.from_url(self.url)
+        self.wakeup = asyncio.Event()
+        self.tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._flush())]
+        log_info(f"Redis event relay started (node {self.store.node_id})", "REDIS_BACKEND")
+
+    async def stop(self):
+        # Publish what is still queued (final updates) before closing
+        if self.client is not None and self.outbox:
+            try:
+                await self._publish_batch()
+            except Exception as e:
+                log_error(f"Redis event relay flush on stop failed: {str(e)}", "REDIS_BACKEND")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.store.set_cache_enabled(False)
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        log_info(f"Redis event relay stopped ({self.relayed} relayed, {self.received} received)", "REDIS_BACKEND")
+
+    def publish(self, analysis_id: str, event: BusEvent):
+        """Queue a local update for other nodes (never blocks the caller)"""
+        if self.wakeup is None:
+            return
+        self.outbox.append((self.events_channel, f"{self.store.node_id} {analysis_id} {event.event_id} {int(event.coalescable)} {event.payload_json}"))
+        self.wakeup.set()
+
+    async def _publish_batch(self):
+        batch = list(self.outbox)
+        self.outbox.clear()
+        pipe = self.client.pipeline(transaction=False)
+        for channel, message in batch:
+            pipe.publish(channel, message)
+        await pipe.execute()
+        self.relayed += len(batch)
+
+    async def _flush(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            try:
+                await self._publish_batch()
+            except Exception as e:
+                log_error(f"Redis event publish failed: {str(e)}", "REDIS_BACKEND")
+                await asyncio.sleep(1)
+
+    async def _listen(self):
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.events_channel, self.store.changes_channel)
+                # Changes missed while disconnected are unknown, start with an empty cache
+                self.store.set_cache_enabled(True)
+                log_debug("Redis event relay subscribed", "REDIS_BACKEND")
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._dispatch(message["channel"].decode(), message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.store.set_cache_enabled(False)
+                log_warning(f"Redis event relay disconnected: {str(e)}, reconnecting", "REDIS_BACKEND")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def _dispatch(self, channel: str, data: str):
+        if channel == self.store.changes_channel:
+            node_id, analysis_id = data.split(" ", 1)
+            if node_id != self.store.node_id:
+                self.store.invalidate(analysis_id)
+            return
+
+        node_id, analysis_id, event_id, coalescable, payload_json = data.split(" ", 4)
+        if node_id == self.store.node_id:
+            return
+        self.received += 1
+        try:
+            self.on_event(analysis_id, int(event_id), coalescable == "1", payload_json)
+        except Exception as e:
+            log_error(f"Relayed event handling failed for {analysis_id}: {str(e)}", "REDIS_BACKEND")
@@ -0,0 +1,192 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.models.water_data import AnalysisContext
+from app.utils.logger import log_debug, log_error, log_info, log_warning
+
+def _init_worker():
+    """Worker initializer: register fonts and build the stylesheet once per process"""
+    from app.services.report_generator import report_generator
+    report_generator.warm_up()
+
+def _warm_up() -> int:
+    """No-op task used to spawn and initialise every worker ahead of the first report"""
+    time.sleep(0.05)
+    return os.getpid()
+
+def _render_in_worker(context: AnalysisContext, analysis_result: str,
+                      appendix_pdf: Optional[bytes]) -> Tuple[bytes, Dict[str, Any]]:
+    """Render a report inside a worker process"""
+    from app.services.report_generator import report_generator
+    pdf_bytes, timings = report_generator.render_report(context, analysis_result, appendix_pdf=appendix_pdf)
+    timings["pid"] = os.getpid()
+    return pdf_bytes, timings
+
+def _render_segment_in_worker(context: AnalysisContext, markdown: str, first: bool, last: bool) -> Tuple[bytes, float]:
+    """Lay out one report segment inside a worker process"""
+    from app.services.report_generator import report_generator
+    started = time.perf_counter()
+    pdf_bytes = report_generator.render_segment(context, markdown, first=first, last=last)
+    return pdf_bytes, time.perf_counter() - started
+
+def _finalize_in_worker(parts: List[bytes]) -> Tuple[bytes, float]:
+    """Merge segments and number pages inside a worker process"""
+    from app.services.report_generator import report_generator
+    started = time.perf_counter()
+    pdf_bytes = report_generator.finalize_pdf(parts)
+    return pdf_bytes, time.perf_counter() - started
+
+class RenderPool:
+    """Process pool for PDF rendering, keeping reportlab layout off the event loop"""
+
+    def __init__(self):
+        self.size = settings.RENDER_POOL_SIZE
+        self.timeout = settings.RENDER_TIMEOUT_SECONDS
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.stats: Dict[str, Any] = {
+            'renders': 0,
+            'failures': 0,
+            'timeouts': 0,
+            'total_seconds': 0.0,
+            'last': None
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.executor is not None
+
+    async def start(self):
+        """Start and prewarm worker processes"""
+        if self.executor or self.size <= 0:
+            return
+
+        self.executor = self._create_executor()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+
+        try:
+            pids = await asyncio.gather(*[
+                loop.run_in_executor(self.executor, _warm_up) for _ in range(self.size)
+            ])
+            log_info(
+                f"Started render pool with {len(set(pids))} workers in {time.perf_counter() - started:.2f}s",
+                "RENDER_POOL"
+            )
+        except Exception as e:
+            log_error(f"Render pool warm-up failed, rendering inline: {str(e)}", "RENDER_POOL")
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def stop(self):
+        """Stop worker processes"""
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            log_info("Stopped render pool", "RENDER_POOL")
+
+    async def render(self, context: AnalysisContext, analysis_result: str,
+                     appendix_pdf: Optional[bytes] = None) -> Tuple[bytes, Dict[str, Any]]:
+        """Render a report in a worker; returns PDF bytes and per-render timings in seconds"""
+        started = time.perf_counter()
+        pdf_bytes, timings = await self._submit(
+            context, _render_in_worker, self._worker_context(context), analysis_result, appendix_pdf
+        )
+        
+        wall = time.perf_counter() - started
+        timings['wall'] = round(wall, 4)
+        timings['queue_wait'] = round(max(0.0, wall - timings['total']), 4)
+        self._record(context, wall, timings)
+        return pdf_bytes, timings
+
+    async def render_segments(self, context: AnalysisContext, segments: List[str],
+                              appendix_pdf: Optional[bytes] = None) -> Tuple[bytes, Dict[str, Any]]:
+        """Lay out report segments in parallel workers, then merge them with continuous page numbers"""
+        worker_context = self._worker_context(context)
+        started = time.perf_counter()
+        last = len(segments) - 1
+        
+        rendered = await asyncio.gather(*[
+            self._submit(context, _render_segment_in_worker, worker_context, segment, index == 0, index == last)
+            for index, segment in enumerate(segments)
+        ])
+        laid_out = time.perf_counter()
+        
+        parts = [pdf for pdf, _ in rendered]
+        if appendix_pdf:
+            parts.append(appendix_pdf)
+        pdf_bytes, merge_seconds = await self._submit(context, _finalize_in_worker, parts)
+        
+        wall = time.perf_counter() - started
+        layout = max(seconds for _, seconds in rendered)
+        timings = {
+            'segments': len(segments),
+            'layout': round(layout, 4),
+            'merge': round(merge_seconds, 4),
+            'total': round(layout + merge_seconds, 4),
+            'wall': round(wall, 4),
+            'queue_wait': round(max(0.0, laid_out - started - layout), 4)
+        }
+        self._record(context, wall, timings)
+        return pdf_bytes, timings
+
+    async def _submit(self, context: AnalysisContext, func, *args):
+        """Run func in a worker with the render timeout, counting failures"""
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(executor, func, *args), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            # The worker keeps running until reportlab finishes; the slot frees up afterwards
+            self.stats['timeouts'] += 1
+            log_error(f"Render timed out after {self.timeout}s for {context.analysisId}", "RENDER_POOL")
+            raise
+        except BrokenProcessPool:
+            self.stats['failures'] += 1
+            # Parallel segments see the same broken pool, restart it once
+            if self.executor is executor:
+                log_warning("Render pool broken, restarting workers", "RENDER_POOL")
+                self.executor = self._create_executor()
+            raise
+        except Exception:
+            self.stats['failures'] += 1
+            raise
+
+    def _worker_context(self, context: AnalysisContext) -> AnalysisContext:
+        # Workers only need the header fields, not the full extracted text
+        return context.model_copy(update={'extractedText': ''})
+
+    def _record(self, context: AnalysisContext, wall: float, timings: Dict[str, Any]):
+        self.stats['renders'] += 1
+        self.stats['total_seconds'] += wall
+        self.stats['last'] = timings
+        log_debug(f"Rendered {context.analysisId}: {timings}", "RENDER_POOL")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Render pool statistics"""
+        renders = self.stats['renders']
+        return {
+            'enabled': self.enabled,
+            'size': self.size,
+            'renders': renders,
+            'failures': self.stats['failures'],
+            'timeouts': self.stats['timeouts'],
+            'avgSeconds': round(self.stats['total_seconds'] / renders, 3) if renders else None,
+            'last': self.stats['last']
+        }
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn: forking a process with a running event loop and threads is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+
+# Global render pool instance
+render_pool = RenderPool()
@@ -1,23 +1,29 @@
 import asyncio
 import os
 from datetime import datetime, timedelta
-from pathlib import Path
 from typing import Dict, Set
 import time
 
 from app.config import settings
 from app.utils.logger import log_info, log_debug, log_error
+from app.utils.deadline_scheduler import DeadlineScheduler
 from app.services.workflow_manager import workflow_manager
+from app.services.report_storage import report_storage
 
 class ReportCleanupService:
-    """Automatyczny cleanup raportów z optymalnym czasem przechowywania"""
+    """
+    Automatyczny cleanup raportów z optymalnym czasem przechowywania.
+    Każdy raport dostaje termin usunięcia przy zapisie (i nowy przy pobraniu), a raporty
+    usuwane są dokładnie w terminie; rzadki przegląd magazynu łapie tylko osierocone pliki.
+    """
     
     def __init__(self):
-        self.reports_dir = Path(settings.REPORTS_FOLDER)
-        self.cleanup_interval = settings.CLEANUP_INTERVAL_MINUTES * 60  # sekundy
+        self.storage = report_storage
+        self.reconcile_interval = settings.CLEANUP_RECONCILE_MINUTES * 60  # sekundy
         self.report_lifetime = settings.REPORT_LIFETIME_MINUTES * 60   # sekundy
         self.post_download_cleanup = settings.POST_DOWNLOAD_CLEANUP_MINUTES * 60  # sekundy
         self.download_tracking: Dict[str, float] = {}  # analysis_id -> timestamp pobrano
+        self.expiry = DeadlineScheduler(self._expire_report, "CLEANUP_SERVICE")
         self.cleanup_task = None
         
     async def start_cleanup_service(self):
@@ -25,108 +31,133 @@ class ReportCleanupService:
         if self.cleanup_task:
             return
         
-        self.cleanup_task = asyncio.create_task(self._cleanup_loop())
-        log_info("Started report cleanup service (10min retention)", "CLEANUP_SERVICE")
+        await self.expiry.start()
+        self.cleanup_task = asyncio.create_task(self._reconcile_loop())
+        log_info(
+            f"Started report cleanup service ({settings.REPORT_LIFETIME_MINUTES}min retention, "
+            f"reconciliation every {settings.CLEANUP_RECONCILE_MINUTES}min)",
+            "CLEANUP_SERVICE"
+        )
     
     async def stop_cleanup_service(self):
         """Zatrzymaj serwis cleanup"""
         if self.cleanup_task:
             self.cleanup_task.cancel()
             self.cleanup_task = None
+            await self.expiry.stop()
             log_info("Stopped report cleanup service", "CLEANUP_SERVICE")
     
-    async def _cleanup_loop(self):
-        """Główna pętla cleanup"""
+    def schedule_report(self, analysis_id: str, created_at: float):
+        """Zaplanuj usunięcie nowego raportu (wywołać po zapisaniu PDF)"""
+        if analysis_id not in self.download_tracking:
+            self.expiry.schedule(analysis_id, created_at + self.report_lifetime)
+    
+    async def _expire_report(self, analysis_id: str):
+        """Usuń raport w terminie; unlink poza pętlą zdarzeń"""
+        self.download_tracking.pop(analysis_id, None)
+        if await asyncio.to_thread(self.storage.delete, analysis_id):
+            log_debug(f"Deleted expired report: {analysis_id}", "CLEANUP_SERVICE")
+    
+    async def _reconcile_loop(self):
+        """Rzadki przegląd: raporty bez terminu (np. sprzed restartu) i stare sesje"""
         while True:
             try:
-                await self._cleanup_expired_reports()
-                await asyncio.sleep(self.cleanup_interval)
+                await self._reconcile()
+                await asyncio.sleep(self.reconcile_interval)
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                log_error(f"Cleanup loop error: {str(e)}", "CLEANUP_SERVICE")
+                log_error(f"Cleanup reconciliation error: {str(e)}", "CLEANUP_SERVICE")
                 await asyncio.sleep(60)  # Retry za minutę
     
-    async def _cleanup_expired_reports(self):
-        """Usuń wygasłe raporty"""
+    async def _reconcile(self):
+        """Zaplanuj raporty, o których scheduler nie wie; przeterminowane usuń od razu"""
+        reports = await asyncio.to_thread(self.storage.list_reports)
         current_time = time.time()
-        deleted_count = 0
+        adopted = 0
+        overdue = []
         
-        if not self.reports_dir.exists():
-            return
+        for report in reports:
+            if report.analysis_id in self.expiry:
+                continue
+            due = report.created_at + self.report_lifetime
+            if due <= current_time:
+                overdue.append(report.analysis_id)
+            else:
+                self.expiry.schedule(report.analysis_id, due)
+                adopted += 1
         
-        for report_file in self.reports_dir.glob("*.pdf"):
+        for analysis_id in overdue:
             try:
-                analysis_id = report_file.stem
-                file_age = current_time - report_file.stat().st_mtime
-                
-                # Sprawdź czy raport został pobrany
-                if analysis_id in self.download_tracking:
-                    # Jeśli pobrano, usuń po krótkim czasie
-                    download_time = self.download_tracking[analysis_id]
-                    if current_time - download_time > self.post_download_cleanup:
-                        report_file.unlink()
-                        self.download_tracking.pop(analysis_id, None)
-                        deleted_count += 1
-                        log_debug(f"Deleted downloaded report: {analysis_id}", "CLEANUP_SERVICE")
-                else:
-                    # Jeśli nie pobrano, usuń po 10 minutach
-                    if file_age > self.report_lifetime:
-                        report_file.unlink()
-                        deleted_count += 1
-                        log_debug(f"Deleted expired report: {analysis_id}", "CLEANUP_SERVICE")
-                
+                await self._expire_report(analysis_id)
             except Exception as e:
-                log_error(f"Error deleting report {report_file}: {str(e)}", "CLEANUP_SERVICE")
-        
-        # Cleanup starych sesji workflow
-        await self._cleanup_old_sessions()
+                log_error(f"Error deleting report {analysis_id}: {str(e)}", "CLEANUP_SERVICE")
         
-        if deleted_count > 0:
-            log_info(f"Cleaned up {deleted_count} expired reports", "CLEANUP_SERVICE")
-    
-    async def _cleanup_old_sessions(self):
-        """Usuń stare sesje workflow"""
+        # Sesje mają własne terminy; tu tylko te, których timer zginął z innym workerem
         try:
-            workflow_manager.cleanup_old_sessions(max_age_hours=1)  # 1 godzina
+            await workflow_manager.cleanup_old_sessions(max_age_minutes=settings.SESSION_LIFETIME_MINUTES)
         except Exception as e:
             log_error(f"Session cleanup error: {str(e)}", "CLEANUP_SERVICE")
+        
+        if adopted or overdue:
+            log_info(
+                f"Reconciliation: {len(overdue)} orphaned reports deleted, {adopted} scheduled "
+                f"({len(self.expiry)} pending)",
+                "CLEANUP_SERVICE"
+            )
     
     def mark_report_downloaded(self, analysis_id: str):
-        """Oznacz raport jako pobrany"""
-        self.download_tracking[analysis_id] = time.time()
+        """Oznacz raport jako pobrany (usunięcie przesuwa się na krótko po pobraniu)"""
+        downloaded_at = time.time()
+        self.download_tracking[analysis_id] = downloaded_at
+        self.expiry.schedule(analysis_id, downloaded_at + self.post_download_cleanup)
         log_debug(f"Marked report as downloaded: {analysis_id}", "CLEANUP_SERVICE")
     
-    def get_report_status(self, analysis_id: str) -> Dict[str, any]:
-        """Pobierz status raportu"""
-        report_path = self.reports_dir / f"{analysis_id}.pdf"
+    async def get_report_status(self, analysis_id: str) -> Dict[str, any]:
+        """Pobierz status raportu (stat magazynu w wątku, poza pętlą zdarzeń)"""
+        report = await asyncio.to_thread(self.storage.stat, analysis_id)
         
-        if not report_path.exists():
-            return {"exists": False, "expired": True}
+        if report is None:
+            if await self._awaiting_render(analysis_id):
+                # Tryb lazy: PDF powstanie przy pierwszym pobraniu
+                return {"exists": False, "expired": False, "render_on_demand": True}
+            return {"exists": False, "expired": True, "render_on_demand": False}
         
         current_time = time.time()
-        file_age = current_time - report_path.stat().st_mtime
+        file_age = current_time - report.created_at
         
         return {
             "exists": True,
             "expired": file_age > self.report_lifetime,
             "age_minutes": file_age / 60,
-            "downloaded": analysis_id in self.download_tracking
+            "size": report.size,
+            "downloaded": analysis_id in self.download_tracking,
+            "render_on_demand": False
         }
     
+    async def _awaiting_render(self, analysis_id: str) -> bool:
+        """Zakończona analiza w trybie lazy, której PDF nie został jeszcze wyrenderowany"""
+        if settings.REPORT_RENDER_MODE != "lazy":
+            return False
+        session = await workflow_manager.get_session(analysis_id)
+        return (
+            session is not None
+            and session.status == "completed"
+            and not session.context.metadata.get("reportRendered")
+        )
+    
     def cleanup_immediately(self, analysis_id: str):
         """Usuń raport natychmiast"""
         try:
-            report_path = self.reports_dir / f"{analysis_id}.pdf"
-            if report_path.exists():
-                report_path.unlink()
+            if self.storage.delete(analysis_id):
                 log_debug(f"Immediately cleaned up report: {analysis_id}", "CLEANUP_SERVICE")
             
             # Usuń z tracking
             self.download_tracking.pop(analysis_id, None)
+            self.expiry.cancel(analysis_id)
             
         except Exception as e:
             log_error(f"Immediate cleanup failed for {analysis_id}: {str(e)}", "CLEANUP_SERVICE")
 
 # Globalny serwis cleanup
-cleanup_service = ReportCleanupService() 
\ No newline at end of file
+cleanup_service = ReportCleanupService() 
@@ -1,6 +1,11 @@
+import asyncio
+import copy
+import io
 import os
+import threading
+import time
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -9,26 +14,71 @@ from reportlab.lib.colors import HexColor
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 from reportlab.lib import colors
-import markdown
-import re
 from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+from pypdf import PdfReader, PdfWriter
 
 from app.config import settings
 from app.models.water_data import AnalysisContext
+from app.services.markdown_flowables import (
+    MarkdownFlowables, SEPARATOR_LINE, group_sections, split_sections, to_reportlab_markup
+)
+from app.services.render_pool import render_pool
+from app.services.report_storage import report_storage, StoredReport
+from app.utils.font_cache import load_ttfont
 from app.utils.logger import log_debug, log_error, log_info, log_warning
 
+PAGE_NUMBER_COLOR = HexColor('#9ca3af')
+
+FOOTER_TEMPLATE = """
+<para align="center">
+<font size="9" color="#374151">
+<b>Raport wygenerowany automatycznie przez Aquaforest Lab</b><br/>
+Data utworzenia: {created}
+</font>
+</para>
+"""
+
+FOOTER_DISCLAIMER = """
+<para align="center">
+<font size="8" color="#6b7280">
+Uwaga: Ten raport służy wyłącznie celom informacyjnym.<br/>
+W przypadku wykrycia problemów skonsultuj się z ekspertem.<br/>
+Kontakt: info@aquaforest-lab.com
+</font>
+</para>
+"""
+
 class ReportGenerator:
     """Service for generating PDF reports from analysis results"""
     
+    PAGE_MARGIN = 60
+    
     def __init__(self):
-        self.reports_dir = Path(settings.REPORTS_FOLDER)
-        self.reports_dir.mkdir(exist_ok=True)
-        
-        # Register fonts and define styles
-        self._register_fonts()
-        self.styles = getSampleStyleSheet()
-        self._add_custom_styles()
+        # Fonts and styles are loaded on first use (or at startup), not at import
+        self._initialized = False
+        self._init_lock = threading.Lock()
+    
+    def initialize(self):
+        """Register fonts and build styles and static fragments (idempotent, thread-safe)"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            started = time.perf_counter()
+            self._register_fonts()
+            self.styles = getSampleStyleSheet()
+            self._add_custom_styles()
+            self._build_static_fragments()
+            self.markdown_converter = MarkdownFlowables(
+                self.styles,
+                available_width=A4[0] - 2 * self.PAGE_MARGIN,
+                base_font=self.base_font,
+                bold_font=self.bold_font
+            )
+            self._initialized = True
+            log_info(f"Report generator ready in {(time.perf_counter() - started) * 1000:.0f}ms", "REPORT_GENERATOR")
     
     def _register_fonts(self):
         """Register custom TTF fonts for Polish characters."""
@@ -55,9 +105,10 @@ class ReportGenerator:
                 else:
                     log_info(f"Found font: {font_name} at {path.absolute()}", "REPORT_GENERATOR")
 
-            # Register each font
+            # Register each font (metrics come from the cache when the file is unchanged)
+            cache_dir = Path(settings.FONT_CACHE_DIR) if settings.FONT_CACHE_DIR else None
             for font_name, path in font_files.items():
-                pdfmetrics.registerFont(TTFont(font_name, str(path)))
+                pdfmetrics.registerFont(load_ttfont(font_name, path, cache_dir))
                 log_info(f"Registered font: {font_name}", "REPORT_GENERATOR")
             
             # Register the font family
@@ -91,6 +142,11 @@ class ReportGenerator:
             italic_font = 'Helvetica-Oblique'
             log_warning("DejaVu fonts not available, using Helvetica fallback", "REPORT_GENERATOR")
         
+        # Resolved once, reused by every report
+        self.base_font = base_font
+        self.bold_font = bold_font
+        self.italic_font = italic_font
+        
         # Update base styles
         self.styles['Normal'].fontName = base_font
         self.styles['Italic'].fontName = italic_font
@@ -224,184 +280,198 @@ class ReportGenerator:
             alignment=TA_CENTER
         ))
 
+    def _build_static_fragments(self):
+        """Precompute flowables and table style that are identical in every report"""
+        self.static_fragments = {
+            'title': Paragraph("Personalizowana Analiza Jakości Wody", self.styles['MainTitle']),
+            'subtitle': Paragraph("by Aquaforest Lab", self.styles['CompanySubtitle']),
+            'separator': Paragraph(SEPARATOR_LINE, self.styles['Separator']),
+            'disclaimer': Paragraph(FOOTER_DISCLAIMER, self.styles['ReportBodyText']),
+        }
+        
+        self.header_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (1, 0), HexColor('#dbeafe')),
+            ('TEXTCOLOR', (0, 0), (1, 0), HexColor('#1e40af')),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (1, 0), self.bold_font),
+            ('FONTNAME', (0, 1), (-1, -1), self.base_font),
+            ('FONTSIZE', (0, 0), (1, 0), 11),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, HexColor('#e5e7eb')),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [HexColor('#f9fafb'), HexColor('#ffffff')]),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('LEFTPADDING', (0, 0), (-1, -1), 10),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 10),
+        ])
+    
+    def _static_fragment(self, name: str) -> Paragraph:
+        """
+        Shallow copy of a precomputed paragraph: parsed markup is shared, while layout
+        state (wrap size, canvas, frame) set during a build stays on the copy
+        """
+        return copy.copy(self.static_fragments[name])
+
     def _enhanced_markdown_to_reportlab(self, text: str) -> str:
         """Enhanced markdown to ReportLab conversion with better formatting."""
-        if not text:
-            return ""
-        
-        # Escape any existing XML
-        text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-        
-        # Convert **bold** to <b>bold</b>
-        text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text)
-        
-        # Convert *italic* to <i>italic</i>
-        text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', text)
-        
-        # Convert bullet points with better formatting
-        text = re.sub(r'^\s*[\*\-\+]\s+(.+)$', r'• \1', text, flags=re.MULTILINE)
-        
-        # Handle numbered lists
-        text = re.sub(r'^\s*(\d+)\.\s+(.+)$', r'\1. \2', text, flags=re.MULTILINE)
-        
-        # Handle line breaks
-        text = text.replace('\n', '<br/>')
-        
-        return text
+        return to_reportlab_markup(text)
 
     def _parse_and_format_content(self, content: str, story: list):
         """Parse markdown content and add properly formatted elements to story."""
         if not content.strip():
             return
-            
-        lines = content.split('\n')
-        current_paragraph = []
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Skip empty lines but process accumulated paragraph
-            if not line:
-                if current_paragraph:
-                    paragraph_text = ' '.join(current_paragraph)
-                    formatted_text = self._enhanced_markdown_to_reportlab(paragraph_text)
-                    story.append(Paragraph(formatted_text, self.styles['ReportBodyText']))
-                    story.append(Spacer(1, 6))
-                    current_paragraph = []
-                continue
-            
-            # Handle separators
-            if line.startswith('---') and len(line.strip('- ')) == 0:
-                # Add accumulated paragraph first
-                if current_paragraph:
-                    paragraph_text = ' '.join(current_paragraph)
-                    formatted_text = self._enhanced_markdown_to_reportlab(paragraph_text)
-                    story.append(Paragraph(formatted_text, self.styles['ReportBodyText']))
-                    current_paragraph = []
-                
-                # Add separator
-                story.append(Spacer(1, 10))
-                story.append(Paragraph("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━", self.styles['Separator']))
-                story.append(Spacer(1, 10))
-                continue
-            
-            # Handle headers
-            if line.startswith('###'):
-                # Process accumulated paragraph first
-                if current_paragraph:
-                    paragraph_text = ' '.join(current_paragraph)
-                    formatted_text = self._enhanced_markdown_to_reportlab(paragraph_text)
-                    story.append(Paragraph(formatted_text, self.styles['ReportBodyText']))
-                    current_paragraph = []
-                
-                header_text = line[3:].strip()
-                formatted_header = self._enhanced_markdown_to_reportlab(header_text)
-                story.append(Paragraph(formatted_header, self.styles['MinorHeader']))
-                continue
-                
-            elif line.startswith('##'):
-                # Process accumulated paragraph first
-                if current_paragraph:
-                    paragraph_text = ' '.join(current_paragraph)
-                    formatted_text = self._enhanced_markdown_to_reportlab(paragraph_text)
-                    story.append(Paragraph(formatted_text, self.styles['ReportBodyText']))
-                    current_paragraph = []
-                
-                header_text = line[2:].strip()
-                formatted_header = self._enhanced_markdown_to_reportlab(header_text)
-                story.append(Paragraph(formatted_header, self.styles['SubsectionHeader']))
-                continue
-                
-            elif line.startswith('#'):
-                # Process accumulated paragraph first
-                if current_paragraph:
-                    paragraph_text = ' '.join(current_paragraph)
-                    formatted_text = self._enhanced_markdown_to_reportlab(paragraph_text)
-                    story.append(Paragraph(formatted_text, self.styles['ReportBodyText']))
-                    current_paragraph = []
-                
-                header_text = line[1:].strip()
-                formatted_header = self._enhanced_markdown_to_reportlab(header_text)
-                story.append(Paragraph(formatted_header, self.styles['SectionHeader']))
-                continue
-            
-            # Handle bullet points and lists
-            if line.startswith(('• ', '- ', '* ')) or re.match(r'^\d+\.', line):
-                # Process accumulated paragraph first
-                if current_paragraph:
-                    paragraph_text = ' '.join(current_paragraph)
-                    formatted_text = self._enhanced_markdown_to_reportlab(paragraph_text)
-                    story.append(Paragraph(formatted_text, self.styles['ReportBodyText']))
-                    current_paragraph = []
-                
-                formatted_line = self._enhanced_markdown_to_reportlab(line)
-                
-                # Check for special formatting (only text-based detection)
-                if 'NIEBEZPIECZN' in line.upper() or 'BŁĄD' in line.upper() or 'NIEZGODNE' in line.upper() or 'PRZEKROCZENIE' in line.upper():
-                    story.append(Paragraph(formatted_line, self.styles['WarningText']))
-                elif 'DOBRA' in line.upper() or 'BEZPIECZN' in line.upper() or 'W NORMIE' in line.upper() or 'DOSKONAŁY' in line.upper():
-                    story.append(Paragraph(formatted_line, self.styles['SuccessText']))
-                else:
-                    story.append(Paragraph(formatted_line, self.styles['ParameterText']))
-                
-                story.append(Spacer(1, 4))
-                continue
-            
-            # Regular text - accumulate into paragraph
-            current_paragraph.append(line)
         
-        # Process any remaining paragraph
-        if current_paragraph:
-            paragraph_text = ' '.join(current_paragraph)
-            formatted_text = self._enhanced_markdown_to_reportlab(paragraph_text)
-            story.append(Paragraph(formatted_text, self.styles['ReportBodyText']))
-            story.append(Spacer(1, 6))
+        self.markdown_converter.convert(content, story)
 
-    async def generate_pdf_report(self, analysis_id: str, context: AnalysisContext, analysis_result: str) -> str:
-        """Generate PDF report from analysis result"""
+    def build_header_story(self, context: AnalysisContext) -> List:
+        """Build header flowables (title and basic information table)"""
+        self.initialize()
+        story = []
+        self._add_enhanced_header(story, context)
+        return story
+    
+    def build_appendix_story(self, appendix_markdown: str) -> List:
+        """Build flowables for static content appended after the analysis (knowledge base)"""
+        self.initialize()
+        story = []
+        self._parse_and_format_content("---\n\n" + appendix_markdown, story)
+        return story
+    
+    def render_appendix_pdf(self, appendix_markdown: str) -> bytes:
+        """Render static appendix (knowledge base) to standalone PDF pages for merging"""
+        buffer = io.BytesIO()
+        doc = self._create_document(buffer)
+        doc.build(self.build_appendix_story(appendix_markdown))
+        return buffer.getvalue()
+    
+    async def generate_pdf_report(self, analysis_id: str, context: AnalysisContext, analysis_result: str,
+                                  header_story: Optional[List] = None, appendix_pdf: Optional[bytes] = None) -> StoredReport:
+        """
+        Generate PDF report from analysis result and put it in report storage.
+        Rendering runs in the render pool when enabled, otherwise inline. Long analyses are split at
+        top-level sections and the segments are laid out in parallel workers. Header flowables can be
+        prebuilt for inline rendering; pre-rendered appendix pages (knowledge base) are merged
+        after the dynamic part instead of laid out again.
+        """
         try:
             log_info(f"Generating PDF report for {analysis_id}", "REPORT_GENERATOR")
             
-            # Create PDF file path
-            report_path = self.reports_dir / f"{analysis_id}.pdf"
-            
-            # Create PDF document with better margins
-            doc = SimpleDocTemplate(
-                str(report_path),
-                pagesize=A4,
-                rightMargin=60,
-                leftMargin=60,
-                topMargin=60,
-                bottomMargin=60
-            )
-            
-            # Build content
-            story = []
-            
-            # Add header with improved styling
-            self._add_enhanced_header(story, context)
-            
-            # Add analysis content with better parsing
-            self._add_enhanced_analysis_content(story, analysis_result)
-            
-            # Add footer
-            self._add_enhanced_footer(story)
+            if render_pool.enabled:
+                segments = self.plan_segments(analysis_result)
+                if len(segments) > 1:
+                    pdf_bytes, timings = await render_pool.render_segments(context, segments, appendix_pdf)
+                else:
+                    pdf_bytes, timings = await render_pool.render(context, analysis_result, appendix_pdf)
+            else:
+                pdf_bytes, timings = self.render_report(context, analysis_result, header_story, appendix_pdf)
             
-            # Build PDF
-            doc.build(story)
+            # Compression, hashing and file writes stay off the event loop
+            stored = await asyncio.to_thread(report_storage.save, analysis_id, pdf_bytes)
             
-            log_info(f"PDF report generated: {report_path}", "REPORT_GENERATOR")
-            return str(report_path)
+            log_info(f"PDF report generated: {analysis_id}, {stored.size} bytes ({timings})", "REPORT_GENERATOR")
+            return stored
             
         except Exception as e:
             log_error(f"PDF report generation failed: {str(e)}", "REPORT_GENERATOR")
             raise
     
+    def render_report(self, context: AnalysisContext, analysis_result: str,
+                      header_story: Optional[List] = None, appendix_pdf: Optional[bytes] = None) -> Tuple[bytes, Dict[str, float]]:
+        """Lay out the report synchronously; returns PDF bytes and timings in seconds"""
+        started = time.perf_counter()
+        pdf_bytes = self.render_segment(context, analysis_result, header_story=header_story)
+        laid_out = time.perf_counter()
+        
+        pdf_bytes = self.finalize_pdf([pdf_bytes, appendix_pdf] if appendix_pdf else [pdf_bytes])
+        
+        finished = time.perf_counter()
+        return pdf_bytes, {
+            'layout': round(laid_out - started, 4),
+            'merge': round(finished - laid_out, 4),
+            'total': round(finished - started, 4)
+        }
+    
+    def plan_segments(self, analysis_result: str) -> List[str]:
+        """Split a long analysis into contiguous groups of top-level sections, one per render worker"""
+        if settings.RENDER_MAX_SEGMENTS < 2 or len(analysis_result) < settings.RENDER_PARALLEL_MIN_CHARS:
+            return [analysis_result]
+        return group_sections(split_sections(analysis_result), settings.RENDER_MAX_SEGMENTS)
+    
+    def render_segment(self, context: AnalysisContext, markdown: str, first: bool = True, last: bool = True,
+                       header_story: Optional[List] = None) -> bytes:
+        """Lay out one part of the report: the header goes on the first part, the footer on the last"""
+        self.initialize()
+        
+        # Build content
+        story = []
+        
+        # Add header with improved styling
+        if first:
+            story.extend(header_story if header_story is not None else self.build_header_story(context))
+        
+        # Add analysis content with better parsing
+        self._add_enhanced_analysis_content(story, markdown)
+        
+        # Add footer
+        if last:
+            self._add_enhanced_footer(story)
+        
+        # Build PDF
+        buffer = io.BytesIO()
+        self._create_document(buffer).build(story)
+        return buffer.getvalue()
+    
+    def finalize_pdf(self, parts: List[bytes]) -> bytes:
+        """Merge rendered parts in order and number the pages of the whole document"""
+        writer = PdfWriter()
+        for part in parts:
+            writer.append(PdfReader(io.BytesIO(part)))
+        
+        self._number_pages(writer)
+        
+        output = io.BytesIO()
+        writer.write(output)
+        return output.getvalue()
+    
+    def warm_up(self):
+        """Make sure fonts and styles are ready before the first report"""
+        self.initialize()
+    
+    def _create_document(self, target) -> SimpleDocTemplate:
+        """Create PDF document with better margins"""
+        return SimpleDocTemplate(
+            target,
+            pagesize=A4,
+            rightMargin=self.PAGE_MARGIN,
+            leftMargin=self.PAGE_MARGIN,
+            topMargin=self.PAGE_MARGIN,
+            bottomMargin=self.PAGE_MARGIN
+        )
+    
+    def _number_pages(self, writer: PdfWriter):
+        """Stamp 'Strona N z M' on every page (parts are rendered separately, so numbering happens after merge)"""
+        total = len(writer.pages)
+        buffer = io.BytesIO()
+        # Base-14 font: the label is ASCII and nothing gets embedded per stamped page
+        overlay = Canvas(buffer, pagesize=A4)
+        for number in range(1, total + 1):
+            overlay.setFont('Helvetica', 8)
+            overlay.setFillColor(PAGE_NUMBER_COLOR)
+            overlay.drawCentredString(A4[0] / 2, self.PAGE_MARGIN / 2, f"Strona {number} z {total}")
+            overlay.showPage()
+        overlay.save()
+        
+        for page, stamp in zip(writer.pages, PdfReader(buffer).pages):
+            page.merge_page(stamp)
+            # Merging leaves the combined content stream uncompressed
+            page.compress_content_streams()
+    
     def _add_enhanced_header(self, story: list, context: AnalysisContext):
         """Add enhanced header section to PDF"""
         # Main title - updated as requested
-        story.append(Paragraph("Personalizowana Analiza Jakości Wody", self.styles['MainTitle']))
-        story.append(Paragraph("by Aquaforest Lab", self.styles['CompanySubtitle']))
+        story.append(self._static_fragment('title'))
+        story.append(self._static_fragment('subtitle'))
         story.append(Spacer(1, 20))
         
         # Basic information table with better styling
@@ -420,33 +490,9 @@ class ReportGenerator:
             # Always add Laboratory, with a default value
             basic_info.append(['Laboratorium:', water_data.laboratory or 'Aquaforest Lab'])
         
-        # Determine fonts to use
-        try:
-            pdfmetrics.getFont('DejaVuSans-Bold')
-            header_font = 'DejaVuSans-Bold'
-            body_font = 'DejaVuSans'
-        except:
-            header_font = 'Helvetica-Bold'
-            body_font = 'Helvetica'
-        
         # Create table with enhanced styling
         table = Table(basic_info, colWidths=[2.5*inch, 3.5*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (1, 0), HexColor('#dbeafe')),
-            ('TEXTCOLOR', (0, 0), (1, 0), HexColor('#1e40af')),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (1, 0), header_font),
-            ('FONTNAME', (0, 1), (-1, -1), body_font),
-            ('FONTSIZE', (0, 0), (1, 0), 11),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, HexColor('#e5e7eb')),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [HexColor('#f9fafb'), HexColor('#ffffff')]),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('LEFTPADDING', (0, 0), (-1, -1), 10),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-        ]))
+        table.setStyle(self.header_table_style)
         
         story.append(table)
         story.append(Spacer(1, 25))
@@ -469,43 +515,28 @@ class ReportGenerator:
         story.append(Spacer(1, 30))
         
         # Add separator line
-        story.append(Paragraph("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━", self.styles['Separator']))
+        story.append(self._static_fragment('separator'))
         story.append(Spacer(1, 15))
         
         # Footer information with enhanced formatting
-        footer_text = f"""
-        <para align="center">
-        <font size="9" color="#374151">
-        <b>Raport wygenerowany automatycznie przez Aquaforest Lab</b><br/>
-        Data utworzenia: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}<br/><br/>
-        <font size="8" color="#6b7280">
-        Uwaga: Ten raport służy wyłącznie celom informacyjnym.<br/>
-        W przypadku wykrycia problemów skonsultuj się z ekspertem.<br/>
-        Kontakt: info@aquaforest-lab.com
-        </font>
-        </font>
-        </para>
-        """
-        
+        footer_text = FOOTER_TEMPLATE.format(created=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         story.append(Paragraph(footer_text, self.styles['ReportBodyText']))
+        story.append(self._static_fragment('disclaimer'))
     
     # Pozostałe metody pozostają bez zmian...
-    def get_report_path(self, analysis_id: str) -> str:
-        """Get report file path"""
-        return str(self.reports_dir / f"{analysis_id}.pdf")
+    def get_report_path(self, analysis_id: str) -> Optional[str]:
+        """Get report file path (None when the storage backend is not file based)"""
+        return report_storage.path_for(analysis_id)
     
     def report_exists(self, analysis_id: str) -> bool:
         """Check if report exists"""
-        report_path = self.reports_dir / f"{analysis_id}.pdf"
-        return report_path.exists()
+        return report_storage.stat(analysis_id) is not None
     
     def delete_report(self, analysis_id: str) -> bool:
-        """Delete report file"""
+        """Delete report"""
         try:
-            report_path = self.reports_dir / f"{analysis_id}.pdf"
-            if report_path.exists():
-                report_path.unlink()
-                log_info(f"Deleted report: {report_path}", "REPORT_GENERATOR")
+            if report_storage.delete(analysis_id):
+                log_info(f"Deleted report: {analysis_id}", "REPORT_GENERATOR")
                 return True
             return False
         except Exception as e:
@@ -513,15 +544,14 @@ class ReportGenerator:
             return False
     
     def cleanup_old_reports(self, max_age_hours: int = 24):
-        """Clean up old report files"""
+        """Clean up old reports"""
         try:
-            current_time = datetime.now().timestamp()
+            current_time = time.time()
             deleted_count = 0
             
-            for report_file in self.reports_dir.glob("*.pdf"):
-                file_age = current_time - report_file.stat().st_mtime
-                if file_age > (max_age_hours * 3600):
-                    report_file.unlink()
+            for report in report_storage.list_reports():
+                if current_time - report.created_at > (max_age_hours * 3600):
+                    report_storage.delete(report.analysis_id)
                     deleted_count += 1
             
             if deleted_count > 0:
@@ -530,5 +560,5 @@ class ReportGenerator:
         except Exception as e:
             log_error(f"Report cleanup failed: {str(e)}", "REPORT_GENERATOR")
 
-# Global report generator instance
+# Global report generator instance (fonts and styles load on first use or at startup)
 report_generator = ReportGenerator()
\ No newline at end of file
@@ -0,0 +1,321 @@
+import hashlib
+import os
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.logger import log_debug, log_error, log_info
+
+CHUNK_SIZE = 64 * 1024
+
+def content_digest(data: bytes) -> str:
+    """Content hash used as the report's strong ETag"""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+@dataclass
+class StoredReport:
+    """Metadata of a stored PDF report"""
+    analysis_id: str
+    size: int
+    created_at: float  # epoch seconds
+    path: Optional[str] = None  # set when the report lives on disk
+    digest: Optional[str] = None  # content hash, None until computed
+
+class ReportStorage(ABC):
+    """Storage backend for rendered PDF reports"""
+
+    @abstractmethod
+    def save(self, analysis_id: str, data: bytes) -> StoredReport:
+        """Store report bytes, replacing any previous version"""
+
+    @abstractmethod
+    def stat(self, analysis_id: str) -> Optional[StoredReport]:
+        """Report metadata, None if it does not exist"""
+
+    @abstractmethod
+    def read(self, analysis_id: str) -> Optional[bytes]:
+        """Full report bytes, None if it does not exist"""
+
+    @abstractmethod
+    def delete(self, analysis_id: str) -> bool:
+        """Delete a report, returns True if it existed"""
+
+    @abstractmethod
+    def list_reports(self) -> List[StoredReport]:
+        """Metadata of all stored reports"""
+
+    def iter_chunks(self, analysis_id: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Stream report bytes in chunks"""
+        data = self.read(analysis_id) or b""
+        view = memoryview(data)
+        for offset in range(0, len(data), chunk_size):
+            yield bytes(view[offset:offset + chunk_size])
+
+    def iter_range(self, analysis_id: str, start: int, end: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Stream bytes [start, end) of the report"""
+        position = 0
+        for chunk in self.iter_chunks(analysis_id, chunk_size):
+            chunk_end = position + len(chunk)
+            if chunk_end > start:
+                yield chunk[max(start - position, 0):end - position]
+            position = chunk_end
+            if position >= end:
+                break
+
+    def digest(self, analysis_id: str) -> Optional[str]:
+        """Content hash of the report, None if it does not exist"""
+        data = self.read(analysis_id)
+        return content_digest(data) if data is not None else None
+
+    def path_for(self, analysis_id: str) -> Optional[str]:
+        """Filesystem path of the report if the backend keeps files on disk"""
+        return None
+
+class FileReportStorage(ReportStorage):
+    """Reports stored as files in REPORTS_FOLDER"""
+
+    def __init__(self, reports_dir: str):
+        self.reports_dir = Path(reports_dir)
+        self.reports_dir.mkdir(parents=True, exist_ok=True)
+        # analysis_id -> (mtime_ns, size, digest), recomputed when the file changes
+        self.digests: Dict[str, Tuple[int, int, str]] = {}
+        self.lock = threading.Lock()
+
+    def _path(self, analysis_id: str) -> Path:
+        return self.reports_dir / f"{analysis_id}.pdf"
+
+    def save(self, analysis_id: str, data: bytes) -> StoredReport:
+        path = self._path(analysis_id)
+        temp_path = path.with_suffix(".pdf.tmp")
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        # Atomic replace, readers never see a half-written report
+        os.replace(temp_path, path)
+
+        stat = path.stat()
+        digest = content_digest(data)
+        with self.lock:
+            self.digests[analysis_id] = (stat.st_mtime_ns, stat.st_size, digest)
+        return StoredReport(analysis_id, stat.st_size, stat.st_mtime, str(path), digest)
+
+    def stat(self, analysis_id: str) -> Optional[StoredReport]:
+        path = self._path(analysis_id)
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return StoredReport(analysis_id, stat.st_size, stat.st_mtime, str(path), self._cached_digest(analysis_id, stat))
+
+    def read(self, analysis_id: str) -> Optional[bytes]:
+        try:
+            with open(self._path(analysis_id), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def iter_chunks(self, analysis_id: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self._path(analysis_id), "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def iter_range(self, analysis_id: str, start: int, end: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self._path(analysis_id), "rb") as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def digest(self, analysis_id: str) -> Optional[str]:
+        path = self._path(analysis_id)
+        try:
+            stat = path.stat()
+            digest = self._cached_digest(analysis_id, stat)
+            if digest is not None:
+                return digest
+
+            # Reports written before a restart (or by another process) are hashed once
+            hasher = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+        except OSError:
+            return None
+
+        digest = hasher.hexdigest()[:32]
+        with self.lock:
+            self.digests[analysis_id] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def _cached_digest(self, analysis_id: str, stat: os.stat_result) -> Optional[str]:
+        with self.lock:
+            cached = self.digests.get(analysis_id)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        return None
+
+    def delete(self, analysis_id: str) -> bool:
+        with self.lock:
+            self.digests.pop(analysis_id, None)
+        try:
+            self._path(analysis_id).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def list_reports(self) -> List[StoredReport]:
+        reports = []
+        for report_file in self.reports_dir.glob("*.pdf"):
+            try:
+                stat = report_file.stat()
+                reports.append(StoredReport(report_file.stem, stat.st_size, stat.st_mtime, str(report_file)))
+            except OSError:
+                continue
+        return reports
+
+    def path_for(self, analysis_id: str) -> Optional[str]:
+        path = self._path(analysis_id)
+        return str(path) if path.exists() else None
+
+@dataclass
+class _MemoryEntry:
+    compressed: bytes
+    size: int
+    created_at: float
+    digest: str
+
+class MemoryReportStorage(ReportStorage):
+    """Reports kept as compressed bytes in a size-bounded in-memory store with TTL eviction"""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, compression_level: int = 6):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.compression_level = compression_level
+        self.entries: "OrderedDict[str, _MemoryEntry]" = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def save(self, analysis_id: str, data: bytes) -> StoredReport:
+        compressed = zlib.compress(data, self.compression_level)
+        entry = _MemoryEntry(compressed, len(data), time.time(), content_digest(data))
+
+        with self.lock:
+            self._remove(analysis_id)
+            self.entries[analysis_id] = entry
+            self.total_bytes += len(compressed)
+            self._evict()
+
+        log_debug(
+            f"Stored report {analysis_id} in memory ({len(data)} -> {len(compressed)} bytes, "
+            f"total {self.total_bytes}/{self.max_bytes})",
+            "REPORT_STORAGE"
+        )
+        return StoredReport(analysis_id, entry.size, entry.created_at, digest=entry.digest)
+
+    def stat(self, analysis_id: str) -> Optional[StoredReport]:
+        entry = self._get(analysis_id)
+        if entry is None:
+            return None
+        return StoredReport(analysis_id, entry.size, entry.created_at, digest=entry.digest)
+
+    def read(self, analysis_id: str) -> Optional[bytes]:
+        entry = self._get(analysis_id)
+        if entry is None:
+            return None
+        return zlib.decompress(entry.compressed)
+
+    def iter_chunks(self, analysis_id: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        entry = self._get(analysis_id)
+        if entry is None:
+            return
+        # Decompress incrementally instead of materialising the whole PDF
+        decompressor = zlib.decompressobj()
+        view = memoryview(entry.compressed)
+        for offset in range(0, len(view), chunk_size):
+            chunk = decompressor.decompress(view[offset:offset + chunk_size])
+            if chunk:
+                yield chunk
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+    def digest(self, analysis_id: str) -> Optional[str]:
+        entry = self._get(analysis_id)
+        return entry.digest if entry is not None else None
+
+    def delete(self, analysis_id: str) -> bool:
+        with self.lock:
+            return self._remove(analysis_id)
+
+    def list_reports(self) -> List[StoredReport]:
+        with self.lock:
+            self._evict()
+            return [
+                StoredReport(analysis_id, entry.size, entry.created_at, digest=entry.digest)
+                for analysis_id, entry in self.entries.items()
+            ]
+
+    def _get(self, analysis_id: str) -> Optional[_MemoryEntry]:
+        with self.lock:
+            entry = self.entries.get(analysis_id)
+            if entry is None:
+                return None
+            if time.time() - entry.created_at > self.ttl_seconds:
+                self._remove(analysis_id)
+                return None
+            self.entries.move_to_end(analysis_id)
+            return entry
+
+    def _remove(self, analysis_id: str) -> bool:
+        entry = self.entries.pop(analysis_id, None)
+        if entry is None:
+            return False
+        self.total_bytes -= len(entry.compressed)
+        return True
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones until under the size bound"""
+        cutoff = time.time() - self.ttl_seconds
+        for analysis_id in [key for key, entry in self.entries.items() if entry.created_at < cutoff]:
+            self._remove(analysis_id)
+            self.evictions += 1
+
+        while self.total_bytes > self.max_bytes and self.entries:
+            analysis_id, entry = self.entries.popitem(last=False)
+            self.total_bytes -= len(entry.compressed)
+            self.evictions += 1
+            log_info(f"Evicted report {analysis_id} from memory store (size bound)", "REPORT_STORAGE")
+
+def create_report_storage() -> ReportStorage:
+    """Create storage backend selected by REPORT_STORAGE_BACKEND"""
+    backend = settings.REPORT_STORAGE_BACKEND
+    if backend == "memory":
+        log_info(
+            f"Using in-memory report storage ({settings.REPORT_MEMORY_MAX_MB}MB, "
+            f"{settings.REPORT_LIFETIME_MINUTES}min TTL)",
+            "REPORT_STORAGE"
+        )
+        return MemoryReportStorage(
+            max_bytes=settings.REPORT_MEMORY_MAX_MB * 1024 * 1024,
+            ttl_seconds=settings.REPORT_LIFETIME_MINUTES * 60
+        )
+
+    if backend != "file":
+        log_error(f"Unknown REPORT_STORAGE_BACKEND '{backend}', using file storage", "REPORT_STORAGE")
+    return FileReportStorage(settings.REPORTS_FOLDER)
+
+# Global report storage instance
+report_storage = create_report_storage()
@@ -0,0 +1,374 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.models.water_data import AnalysisSession
+from app.utils.logger import log_debug, log_error, log_info, log_warning
+
+FINISHED_STATUSES = ("completed", "error")
+
+def estimate_size(session: AnalysisSession) -> int:
+    """Approximate bytes held by a live session: its large strings plus a fixed overhead"""
+    size = 2048 + len(session.result or "") + len(session.error or "")
+    if session.context:
+        size += len(session.context.extractedText)
+        if session.context.waterData:
+            size += 256 * len(session.context.waterData.parameters)
+    return size
+
+class SessionStore(ABC):
+    """
+    Storage backend for analysis sessions. The API is async so backends that can wait on I/O
+    or locks (SQLite, Redis) never block the event loop; the memory store completes inline.
+    """
+
+    @abstractmethod
+    async def get(self, analysis_id: str) -> Optional[AnalysisSession]:
+        """Session by ID, None if it does not exist"""
+
+    @abstractmethod
+    async def save(self, session: AnalysisSession):
+        """Insert or replace a session (call after every change)"""
+
+    @abstractmethod
+    async def delete(self, analysis_id: str) -> bool:
+        """Remove a session, True if it existed"""
+
+    @abstractmethod
+    async def list_ids(self, status: Optional[str] = None, started_before: Optional[datetime] = None) -> List[str]:
+        """IDs of sessions, optionally filtered by status and start time"""
+
+    @abstractmethod
+    async def count(self, status: Optional[str] = None) -> int:
+        """Number of sessions, optionally with the given status"""
+
+    @abstractmethod
+    async def usage(self, limit: int = 20) -> Dict[str, Any]:
+        """Session count, bytes held and the largest sessions (diagnostics)"""
+
+    async def close(self):
+        """Release connections held by the backend"""
+
+@dataclass
+class _MemoryEntry:
+    status: str
+    start_time: datetime
+    size: int  # approximate bytes held
+    session: Optional[AnalysisSession] = None  # live object while the analysis runs
+    packed: Optional[bytes] = None  # zlib-compressed JSON once it has finished
+
+class MemorySessionStore(SessionStore):
+    """
+    Process-local sessions (single worker) bounded by total bytes. Running sessions are kept
+    as objects; finished ones are packed into compressed JSON and evicted least recently used
+    first when the store is over max_bytes.
+    """
+
+    def __init__(self, max_bytes: int, compression_level: int = 6):
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self.entries: "OrderedDict[str, _MemoryEntry]" = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = 0
+
+    async def get(self, analysis_id: str) -> Optional[AnalysisSession]:
+        entry = self.entries.get(analysis_id)
+        if entry is None:
+            return None
+        self.entries.move_to_end(analysis_id)
+        if entry.session is not None:
+            return entry.session
+        return AnalysisSession.model_validate_json(zlib.decompress(entry.packed))
+
+    async def save(self, session: AnalysisSession):
+        if session.status in FINISHED_STATUSES:
+            packed = zlib.compress(session.model_dump_json().encode(), self.compression_level)
+            entry = _MemoryEntry(session.status, session.startTime, len(packed), packed=packed)
+        else:
+            entry = _MemoryEntry(session.status, session.startTime, estimate_size(session), session=session)
+
+        self._remove(session.id)
+        self.entries[session.id] = entry
+        self.total_bytes += entry.size
+        self._evict()
+
+    async def delete(self, analysis_id: str) -> bool:
+        return self._remove(analysis_id)
+
+    async def list_ids(self, status: Optional[str] = None, started_before: Optional[datetime] = None) -> List[str]:
+        return [
+            analysis_id for analysis_id, entry in self.entries.items()
+            if (status is None or entry.status == status)
+            and (started_before is None or entry.start_time < started_before)
+        ]
+
+    async def count(self, status: Optional[str] = None) -> int:
+        if status is None:
+            return len(self.entries)
+        return sum(1 for entry in self.entries.values() if entry.status == status)
+
+    async def usage(self, limit: int = 20) -> Dict[str, Any]:
+        largest = sorted(self.entries.items(), key=lambda item: item[1].size, reverse=True)[:limit]
+        return {
+            "backend": "memory",
+            "sessions": len(self.entries),
+            "bytes": self.total_bytes,
+            "maxBytes": self.max_bytes,
+            "evictions": self.evictions,
+            "largest": [
+                {"id": analysis_id, "status": entry.status, "bytes": entry.size, "packed": entry.packed is not None}
+                for analysis_id, entry in largest
+            ]
+        }
+
+    def _remove(self, analysis_id: str) -> bool:
+        entry = self.entries.pop(analysis_id, None)
+        if entry is None:
+            return False
+        self.total_bytes -= entry.size
+        return True
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        # Running analyses are never evicted, their pipelines still need the session
+        for analysis_id in [key for key, entry in self.entries.items() if entry.packed is not None]:
+            if self.total_bytes <= self.max_bytes:
+                return
+            self._remove(analysis_id)
+            self.evictions += 1
+            log_info(f"Evicted session {analysis_id} from memory store (size bound)", "SESSION_STORE")
+        if self.total_bytes <= self.max_bytes:
+            return
+        log_warning(
+            f"Running sessions use {self.total_bytes // 1024}KB, above SESSION_MEMORY_MAX_MB",
+            "SESSION_STORE"
+        )
+
+@dataclass
+class _CachedSession:
+    session: AnalysisSession
+    version: int  # row version the session was read or written at
+    checked: int  # PRAGMA data_version when the version was last confirmed
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite database in WAL mode, shared by all worker processes on the host.
+    Queries run on one dedicated thread per process, so waiting for another worker's write
+    lock (up to the 5s busy timeout) never blocks the event loop.
+    Reads go through an in-process LRU cache: while no other connection has committed
+    (PRAGMA data_version unchanged) a cached session is returned without touching the table,
+    otherwise only its row version is compared before the JSON is parsed again.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS sessions ("
+        " id TEXT PRIMARY KEY,"
+        " status TEXT NOT NULL,"
+        " start_time REAL NOT NULL,"
+        " version INTEGER NOT NULL DEFAULT 1,"
+        " data TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS sessions_status_start ON sessions (status, start_time)",
+        "CREATE INDEX IF NOT EXISTS sessions_start ON sessions (start_time)",
+    )
+
+    def __init__(self, db_path: str, cache_size: int):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, _CachedSession]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.connection: Optional[sqlite3.Connection] = None
+        self.pid: Optional[int] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.executor_pid: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily and per process: render pool workers import this module too
+        if self.connection is None or self.pid != os.getpid():
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            self.connection = connection
+            self.pid = os.getpid()
+            self.cache.clear()
+            log_info(f"SQLite session store opened at {self.db_path}", "SESSION_STORE")
+        return self.connection
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        # Created per process, like the connection
+        if self.executor is None or self.executor_pid != os.getpid():
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-db")
+            self.executor_pid = os.getpid()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def get(self, analysis_id: str) -> Optional[AnalysisSession]:
+        session = self._get_unchanged(analysis_id)
+        if session is not None:
+            return session
+        return await self._run(self._get, analysis_id)
+
+    async def save(self, session: AnalysisSession):
+        await self._run(self._save, session)
+
+    async def delete(self, analysis_id: str) -> bool:
+        return await self._run(self._delete, analysis_id)
+
+    async def list_ids(self, status: Optional[str] = None, started_before: Optional[datetime] = None) -> List[str]:
+        return await self._run(self._list_ids, status, started_before)
+
+    async def count(self, status: Optional[str] = None) -> int:
+        return await self._run(self._count, status)
+
+    async def usage(self, limit: int = 20) -> Dict[str, Any]:
+        return await self._run(self._usage, limit)
+
+    async def close(self):
+        if self.executor is not None and self.executor_pid == os.getpid():
+            self.executor.shutdown(wait=True)
+        self.executor = None
+
+    def _get_unchanged(self, analysis_id: str) -> Optional[AnalysisSession]:
+        """
+        Cached session, on the event loop, while no other connection has committed since it was
+        checked. Never waits: if the DB thread holds the lock, the read goes through the thread.
+        """
+        if self.connection is None or self.pid != os.getpid() or not self.lock.acquire(blocking=False):
+            return None
+        try:
+            cached = self.cache.get(analysis_id)
+            if cached is None or cached.checked != self._data_version(self.connection):
+                return None
+            self.cache.move_to_end(analysis_id)
+            self.hits += 1
+            return cached.session
+        finally:
+            self.lock.release()
+
+    def _data_version(self, connection: sqlite3.Connection) -> int:
+        return connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def _remember(self, session: AnalysisSession, version: int, checked: int):
+        self.cache[session.id] = _CachedSession(session, version, checked)
+        self.cache.move_to_end(session.id)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _get(self, analysis_id: str) -> Optional[AnalysisSession]:
+        with self.lock:
+            connection = self._connect()
+            data_version = self._data_version(connection)
+            cached = self.cache.get(analysis_id)
+
+            if cached is not None:
+                if cached.checked != data_version:
+                    row = connection.execute("SELECT version FROM sessions WHERE id = ?", (analysis_id,)).fetchone()
+                    if row is None or row[0] != cached.version:
+                        cached = None
+                    else:
+                        cached.checked = data_version
+                if cached is not None:
+                    self.cache.move_to_end(analysis_id)
+                    self.hits += 1
+                    return cached.session
+
+            self.misses += 1
+            row = connection.execute("SELECT version, data FROM sessions WHERE id = ?", (analysis_id,)).fetchone()
+            if row is None:
+                self.cache.pop(analysis_id, None)
+                return None
+
+            session = AnalysisSession.model_validate_json(row[1])
+            self._remember(session, row[0], data_version)
+            return session
+
+    def _save(self, session: AnalysisSession):
+        data = session.model_dump_json()
+        with self.lock:
+            connection = self._connect()
+            version = connection.execute(
+                "INSERT INTO sessions (id, status, start_time, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET status = excluded.status, start_time = excluded.start_time, "
+                "data = excluded.data, version = sessions.version + 1 RETURNING version",
+                (session.id, session.status, session.startTime.timestamp(), data)
+            ).fetchone()[0]
+            self._remember(session, version, self._data_version(connection))
+
+    def _delete(self, analysis_id: str) -> bool:
+        with self.lock:
+            connection = self._connect()
+            self.cache.pop(analysis_id, None)
+            return connection.execute("DELETE FROM sessions WHERE id = ?", (analysis_id,)).rowcount > 0
+
+    def _list_ids(self, status: Optional[str] = None, started_before: Optional[datetime] = None) -> List[str]:
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if started_before is not None:
+            conditions.append("start_time < ?")
+            params.append(started_before.timestamp())
+        query = "SELECT id FROM sessions"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        with self.lock:
+            return [row[0] for row in self._connect().execute(query, params)]
+
+    def _count(self, status: Optional[str] = None) -> int:
+        with self.lock:
+            connection = self._connect()
+            if status is None:
+                return connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            return connection.execute("SELECT COUNT(*) FROM sessions WHERE status = ?", (status,)).fetchone()[0]
+
+    def _usage(self, limit: int = 20) -> Dict[str, Any]:
+        with self.lock:
+            connection = self._connect()
+            sessions, total = connection.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions").fetchone()
+            largest = connection.execute(
+                "SELECT id, status, LENGTH(data) FROM sessions ORDER BY LENGTH(data) DESC LIMIT ?", (limit,)
+            ).fetchall()
+            cached = sum(estimate_size(entry.session) for entry in self.cache.values())
+        return {
+            "backend": "sqlite",
+            "sessions": sessions,
+            "bytes": total,
+            "cachedSessions": len(self.cache),
+            "cachedBytes": cached,
+            "cacheHits": self.hits,
+            "cacheMisses": self.misses,
+            "largest": [{"id": row[0], "status": row[1], "bytes": row[2]} for row in largest]
+        }
+
+def create_session_store() -> SessionStore:
+    """Create session store selected by SESSION_STORE_BACKEND"""
+    backend = settings.SESSION_STORE_BACKEND
+    if backend == "redis":
+        # Optional dependency, only needed for multi-node deployments
+        from app.services.redis_backend import RedisSessionStore
+        log_debug(f"Using Redis session store ({settings.REDIS_URL}, prefix '{settings.REDIS_KEY_PREFIX}')", "SESSION_STORE")
+        return RedisSessionStore(settings.REDIS_URL, settings.REDIS_KEY_PREFIX, settings.SESSION_CACHE_SIZE)
+
+    if backend == "sqlite":
+        log_debug(f"Using SQLite session store ({settings.SESSION_DB_PATH}, cache {settings.SESSION_CACHE_SIZE})", "SESSION_STORE")
+        return SQLiteSessionStore(settings.SESSION_DB_PATH, settings.SESSION_CACHE_SIZE)
+
+    if backend != "memory":
+        log_error(f"Unknown SESSION_STORE_BACKEND '{backend}', using memory store", "SESSION_STORE")
+    return MemorySessionStore(settings.SESSION_MEMORY_MAX_MB * 1024 * 1024)
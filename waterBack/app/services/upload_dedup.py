@@ -0,0 +1,83 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+from app.utils.logger import log_debug
+
+class UploadDeduplicator:
+    """
+    Maps recent uploads to the analysis started for them, by content hash (only for uploads with
+    a userId, per user) and by Idempotency-Key (per user, or in an anonymous scope). A key stays
+    bound to the hash of the file it was first sent with: only that same file gets its analysis.
+    Entries expire UPLOAD_DEDUP_MINUTES after the upload; all share that lifetime, so expired
+    entries are always at the front of the insertion-ordered maps.
+    Process-local: with several workers, a repeat upload is only recognised by the same worker.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        # scoped sha256 / scoped key -> (analysis_id, content hash, expires)
+        self.by_content: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+        self.by_key: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+        self.hits = 0
+
+    @staticmethod
+    def _scoped(user_id: Optional[str], value: str) -> str:
+        return f"user:{user_id}:{value}" if user_id else f"anonymous:{value}"
+
+    def _lookup(self, entries: "OrderedDict[str, Tuple[str, str, float]]", key: str) -> Optional[Tuple[str, str]]:
+        now = time.time()
+        while entries:
+            *_, expires = next(iter(entries.values()))
+            if expires > now:
+                break
+            entries.popitem(last=False)
+        entry = entries.get(key)
+        return entry[:2] if entry else None
+
+    def _remember(self, entries: "OrderedDict[str, Tuple[str, str, float]]", key: str, analysis_id: str, content_hash: str):
+        entries.pop(key, None)
+        entries[key] = (analysis_id, content_hash, time.time() + self.ttl)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def find_by_key(self, user_id: Optional[str], idempotency_key: str) -> Optional[Tuple[str, str]]:
+        """Analysis started for an earlier request with this Idempotency-Key, with the hash of its file"""
+        return self._lookup(self.by_key, self._scoped(user_id, idempotency_key))
+
+    def find_by_content(self, user_id: Optional[str], content_hash: str) -> Optional[str]:
+        """Analysis started for an earlier upload of the same PDF by the same user (never for anonymous uploads)"""
+        if not user_id:
+            return None
+        entry = self._lookup(self.by_content, self._scoped(user_id, content_hash))
+        return entry[0] if entry else None
+
+    def register(self, analysis_id: str, user_id: Optional[str], content_hash: str,
+                 idempotency_key: Optional[str] = None):
+        """Remember the analysis started (or reused) for an upload"""
+        if user_id:
+            self._remember(self.by_content, self._scoped(user_id, content_hash), analysis_id, content_hash)
+        if idempotency_key:
+            self._remember(self.by_key, self._scoped(user_id, idempotency_key), analysis_id, content_hash)
+
+    def forget(self, analysis_id: str):
+        """Drop entries pointing at an analysis that was rejected or failed"""
+        for entries in (self.by_content, self.by_key):
+            for key in [key for key, entry in entries.items() if entry[0] == analysis_id]:
+                del entries[key]
+
+    def record_hit(self, analysis_id: str, reason: str):
+        self.hits += 1
+        log_debug(f"Repeated upload ({reason}) reuses {analysis_id}", "UPLOAD_DEDUP")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "contentEntries": len(self.by_content),
+            "keyEntries": len(self.by_key),
+            "hits": self.hits
+        }
+
+# Global upload deduplicator instance
+upload_dedup = UploadDeduplicator(settings.UPLOAD_DEDUP_MINUTES * 60, settings.UPLOAD_DEDUP_MAX_ENTRIES)
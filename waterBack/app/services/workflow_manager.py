@@ -1,11 +1,17 @@
 import asyncio
+import json
 import time
-from typing import Dict, Any, Optional, Callable, List
-from datetime import datetime
+import weakref
+from typing import Dict, Any, Optional, Callable, List, Awaitable
+from datetime import datetime, timedelta
 from dataclasses import dataclass, field
 
+from app.config import settings
 from app.models.water_data import AnalysisSession, AnalysisContext
 from app.models.responses import AnalysisWorkflow, AnalysisStatus
+from app.services.event_bus import BusEvent, EventBus, Subscription
+from app.services.session_store import SessionStore, create_session_store
+from app.utils.deadline_scheduler import DeadlineScheduler
 from app.utils.logger import log_debug, log_error, log_info
 
 @dataclass
@@ -18,13 +24,42 @@ class WorkflowStep:
     progress_end: int
     estimated_duration: float = 10.0  # seconds
 
+@dataclass
+class PipelineStage:
+    """Pipeline stage with declared dependencies"""
+    stage_id: str
+    func: Callable[[Dict[str, Any]], Awaitable[Any]]  # receives results of finished stages
+    depends_on: List[str] = field(default_factory=list)
+
 class WorkflowManager:
     """Manager for analysis workflow and progress tracking"""
     
     def __init__(self):
-        self.active_sessions: Dict[str, AnalysisSession] = {}
+        self.sessions: SessionStore = create_session_store()
+        self.session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
         self.workflow_steps = self._initialize_workflow_steps()
         self.sse_callbacks: Dict[str, List[Callable]] = {}
+        self.events = EventBus(settings.SSE_QUEUE_SIZE, settings.SSE_REPLAY_EVENTS)
+        self.session_lifetime = settings.SESSION_LIFETIME_MINUTES * 60
+        self.expiry = DeadlineScheduler(self._expire_session, "WORKFLOW_MANAGER")
+        self.relay = None
+        if settings.SESSION_STORE_BACKEND == "redis":
+            from app.services.redis_backend import RedisEventRelay
+            self.relay = RedisEventRelay(
+                settings.REDIS_URL, settings.REDIS_KEY_PREFIX, self.sessions, self._on_relayed_event
+            )
+    
+    async def start(self):
+        """Start session expiry and relaying progress events between nodes (redis backend)"""
+        await self.expiry.start()
+        if self.relay:
+            await self.relay.start()
+    
+    async def stop(self):
+        if self.relay:
+            await self.relay.stop()
+        await self.expiry.stop()
+        await self.sessions.close()
     
     def _initialize_workflow_steps(self) -> List[WorkflowStep]:
         """Initialize workflow steps"""
@@ -71,7 +106,7 @@ class WorkflowManager:
             )
         ]
     
-    def start_analysis(self, analysis_id: str, context: AnalysisContext) -> AnalysisSession:
+    async def start_analysis(self, analysis_id: str, context: AnalysisContext) -> AnalysisSession:
         """Start new analysis workflow"""
         session = AnalysisSession(
             id=analysis_id,
@@ -82,84 +117,90 @@ class WorkflowManager:
             context=context
         )
         
-        self.active_sessions[analysis_id] = session
+        await self._save(session)
+        self.expiry.schedule(analysis_id, session.startTime.timestamp() + self.session_lifetime)
         log_info(f"Started analysis workflow for {analysis_id}", "WORKFLOW_MANAGER")
         
         # Send initial update
-        self._send_workflow_update(analysis_id, "upload", "processing", "Rozpoczynanie analizy...", 0)
+        self._send_workflow_update(session, "upload", "processing", "Rozpoczynanie analizy...", 0)
         
         return session
     
-    def update_step(self, analysis_id: str, step_id: str, status: str, message: str, progress: Optional[int] = None):
+    async def update_step(self, analysis_id: str, step_id: str, status: str, message: str, progress: Optional[int] = None):
         """Update workflow step"""
-        if analysis_id not in self.active_sessions:
-            log_error(f"Analysis session not found: {analysis_id}", "WORKFLOW_MANAGER")
-            return
-        
-        session = self.active_sessions[analysis_id]
-        session.currentStep = step_id
-        
-        # Calculate progress if not provided
-        if progress is None:
-            step = self._get_workflow_step(step_id)
-            if step:
-                if status == "completed":
-                    progress = step.progress_end
-                elif status == "processing":
-                    progress = step.progress_start + (step.progress_end - step.progress_start) // 2
-                else:
-                    progress = step.progress_start
-        
-        session.progress = progress
-        
-        # Update session status
-        if status == "error":
-            session.status = "error"
-            session.error = message
-        elif step_id == "complete" and status == "completed":
-            session.status = "completed"
-        
+        async with self._session_lock(analysis_id):
+            session = await self.sessions.get(analysis_id)
+            if session is None:
+                log_error(f"Analysis session not found: {analysis_id}", "WORKFLOW_MANAGER")
+                return
+            
+            session.currentStep = step_id
+            
+            # Calculate progress if not provided
+            if progress is None:
+                step = self._get_workflow_step(step_id)
+                if step:
+                    if status == "completed":
+                        progress = step.progress_end
+                    elif status == "processing":
+                        progress = step.progress_start + (step.progress_end - step.progress_start) // 2
+                    else:
+                        progress = step.progress_start
+            
+            session.progress = progress
+            
+            # Update session status
+            if status == "error":
+                session.status = "error"
+                session.error = message
+            elif step_id == "complete" and status == "completed":
+                session.status = "completed"
+            
+            await self._save(session)
         log_debug(f"Updated step {step_id} for {analysis_id}: {status} ({progress}%)", "WORKFLOW_MANAGER")
         
         # Send SSE update
-        self._send_workflow_update(analysis_id, step_id, status, message, progress)
+        self._send_workflow_update(session, step_id, status, message, progress)
     
-    def complete_analysis(self, analysis_id: str, result: str):
+    async def complete_analysis(self, analysis_id: str, result: str):
         """Complete analysis workflow"""
-        if analysis_id not in self.active_sessions:
-            return
-        
-        session = self.active_sessions[analysis_id]
-        session.status = "completed"
-        session.result = result
-        session.progress = 100
+        async with self._session_lock(analysis_id):
+            session = await self.sessions.get(analysis_id)
+            if session is None:
+                return
+            
+            session.status = "completed"
+            session.result = result
+            session.progress = 100
+            await self._save(session)
         
         log_info(f"Completed analysis workflow for {analysis_id}", "WORKFLOW_MANAGER")
         
         # Send final update
-        self._send_workflow_update(analysis_id, "complete", "completed", "Analiza zakończona pomyślnie", 100)
+        self._send_workflow_update(session, "complete", "completed", "Analiza zakończona pomyślnie", 100)
     
-    def error_analysis(self, analysis_id: str, error_message: str):
+    async def error_analysis(self, analysis_id: str, error_message: str):
         """Mark analysis as error"""
-        if analysis_id not in self.active_sessions:
-            return
-        
-        session = self.active_sessions[analysis_id]
-        session.status = "error"
-        session.error = error_message
+        async with self._session_lock(analysis_id):
+            session = await self.sessions.get(analysis_id)
+            if session is None:
+                return
+            
+            session.status = "error"
+            session.error = error_message
+            await self._save(session)
         
         log_error(f"Analysis failed for {analysis_id}: {error_message}", "WORKFLOW_MANAGER")
         
         # Send error update
-        self._send_workflow_update(analysis_id, session.currentStep, "error", error_message, session.progress)
+        self._send_workflow_update(session, session.currentStep, "error", error_message, session.progress)
     
-    def get_analysis_status(self, analysis_id: str) -> Optional[AnalysisStatus]:
+    async def get_analysis_status(self, analysis_id: str) -> Optional[AnalysisStatus]:
         """Get current analysis status"""
-        if analysis_id not in self.active_sessions:
+        session = await self.sessions.get(analysis_id)
+        if session is None:
             return None
         
-        session = self.active_sessions[analysis_id]
-        
         return AnalysisStatus(
             id=analysis_id,
             status=session.status,
@@ -167,17 +208,47 @@ class WorkflowManager:
             message=f"Krok: {session.currentStep}",
             startTime=session.startTime,
             completedTime=datetime.now() if session.status == "completed" else None,
-            error=session.error
+            error=session.error,
+            stageTimings=session.stageTimings or None,
+            criticalPath=session.criticalPath or None
         )
     
-    def get_session(self, analysis_id: str) -> Optional[AnalysisSession]:
+    async def get_session(self, analysis_id: str) -> Optional[AnalysisSession]:
         """Get analysis session"""
-        return self.active_sessions.get(analysis_id)
+        return await self.sessions.get(analysis_id)
     
-    def cleanup_session(self, analysis_id: str):
+    async def update_context(self, analysis_id: str, context: AnalysisContext):
+        """Store a changed analysis context on the current version of the session"""
+        async with self._session_lock(analysis_id):
+            session = await self.sessions.get(analysis_id)
+            if session is None:
+                return
+            
+            session.context = context
+            await self._save(session)
+    
+    def _session_lock(self, analysis_id: str) -> asyncio.Lock:
+        """Serialises read-modify-write of one session (the store may suspend between get and save)"""
+        lock = self.session_locks.get(analysis_id)
+        if lock is None:
+            lock = self.session_locks[analysis_id] = asyncio.Lock()
+        return lock
+    
+    async def _save(self, session: AnalysisSession):
+        """Persist a session, dropping fields a finished analysis no longer needs"""
+        if session.status in ("completed", "error") and session.context:
+            context = session.context
+            # The extracted text is only needed by the AI analysis
+            context.extractedText = ""
+            # Water data is only needed to render the report (lazy mode renders on the first download)
+            if session.status == "error" or settings.REPORT_RENDER_MODE != "lazy" or context.metadata.get("reportRendered"):
+                context.waterData = None
+        await self.sessions.save(session)
+    
+    async def cleanup_session(self, analysis_id: str):
         """Clean up completed session"""
-        if analysis_id in self.active_sessions:
-            del self.active_sessions[analysis_id]
+        self.events.discard(analysis_id)
+        if await self.sessions.delete(analysis_id):
             log_debug(f"Cleaned up session {analysis_id}", "WORKFLOW_MANAGER")
     
     def register_sse_callback(self, analysis_id: str, callback: Callable):
@@ -188,38 +259,159 @@ class WorkflowManager:
         self.sse_callbacks[analysis_id].append(callback)
         log_debug(f"Registered SSE callback for {analysis_id}", "WORKFLOW_MANAGER")
     
-    def unregister_sse_callback(self, analysis_id: str):
-        """Unregister SSE callbacks"""
-        if analysis_id in self.sse_callbacks:
-            del self.sse_callbacks[analysis_id]
-            log_debug(f"Unregistered SSE callbacks for {analysis_id}", "WORKFLOW_MANAGER")
-    
-    def _send_workflow_update(self, analysis_id: str, step: str, status: str, message: str, progress: int):
-        """Send workflow update to SSE callbacks"""
-        if analysis_id not in self.sse_callbacks:
+    def unregister_sse_callback(self, analysis_id: str, callback: Callable):
+        """Unregister one SSE callback, other clients of the same analysis keep theirs"""
+        callbacks = self.sse_callbacks.get(analysis_id)
+        if not callbacks or callback not in callbacks:
             return
         
-        # Calculate elapsed time
-        session = self.active_sessions.get(analysis_id)
-        elapsed_time = 0
-        if session:
-            elapsed_time = (datetime.now() - session.startTime).total_seconds()
+        callbacks.remove(callback)
+        if not callbacks:
+            del self.sse_callbacks[analysis_id]
+        log_debug(f"Unregistered SSE callback for {analysis_id}", "WORKFLOW_MANAGER")
+    
+    def subscribe(self, analysis_id: str, wakeup: Optional[asyncio.Event] = None) -> Subscription:
+        """Subscribe to workflow updates of an analysis (bounded queue, woken on publish)"""
+        return self.events.subscribe(analysis_id, wakeup)
+    
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a single subscription"""
+        self.events.unsubscribe(subscription)
+    
+    def replay_events(self, analysis_id: str, last_event_id: int) -> Optional[List[BusEvent]]:
+        """Updates published after last_event_id, None if they are no longer buffered"""
+        return self.events.replay(analysis_id, last_event_id)
+    
+    def latest_event_id(self, analysis_id: str) -> int:
+        """ID of the most recent update of an analysis (0 before the first)"""
+        return self.events.last_id(analysis_id)
+    
+    def _send_workflow_update(self, session: AnalysisSession, step: str, status: str, message: str, progress: int):
+        """Publish workflow update to subscribers and SSE callbacks (kept for Last-Event-ID replay)"""
+        analysis_id = session.id
+        elapsed_time = (datetime.now() - session.startTime).total_seconds()
         
         update = AnalysisWorkflow(
             step=step,
             status=status,
             message=message,
             progress=progress,
-            elapsedTime=elapsed_time
+            elapsedTime=elapsed_time,
+            eventId=self.events.next_id(analysis_id)
         )
         
+        # Serialised once for all subscribers; intermediate progress may be coalesced for slow clients
+        event = self.events.publish(
+            analysis_id, update.eventId, update, json.dumps(update.model_dump()),
+            coalescable=status == "processing"
+        )
+        if self.relay:
+            self.relay.publish(analysis_id, event)
+        
         # Send to all registered callbacks
-        for callback in self.sse_callbacks[analysis_id]:
+        for callback in list(self.sse_callbacks.get(analysis_id, ())):
             try:
                 callback(update)
             except Exception as e:
                 log_error(f"SSE callback error: {str(e)}", "WORKFLOW_MANAGER")
     
+    def _on_relayed_event(self, analysis_id: str, event_id: int, coalescable: bool, payload_json: str):
+        """Update of an analysis running on another node, delivered to subscribers connected here"""
+        if not self.events.subscriber_count(analysis_id):
+            return
+        update = AnalysisWorkflow.model_validate_json(payload_json)
+        self.events.publish(analysis_id, event_id, update, payload_json, coalescable=coalescable)
+    
+    async def run_pipeline(self, analysis_id: str, stages: List[PipelineStage]) -> Dict[str, Any]:
+        """
+        Execute stages as a DAG: each stage starts as soon as its dependencies
+        finish, so independent stages overlap. Returns results by stage ID.
+        """
+        ordered = self._topological_order(stages)
+        results: Dict[str, Any] = {}
+        timings: Dict[str, Dict[str, float]] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        pipeline_start = time.perf_counter()
+        
+        async def run_stage(stage: PipelineStage):
+            if stage.depends_on:
+                await asyncio.gather(*(tasks[dep] for dep in stage.depends_on))
+            
+            started = time.perf_counter()
+            results[stage.stage_id] = await stage.func(results)
+            finished = time.perf_counter()
+            
+            timings[stage.stage_id] = {
+                "start": round(started - pipeline_start, 3),
+                "end": round(finished - pipeline_start, 3),
+                "duration": round(finished - started, 3)
+            }
+            log_debug(f"Stage {stage.stage_id} for {analysis_id} took {finished - started:.3f}s", "WORKFLOW_MANAGER")
+        
+        for stage in ordered:
+            tasks[stage.stage_id] = asyncio.create_task(run_stage(stage))
+        
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            await self._record_stage_timings(analysis_id, stages, timings)
+        
+        return results
+    
+    def _topological_order(self, stages: List[PipelineStage]) -> List[PipelineStage]:
+        """Order stages so dependencies come first, rejecting unknown deps and cycles"""
+        by_id = {stage.stage_id: stage for stage in stages}
+        ordered: List[PipelineStage] = []
+        state: Dict[str, str] = {}
+        
+        def visit(stage_id: str):
+            if state.get(stage_id) == "done":
+                return
+            if state.get(stage_id) == "visiting":
+                raise ValueError(f"Pipeline has a dependency cycle at stage '{stage_id}'")
+            if stage_id not in by_id:
+                raise ValueError(f"Pipeline stage '{stage_id}' is not defined")
+            
+            state[stage_id] = "visiting"
+            for dep in by_id[stage_id].depends_on:
+                visit(dep)
+            state[stage_id] = "done"
+            ordered.append(by_id[stage_id])
+        
+        for stage in stages:
+            visit(stage.stage_id)
+        
+        return ordered
+    
+    async def _record_stage_timings(self, analysis_id: str, stages: List[PipelineStage], timings: Dict[str, Dict[str, float]]):
+        """Store per-stage timings and the critical path on the session"""
+        critical_path: List[str] = []
+        
+        if timings:
+            deps = {stage.stage_id: stage.depends_on for stage in stages}
+            # Walk back from the last stage to finish through the dependency that finished last
+            current = max(timings, key=lambda stage_id: timings[stage_id]["end"])
+            while current:
+                critical_path.insert(0, current)
+                finished_deps = [dep for dep in deps.get(current, []) if dep in timings]
+                current = max(finished_deps, key=lambda dep: timings[dep]["end"]) if finished_deps else None
+        
+        async with self._session_lock(analysis_id):
+            session = await self.sessions.get(analysis_id)
+            if session:
+                session.stageTimings = timings
+                session.criticalPath = critical_path
+                await self._save(session)
+        
+        if critical_path:
+            total = timings[critical_path[-1]]["end"]
+            log_info(f"Critical path for {analysis_id}: {' -> '.join(critical_path)} ({total:.2f}s)", "WORKFLOW_MANAGER")
+    
     def _get_workflow_step(self, step_id: str) -> Optional[WorkflowStep]:
         """Get workflow step by ID"""
         for step in self.workflow_steps:
@@ -227,23 +419,31 @@ class WorkflowManager:
                 return step
         return None
     
-    def get_active_sessions_count(self) -> int:
+    async def get_active_sessions_count(self) -> int:
         """Get count of active sessions"""
-        return len(self.active_sessions)
+        return await self.sessions.count()
     
-    def cleanup_old_sessions(self, max_age_hours: int = 24):
-        """Clean up old sessions"""
-        current_time = datetime.now()
-        to_remove = []
-        
-        for analysis_id, session in self.active_sessions.items():
-            age = (current_time - session.startTime).total_seconds() / 3600
-            if age > max_age_hours:
-                to_remove.append(analysis_id)
+    async def _expire_session(self, analysis_id: str):
+        """Session deadline reached (SESSION_LIFETIME_MINUTES after start)"""
+        await self.cleanup_session(analysis_id)
+        self.sse_callbacks.pop(analysis_id, None)
+    
+    async def cleanup_old_sessions(self, max_age_minutes: int = 60):
+        """
+        Reconciliation for sessions whose deadline is not held by this process
+        (started before a restart or by another worker/node)
+        """
+        cutoff = datetime.now() - timedelta(minutes=max_age_minutes)
+        to_remove = await self.sessions.list_ids(started_before=cutoff)
         
         for analysis_id in to_remove:
-            self.cleanup_session(analysis_id)
-            self.unregister_sse_callback(analysis_id)
+            self.expiry.cancel(analysis_id)
+            await self._expire_session(analysis_id)
+        
+        # Relayed event history of analyses removed by another node
+        for analysis_id in list(self.events.channels):
+            if await self.sessions.get(analysis_id) is None:
+                self.events.discard(analysis_id)
         
         if to_remove:
             log_info(f"Cleaned up {len(to_remove)} old sessions", "WORKFLOW_MANAGER")
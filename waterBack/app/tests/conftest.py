@@ -0,0 +1,4 @@
+import os
+
+# app.services builds its clients at import time; the tests never call the API
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
@@ -0,0 +1,182 @@
+"""
+Redis session store and event relay against the local stand-in (tools.mock_redis).
+
+Run from waterBack/:
+    pytest app/tests/test_redis_backend.py
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from app.models.water_data import AnalysisSession
+from app.services.event_bus import BusEvent
+from app.services.redis_backend import RedisEventRelay, RedisSessionStore
+from tools.mock_redis import MockRedisConfig, serve
+
+PREFIX = "test:"
+
+def make_session(analysis_id: str, status: str = "processing", started: datetime = None) -> AnalysisSession:
+    return AnalysisSession(
+        id=analysis_id,
+        status=status,
+        startTime=started or datetime.now(),
+        currentStep="upload",
+        progress=0
+    )
+
+@asynccontextmanager
+async def mock_redis():
+    """Mock Redis on a free port, yields its URL"""
+    config = MockRedisConfig()
+    config.HOST, config.PORT = "127.0.0.1", 0
+    server = await serve(config)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        yield f"redis://127.0.0.1:{port}/0"
+    finally:
+        server.close()
+        await server.wait_closed()
+
+@asynccontextmanager
+async def node(url: str, received: List[Tuple[str, int, bool, str]] = None):
+    """Session store with its event relay started, as one app node runs them"""
+    received = [] if received is None else received
+    store = RedisSessionStore(url, PREFIX, cache_size=16)
+    relay = RedisEventRelay(url, PREFIX, store, lambda *event: received.append(event))
+    await relay.start()
+    try:
+        await wait_for(lambda: store.cache_enabled)
+        yield store, relay
+    finally:
+        await relay.stop()
+        await store.close()
+
+async def wait_for(condition, timeout: float = 2.0):
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+def test_store_get_save_delete():
+    async def scenario():
+        async with mock_redis() as url:
+            store = RedisSessionStore(url, PREFIX, cache_size=16)
+            session = make_session("analysis_000000000001")
+            await store.save(session)
+
+            stored = await store.get(session.id)
+            assert stored is not None
+            assert stored.model_dump() == session.model_dump()
+            assert await store.get("analysis_ffffffffffff") is None
+
+            session.progress = 40
+            session.currentStep = "analysis"
+            await store.save(session)
+            assert (await store.get(session.id)).progress == 40
+
+            assert await store.delete(session.id) is True
+            assert await store.delete(session.id) is False
+            assert await store.get(session.id) is None
+            assert await store.count() == 0
+            await store.close()
+
+    asyncio.run(scenario())
+
+def test_store_status_and_start_time_indexes():
+    async def scenario():
+        async with mock_redis() as url:
+            store = RedisSessionStore(url, PREFIX, cache_size=16)
+            now = datetime.now()
+            old = make_session("analysis_000000000001", started=now - timedelta(hours=2))
+            recent = make_session("analysis_000000000002", started=now)
+            failed = make_session("analysis_000000000003", status="error", started=now - timedelta(hours=1))
+            for session in (old, recent, failed):
+                await store.save(session)
+
+            assert sorted(await store.list_ids()) == sorted([old.id, recent.id, failed.id])
+            assert sorted(await store.list_ids(status="processing")) == sorted([old.id, recent.id])
+            assert await store.list_ids(status="error") == [failed.id]
+            assert sorted(await store.list_ids(started_before=now - timedelta(minutes=30))) == sorted([old.id, failed.id])
+            assert await store.list_ids(status="processing", started_before=now - timedelta(minutes=30)) == [old.id]
+
+            # A status change moves the session between status indexes
+            old.status = "completed"
+            await store.save(old)
+            assert await store.list_ids(status="processing") == [recent.id]
+            assert await store.list_ids(status="completed") == [old.id]
+            assert await store.count() == 3
+            assert await store.count("processing") == 1
+            assert await store.count("completed") == 1
+            assert await store.count("error") == 1
+
+            await store.delete(failed.id)
+            assert await store.count("error") == 0
+            assert failed.id not in await store.list_ids()
+
+            usage = await store.usage()
+            assert usage["backend"] == "redis"
+            assert usage["sessions"] == 2
+            await store.close()
+
+    asyncio.run(scenario())
+
+def test_cache_invalidated_by_other_node():
+    async def scenario():
+        async with mock_redis() as url:
+            async with node(url) as (store_a, _), node(url) as (store_b, _):
+                session = make_session("analysis_000000000001")
+                invalidations = store_b.invalidations
+                await store_a.save(session)
+                # A read overlapping the change notification is not cached, let it arrive first
+                await wait_for(lambda: store_b.invalidations > invalidations)
+
+                # Node B reads it once from Redis, then from its cache
+                assert (await store_b.get(session.id)).progress == 0
+                assert session.id in store_b.cache
+                misses = store_b.misses
+                await store_b.get(session.id)
+                assert store_b.misses == misses
+
+                # A save on node A drops node B's copy
+                updated = session.model_copy(update={"progress": 60, "currentStep": "analysis"})
+                await store_a.save(updated)
+                await wait_for(lambda: session.id not in store_b.cache)
+                assert (await store_b.get(session.id)).progress == 60
+
+                # So does a delete
+                await store_a.delete(session.id)
+                await wait_for(lambda: session.id not in store_b.cache)
+                assert await store_b.get(session.id) is None
+
+                # A node's own saves do not invalidate its cache
+                await store_b.save(make_session("analysis_000000000002"))
+                await asyncio.sleep(0.1)
+                assert "analysis_000000000002" in store_b.cache
+
+    asyncio.run(scenario())
+
+def test_relay_delivers_events_with_original_ids():
+    async def scenario():
+        received_a, received_b = [], []
+        async with mock_redis() as url:
+            async with node(url, received_a) as (_, relay_a), node(url, received_b) as _:
+                for event_id, status in ((1, "processing"), (2, "processing"), (7, "completed")):
+                    payload = json.dumps({"step": "analysis", "status": status, "eventId": event_id})
+                    relay_a.publish("analysis_000000000001", BusEvent(
+                        event_id, None, payload, b"", coalescable=status == "processing"
+                    ))
+
+                await wait_for(lambda: len(received_b) == 3)
+                assert [(analysis_id, event_id, coalescable) for analysis_id, event_id, coalescable, _ in received_b] == [
+                    ("analysis_000000000001", 1, True),
+                    ("analysis_000000000001", 2, True),
+                    ("analysis_000000000001", 7, False)
+                ]
+                assert json.loads(received_b[-1][3])["status"] == "completed"
+                # The publishing node does not receive its own events back
+                await asyncio.sleep(0.1)
+                assert received_a == []
+                assert relay_a.relayed == 3
+
+    asyncio.run(scenario())
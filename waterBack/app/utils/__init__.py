@@ -1,3 +1 @@
 from .logger import setup_logger
-from .file_handler import FileHandler
-from .validation import validate_pdf_file 
\ No newline at end of file
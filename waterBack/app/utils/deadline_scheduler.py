@@ -0,0 +1,110 @@
+import asyncio
+import heapq
+import inspect
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.utils.logger import log_debug, log_error
+
+class DeadlineScheduler:
+    """
+    Runs on_due(key) when a key's deadline (epoch seconds) passes. Deadlines sit in a heap and a
+    single task sleeps until the earliest one, so nothing is scanned and expiry happens on time.
+    Rescheduling or cancelling a key leaves its old heap entry behind; stale entries are skipped
+    when they surface and the heap is rebuilt when they outnumber live ones.
+    """
+
+    def __init__(self, on_due: Callable[[str], Any], component: str):
+        self.on_due = on_due
+        self.component = component
+        self.deadlines: Dict[str, float] = {}
+        self.heap: List[Tuple[float, int, str]] = []
+        self.sequence = 0
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.fired = 0
+
+    def schedule(self, key: str, due: float):
+        """Set (or move) the deadline of key"""
+        self.deadlines[key] = due
+        self.sequence += 1
+        heapq.heappush(self.heap, (due, self.sequence, key))
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            self._rebuild()
+        # Only a new earliest deadline changes how long the timer should sleep
+        if self.wakeup is not None and self.heap[0][2] == key:
+            self.wakeup.set()
+
+    def cancel(self, key: str):
+        self.deadlines.pop(key, None)
+
+    def due_at(self, key: str) -> Optional[float]:
+        return self.deadlines.get(key)
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.deadlines
+
+    async def start(self):
+        if self.task:
+            return
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        self.wakeup = None
+
+    def _rebuild(self):
+        self.heap = [(due, index, key) for index, (key, due) in enumerate(self.deadlines.items())]
+        heapq.heapify(self.heap)
+        self.sequence = len(self.heap)
+
+    def _pop_stale(self):
+        while self.heap and self.deadlines.get(self.heap[0][2]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+    async def _run(self):
+        while True:
+            self._pop_stale()
+            self.wakeup.clear()
+
+            if not self.heap:
+                await self.wakeup.wait()
+                continue
+
+            due, _, key = self.heap[0]
+            delay = due - time.time()
+            if delay > 0:
+                try:
+                    async with asyncio.timeout(delay):
+                        await self.wakeup.wait()
+                except TimeoutError:
+                    pass
+                continue
+
+            # Everything due by now expires in one batch, awaited together
+            now = time.time()
+            due_keys = []
+            while self.heap and self.heap[0][0] <= now:
+                due, _, key = heapq.heappop(self.heap)
+                if self.deadlines.get(key) == due:
+                    del self.deadlines[key]
+                    due_keys.append(key)
+            self.fired += len(due_keys)
+            await asyncio.gather(*(self._expire(key) for key in due_keys))
+
+    async def _expire(self, key: str):
+        try:
+            result = self.on_due(key)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            log_error(f"Expiry of {key} failed: {str(e)}", self.component)
+        else:
+            log_debug(f"Expired {key}", self.component)
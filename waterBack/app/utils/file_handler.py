@@ -1,9 +1,10 @@
 import os
 import uuid
-import shutil
+import asyncio
+import hashlib
 import aiofiles
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 from fastapi import UploadFile
 
 from app.config import settings
@@ -38,19 +39,45 @@ class FileHandler:
         unique_id = str(uuid.uuid4())
         return f"{unique_id}{file_extension}"
     
-    async def save_uploaded_file(self, file: UploadFile, analysis_id: str) -> str:
-        """Save uploaded file to disk"""
+    def _copy_and_hash(self, source, file_path: Path) -> str:
+        """Copy the upload in chunks, hashing each chunk on the way (single pass)"""
+        digest = hashlib.sha256()
+        with open(file_path, "wb") as buffer:
+            while True:
+                chunk = source.read(1024 * 1024)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                buffer.write(chunk)
+        return digest.hexdigest()
+    
+    def _hash(self, source) -> str:
+        """SHA-256 of the upload, leaving it rewound for saving"""
+        digest = hashlib.sha256()
+        while True:
+            chunk = source.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+        source.seek(0)
+        return digest.hexdigest()
+    
+    async def hash_upload(self, file: UploadFile) -> str:
+        """SHA-256 of an upload without storing it (off the event loop)"""
+        return await asyncio.to_thread(self._hash, file.file)
+    
+    async def save_uploaded_file(self, file: UploadFile, analysis_id: str) -> Tuple[str, str]:
+        """Save uploaded file to disk (off the event loop). Returns the path and SHA-256 of the content"""
         try:
             # Generate unique filename
             unique_filename = self.generate_unique_filename(file.filename)
             file_path = self.upload_dir / unique_filename
             
             # Save file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            content_hash = await asyncio.to_thread(self._copy_and_hash, file.file, file_path)
             
             log_info(f"File saved: {unique_filename}", "FILE_HANDLER")
-            return str(file_path)
+            return str(file_path), content_hash
             
         except Exception as e:
             log_error(f"Failed to save file: {str(e)}", "FILE_HANDLER")
@@ -0,0 +1,106 @@
+import asyncio
+import os
+from typing import Dict, Optional, Tuple
+
+from fastapi.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 64 * 1024
+
+class RangeNotSatisfiable(Exception):
+    """Range header that does not overlap the representation (416)"""
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Single byte range as (start, end) with end exclusive, None to serve the full body.
+
+    Multi-range and malformed headers are ignored (a full 200 is always a valid answer).
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - length, 0), size
+        start = int(first)
+        end = int(last) + 1 if last else size
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if end <= start:
+        return None
+    return start, min(end, size)
+
+def if_range_matches(if_range: Optional[str], etag: str) -> bool:
+    """If-Range allows a partial response only for an exact strong ETag match (dates are not used)"""
+    return if_range is None or if_range.strip() == etag
+
+def content_range(start: int, end: int, size: int) -> str:
+    return f"bytes {start}-{end - 1}/{size}"
+
+def offload_headers(mode: str, path: str, reports_dir: str, prefix: str) -> Optional[Dict[str, str]]:
+    """Headers handing the transfer to a fronting proxy, None when offload is disabled"""
+    if mode == "x-accel":
+        return {"X-Accel-Redirect": prefix.rstrip("/") + "/" + os.path.relpath(path, reports_dir)}
+    if mode == "x-sendfile":
+        return {"X-Sendfile": os.path.abspath(path)}
+    return None
+
+class FileRangeResponse(Response):
+    """A file (or one byte range of it) sent with zero-copy when the server offers it.
+
+    Uses the ASGI http.response.zerocopysend extension (sendfile(2) in the server),
+    http.response.pathsend for whole files, and chunked reads in a thread otherwise.
+    """
+
+    def __init__(self, path: str, start: int, end: int, status_code: int = 200,
+                 headers: Optional[Dict[str, str]] = None, media_type: Optional[str] = None):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers({**(headers or {}), "Content-Length": str(end - start)})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method", "GET").upper() == "HEAD" or self.end <= self.start:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in extensions:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.start,
+                    "count": self.end - self.start,
+                    "more_body": False
+                })
+                return
+
+            if "http.response.pathsend" in extensions and self.start == 0 and self.end == os.fstat(f.fileno()).st_size:
+                await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+                return
+
+            f.seek(self.start)
+            position = self.start
+            while position < self.end:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, self.end - position))
+                if not chunk:
+                    raise RuntimeError(f"File at path {self.path} is shorter than expected")
+                position += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": position < self.end})
@@ -0,0 +1,146 @@
+import hashlib
+import marshal
+import os
+import weakref
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import reportlab
+from reportlab.pdfbase.ttfonts import TTEncoding, TTFNameBytes, TTFont, TTFontFace
+
+from app.utils.logger import log_debug, log_warning
+
+# Bump when the cached layout changes
+CACHE_FORMAT = 2
+
+# Not cached: raw font bytes (read anyway to hash the file) and the scale function
+_FACE_EXCLUDED = ('_ttf_data', '_pdfScale')
+
+# Metrics the PDF backend reads, with the types each may have in a usable cache entry
+_NUMBER = (int, float)
+_REQUIRED_FACE_FIELDS = {
+    'name': (bytes,), 'unitsPerEm': (int,), 'ascent': _NUMBER, 'descent': _NUMBER, 'bbox': (list,),
+    'charToGlyph': (dict,), 'charWidths': (dict,), 'hmetrics': (list,), 'defaultWidth': _NUMBER
+}
+
+def _cache_path(cache_dir: Path, digest: str) -> Path:
+    return cache_dir / f"{digest[:32]}-rl{reportlab.Version}-v{CACHE_FORMAT}.marshal"
+
+def _pdf_scale(units_per_em: int):
+    if units_per_em == 1000:
+        return lambda x: x
+    multiplier = 1000 / units_per_em
+    return lambda x: x * multiplier
+
+def _is_plain(value: Any) -> bool:
+    """Only data survives a cache round trip: no code objects or other marshal-able extras"""
+    if value is None or type(value) in (bool, int, float, str, bytes):
+        return True
+    if type(value) in (list, tuple):
+        return all(_is_plain(item) for item in value)
+    if type(value) is dict:
+        return all(type(key) in (int, str) and _is_plain(item) for key, item in value.items())
+    return False
+
+def _store(font: TTFont, cache_path: Path):
+    face_state: Dict[str, Any] = {}
+    names = []
+    for key, value in vars(font.face).items():
+        if key in _FACE_EXCLUDED:
+            continue
+        if isinstance(value, TTFNameBytes):
+            names.append(key)
+            value = bytes(value)
+        if _is_plain(value):
+            face_state[key] = value
+
+    entry = {
+        'format': CACHE_FORMAT,
+        'face': face_state,
+        'names': names,
+        'asciiReadable': font._asciiReadable,
+        'shapable': bool(font.shapable)
+    }
+    temp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(temp_path, "wb") as f:
+            f.write(marshal.dumps(entry))
+        os.replace(temp_path, cache_path)
+    except Exception as e:
+        temp_path.unlink(missing_ok=True)
+        log_warning(f"Could not write font metrics cache {cache_path}: {str(e)}", "FONT_CACHE")
+
+def _read_entry(cache_path: Path) -> Optional[Dict[str, Any]]:
+    """Cache entry if it is well-formed plain data, None otherwise"""
+    try:
+        entry = marshal.loads(cache_path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log_warning(f"Ignoring unreadable font metrics cache {cache_path}: {str(e)}", "FONT_CACHE")
+        return None
+
+    valid = (
+        type(entry) is dict and _is_plain(entry)
+        and entry.get('format') == CACHE_FORMAT
+        and type(entry.get('face')) is dict
+        and type(entry.get('names')) is list
+        and all(type(name) is str and type(entry['face'].get(name)) is bytes for name in entry['names'])
+        and all(type(entry['face'].get(key)) in kinds for key, kinds in _REQUIRED_FACE_FIELDS.items())
+        and entry['face']['unitsPerEm'] > 0
+        and type(entry.get('shapable')) is bool
+        and type(entry.get('asciiReadable')) in (bool, int)
+    )
+    if not valid:
+        log_warning(f"Ignoring invalid font metrics cache {cache_path}", "FONT_CACHE")
+        return None
+    return entry
+
+def _load(name: str, data: bytes, cache_path: Path) -> Optional[TTFont]:
+    entry = _read_entry(cache_path)
+    if entry is None:
+        return None
+
+    face_state = entry['face']
+    for key in entry['names']:
+        face_state[key] = TTFNameBytes(face_state[key])
+
+    # Same attributes TTFontFile sets while parsing, including the two it keeps privately
+    face = TTFontFace.__new__(TTFontFace)
+    for key, value in face_state.items():
+        setattr(face, key, value)
+    face._ttf_data = data
+    face._pdfScale = _pdf_scale(face.unitsPerEm)
+
+    # Mirrors TTFont.__init__ with the parsed face
+    font = TTFont.__new__(TTFont)
+    font.fontName = name
+    font.face = face
+    font.encoding = TTEncoding()
+    font.state = weakref.WeakKeyDictionary()
+    font._asciiReadable = entry['asciiReadable']
+    font.shapable = entry['shapable']
+    return font
+
+def load_ttfont(name: str, path: Path, cache_dir: Optional[Path]) -> TTFont:
+    """
+    TTFont with parsed metrics restored from a cache keyed by the font file hash
+    (and reportlab version), parsing the file only on a miss. Entries are plain data
+    (marshal) and are validated before use; anything else is ignored and reparsed.
+    """
+    if cache_dir is None:
+        return TTFont(name, str(path))
+
+    data = path.read_bytes()
+    cache_path = _cache_path(cache_dir, hashlib.sha256(data).hexdigest())
+
+    font = _load(name, data, cache_path)
+    if font is not None:
+        log_debug(f"Loaded {name} metrics from cache", "FONT_CACHE")
+        return font
+
+    font = TTFont(name, str(path))
+    _store(font, cache_path)
+    log_debug(f"Parsed {name} and cached its metrics in {cache_path}", "FONT_CACHE")
+    return font
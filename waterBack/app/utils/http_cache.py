@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+# Preferred order when the client accepts several encodings equally
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+ETAG_SUFFIXES = {"br": "-br", "gzip": "-gz", "identity": ""}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+@dataclass
+class CachedBody:
+    """Response body precompressed once, with a strong ETag per encoding"""
+    media_type: str
+    identity: bytes
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+    digest: str = ""
+
+    @classmethod
+    def build(cls, content: bytes, media_type: str) -> "CachedBody":
+        encoded = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli:
+            encoded["br"] = brotli.compress(content, quality=11)
+        # Only keep encodings that actually save bytes
+        encoded = {name: body for name, body in encoded.items() if len(body) < len(content)}
+        return cls(media_type, content, encoded, hashlib.sha256(content).hexdigest()[:32])
+
+    def etag(self, encoding: str = "identity") -> str:
+        return f'"{self.digest}{ETAG_SUFFIXES[encoding]}"'
+
+    @property
+    def stored_size(self) -> int:
+        return len(self.identity) + sum(map(len, self.encoded.values()))
+
+def negotiate_encoding(accept_encoding: Optional[str], available) -> str:
+    """Pick the best content-coding from Accept-Encoding among the available ones"""
+    if not accept_encoding:
+        return "identity"
+
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    best, best_quality = "identity", 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        if encoding not in available:
+            continue
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def digest_matches(if_none_match: Optional[str], digest: str) -> bool:
+    """If-None-Match check (weak comparison, any encoding variant of the same content matches)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"').split("-")[0] == digest:
+            return True
+    return False
+
+def etag_matches(if_none_match: Optional[str], body: CachedBody) -> bool:
+    return digest_matches(if_none_match, body.digest)
+
+def cached_body_response(request: Request, body: CachedBody, cache_control: str,
+                         headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve a cached body: 304 on matching If-None-Match, otherwise the negotiated encoding"""
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), body.encoded)
+    response_headers = {
+        "ETag": body.etag(encoding),
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+        **(headers or {})
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), body):
+        return Response(status_code=304, headers=response_headers)
+
+    if encoding != "identity":
+        response_headers["Content-Encoding"] = encoding
+        content = body.encoded[encoding]
+    else:
+        content = body.identity
+
+    return Response(content=content, media_type=body.media_type, headers=response_headers)
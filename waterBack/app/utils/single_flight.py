@@ -0,0 +1,34 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from app.utils.logger import log_debug
+
+class SingleFlight:
+    """Deduplicate concurrent calls per key: callers for the same key share one in-flight task"""
+
+    def __init__(self):
+        self.in_flight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, func: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Run func(*args) unless a call for key is already running, then wait for its result"""
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            log_debug(f"Joining in-flight call for {key}", "SINGLE_FLIGHT")
+
+        # A disconnecting caller must not cancel the work other callers are waiting for
+        return await asyncio.shield(task)
+
+    def is_running(self, key: str) -> bool:
+        """Check if a call for key is in flight"""
+        return key in self.in_flight
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        # Mark the exception as retrieved when every caller has gone away
+        if not task.cancelled():
+            task.exception()
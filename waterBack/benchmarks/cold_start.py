@@ -0,0 +1,114 @@
+"""
+Cold start: what a fresh API process and a fresh render worker pay before serving work.
+
+Each run starts two new interpreters:
+  - app: `import app.main`, then report generator initialisation
+  - worker: the render pool worker initializer (report_generator import + warm-up), its peak RSS,
+    and whether any API-only package (FastAPI, LangChain, the workflow manager...) was pulled in
+The first run starts with an empty font metrics cache, the others reuse it.
+Exits with status 1 when the warm medians exceed the budget or a worker imports an API-only package.
+
+Run from waterBack/:
+    python -m benchmarks.cold_start [--runs 5] [--max-app-import-ms 3000] [--max-worker-ms 800]
+                                    [--max-worker-rss-mb 120] [--max-init-ms 150]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Packages a render worker has no business loading
+WORKER_FORBIDDEN = ("fastapi", "starlette", "langchain", "langchain_core", "openai", "redis",
+                    "app.main", "app.api", "app.services.workflow_manager")
+
+APP_PROBE = """
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from app.services.report_generator import report_generator
+report_generator.initialize()
+print("COLD_START " + json.dumps({"import": imported - started, "initialize": time.perf_counter() - imported}))
+"""
+
+WORKER_PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+from app.services.render_pool import _init_worker
+_init_worker()
+elapsed = time.perf_counter() - started
+forbidden = sorted(name for name in %r if name in sys.modules)
+print("COLD_START " + json.dumps({
+    "worker": elapsed,
+    "worker_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "worker_modules": len(sys.modules),
+    "forbidden": forbidden
+}))
+""" % (WORKER_FORBIDDEN,)
+
+def run_probe(probe: str, font_cache_dir: str) -> dict:
+    env = {**os.environ, "FONT_CACHE_DIR": font_cache_dir, "DEBUG_MODE": "false"}
+    env.setdefault("OPENROUTER_API_KEY", "benchmark")
+    completed = subprocess.run(
+        [sys.executable, "-c", probe],
+        cwd=Path(__file__).resolve().parent.parent,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return next(
+        json.loads(line.split(" ", 1)[1])
+        for line in completed.stdout.splitlines() if line.startswith("COLD_START ")
+    )
+
+def run_once(font_cache_dir: str) -> dict:
+    return {**run_probe(APP_PROBE, font_cache_dir), **run_probe(WORKER_PROBE, font_cache_dir)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-app-import-ms", type=float, default=3000.0)
+    parser.add_argument("--max-worker-ms", type=float, default=800.0)
+    parser.add_argument("--max-worker-rss-mb", type=float, default=120.0)
+    parser.add_argument("--max-init-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="font_cache_") as font_cache_dir:
+        cold = run_once(font_cache_dir)
+        warm = [run_once(font_cache_dir) for _ in range(max(1, args.runs - 1))]
+
+    def median(key: str) -> float:
+        return statistics.median(run[key] for run in warm)
+
+    print(f"{'':<40}{'cold cache':>12}{'warm (median)':>16}")
+    print(f"{'import app.main':<40}{cold['import'] * 1000:10.1f}ms{median('import') * 1000:14.1f}ms")
+    print(f"{'report_generator.initialize()':<40}{cold['initialize'] * 1000:10.1f}ms{median('initialize') * 1000:14.1f}ms")
+    print(f"{'render worker import + warm-up':<40}{cold['worker'] * 1000:10.1f}ms{median('worker') * 1000:14.1f}ms")
+    print(f"{'render worker peak RSS':<40}{cold['worker_rss_mb']:10.1f}MB{median('worker_rss_mb'):14.1f}MB")
+    print(f"{'render worker modules':<40}{cold['worker_modules']:12d}{median('worker_modules'):16.0f}")
+
+    failures = []
+    if median("import") * 1000 > args.max_app_import_ms:
+        failures.append(f"import app.main {median('import') * 1000:.1f}ms > {args.max_app_import_ms}ms")
+    if median("initialize") * 1000 > args.max_init_ms:
+        failures.append(f"initialize {median('initialize') * 1000:.1f}ms > {args.max_init_ms}ms")
+    if median("worker") * 1000 > args.max_worker_ms:
+        failures.append(f"render worker start {median('worker') * 1000:.1f}ms > {args.max_worker_ms}ms")
+    if median("worker_rss_mb") > args.max_worker_rss_mb:
+        failures.append(f"render worker RSS {median('worker_rss_mb'):.1f}MB > {args.max_worker_rss_mb}MB")
+    forbidden = sorted({name for run in [cold, *warm] for name in run["forbidden"]})
+    if forbidden:
+        failures.append("render worker imports " + ", ".join(forbidden))
+
+    if failures:
+        print("REGRESSION: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: within budget")
+
+if __name__ == "__main__":
+    main()
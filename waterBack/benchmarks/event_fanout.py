@@ -0,0 +1,157 @@
+"""
+Progress event fan-out to many subscribers (SSE path).
+
+1. Serialisation: per-subscriber json.dumps of every update (previous callbacks)
+   versus one encoded frame shared by all subscribers.
+2. Fan-out: publish to N subscriber tasks, time until every subscriber has read the event.
+3. Slow clients: bursts of progress updates to clients that write one frame per 20ms,
+   with and without coalescing (frames written, peak backlog, dropped events).
+
+Run from waterBack/:
+    python -m benchmarks.event_fanout [--subscribers 1000,10000] [--events 20]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.models.responses import AnalysisWorkflow
+from app.services.event_bus import EventBus
+
+ANALYSIS_ID = "analysis_benchmark"
+
+def make_update(event_id: int, status: str = "processing") -> AnalysisWorkflow:
+    return AnalysisWorkflow(
+        step="analysis",
+        status=status,
+        message="Analiza wyników badań z wykorzystaniem AI...",
+        progress=30 + event_id % 50,
+        elapsedTime=12.5,
+        eventId=event_id
+    )
+
+def per_subscriber_encoding(update: AnalysisWorkflow, subscribers: int) -> int:
+    """What the callbacks did: re-dict and json.dumps the update for every client"""
+    written = 0
+    for _ in range(subscribers):
+        event_data = {
+            "step": update.step,
+            "status": update.status,
+            "message": update.message,
+            "progress": update.progress,
+            "elapsedTime": update.elapsedTime
+        }
+        written += len(f"data: {json.dumps(event_data)}\n\n".encode())
+    return written
+
+async def fan_out(subscribers: int, events: int):
+    bus = EventBus(max_queue=64, replay_size=32)
+    received = 0
+    all_received = asyncio.Event()
+    written = 0
+
+    async def consume(subscription):
+        nonlocal received, written
+        while True:
+            event = await subscription.next(60)
+            written += len(event.frame)
+            received += 1
+            if received == subscribers:
+                all_received.set()
+
+    tasks = [asyncio.create_task(consume(bus.subscribe(ANALYSIS_ID))) for _ in range(subscribers)]
+    await asyncio.sleep(0)
+
+    publish_times, delivery_times = [], []
+    for _ in range(events):
+        received = 0
+        all_received.clear()
+        event_id = bus.next_id(ANALYSIS_ID)
+        update = make_update(event_id, status="completed")
+        started = time.perf_counter()
+        bus.publish(ANALYSIS_ID, event_id, update, json.dumps(update.model_dump()))
+        published = time.perf_counter()
+        await all_received.wait()
+        publish_times.append(published - started)
+        delivery_times.append(time.perf_counter() - started)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return statistics.median(publish_times), statistics.median(delivery_times)
+
+async def slow_clients(coalesce: bool, subscribers: int = 100, updates: int = 200, write_ms: float = 20.0):
+    bus = EventBus(max_queue=64, replay_size=32)
+    frames_written = []
+    peak_backlog = 0
+    subscriptions = [bus.subscribe(ANALYSIS_ID) for _ in range(subscribers)]
+
+    async def consume(subscription):
+        nonlocal peak_backlog
+        count = 0
+        while True:
+            peak_backlog = max(peak_backlog, len(subscription.pending))
+            event = await subscription.next(60)
+            count += 1
+            await asyncio.sleep(write_ms / 1000)
+            if event.data.status == "completed":
+                frames_written.append(count)
+                return
+
+    tasks = [asyncio.create_task(consume(subscription)) for subscription in subscriptions]
+    started = time.perf_counter()
+    for index in range(updates + 1):
+        status = "completed" if index == updates else "processing"
+        event_id = bus.next_id(ANALYSIS_ID)
+        update = make_update(event_id, status)
+        bus.publish(ANALYSIS_ID, event_id, update, json.dumps(update.model_dump()),
+                    coalescable=coalesce and status == "processing")
+        await asyncio.sleep(0.001)
+    await asyncio.gather(*tasks)
+
+    return {
+        "frames": statistics.mean(frames_written),
+        "peak_backlog": peak_backlog,
+        "dropped": sum(subscription.dropped for subscription in subscriptions),
+        "coalesced": sum(subscription.coalesced for subscription in subscriptions),
+        "final_seconds": time.perf_counter() - started
+    }
+
+async def run(subscriber_counts, events: int):
+    update = make_update(1)
+    print("Serialisation per published update:")
+    for subscribers in subscriber_counts:
+        started = time.perf_counter()
+        for _ in range(events):
+            per_subscriber_encoding(update, subscribers)
+        per_subscriber = (time.perf_counter() - started) / events
+        started = time.perf_counter()
+        for _ in range(events):
+            json.dumps(update.model_dump()).encode()
+        once = (time.perf_counter() - started) / events
+        print(f"  {subscribers:>6} subscribers: per-subscriber {per_subscriber * 1000:8.2f}ms, once {once * 1000:6.3f}ms")
+
+    print("Fan-out (median per update, serialise once):")
+    for subscribers in subscriber_counts:
+        publish, delivery = await fan_out(subscribers, events)
+        print(f"  {subscribers:>6} subscribers: publish {publish * 1000:7.2f}ms, all subscribers read {delivery * 1000:8.2f}ms")
+
+    print("Slow clients (100 subscribers, 200 progress updates at 1ms, 20ms per written frame):")
+    for coalesce in (False, True):
+        result = await slow_clients(coalesce)
+        print(
+            f"  coalescing {'on ' if coalesce else 'off'}: {result['frames']:6.1f} frames written, "
+            f"peak backlog {result['peak_backlog']:3}, dropped {result['dropped']:6}, "
+            f"coalesced {result['coalesced']:6}, final update after {result['final_seconds']:.2f}s"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", default="1000,10000")
+    parser.add_argument("--events", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run([int(value) for value in args.subscribers.split(",")], args.events))
+
+if __name__ == "__main__":
+    main()
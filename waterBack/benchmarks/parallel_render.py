@@ -0,0 +1,95 @@
+"""
+Serial vs parallel segment rendering across report sizes, to find the break-even point
+for RENDER_PARALLEL_MIN_CHARS.
+
+Analyses of increasing size are built from sections of prompts/complex_schema.md. Each size
+is rendered inline in one process (serial) and split into segments laid out by a render pool
+(parallel). Results depend on the number of cores; run it on the deployment hardware.
+
+Run from waterBack/:
+    python -m benchmarks.parallel_render [--workers 4] [--sizes 10000,20000,40000,80000,160000] [--repeat 3]
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import time
+from pathlib import Path
+
+from pypdf import PdfReader
+
+from app.models.water_data import AnalysisContext
+from app.services.markdown_flowables import group_sections, split_sections
+from app.services.render_pool import RenderPool
+from app.services.report_generator import report_generator
+
+KNOWLEDGE_BASE = Path("prompts/complex_schema.md")
+
+def build_analysis(sections, size: int) -> str:
+    parts = []
+    total = 0
+    index = 0
+    while total < size:
+        section = sections[index % len(sections)]
+        parts.append(section)
+        total += len(section)
+        index += 1
+    return ''.join(parts)
+
+async def run(args):
+    sections = split_sections(KNOWLEDGE_BASE.read_text(encoding="utf-8"))
+    context = AnalysisContext(analysisId="analysis_benchmark", originalFilename="benchmark.pdf", extractedText="")
+
+    pool = RenderPool()
+    pool.size = args.workers
+    pool.timeout = 600
+    await pool.start()
+    if not pool.enabled:
+        raise SystemExit("Render pool failed to start")
+
+    print(f"{os.cpu_count()} CPUs, {args.workers} workers, median of {args.repeat} runs")
+    print(f"{'chars':>8} {'pages':>6} {'serial':>9} {'parallel':>9} {'speedup':>8}")
+
+    break_even = None
+    try:
+        for size in args.sizes:
+            analysis = build_analysis(sections, size)
+            segments = group_sections(split_sections(analysis), args.workers)
+
+            serial_times = []
+            parallel_times = []
+            pages = 0
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                pdf_bytes, _ = report_generator.render_report(context, analysis)
+                serial_times.append(time.perf_counter() - started)
+                pages = len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+
+                started = time.perf_counter()
+                await pool.render_segments(context, segments)
+                parallel_times.append(time.perf_counter() - started)
+
+            serial = statistics.median(serial_times)
+            parallel = statistics.median(parallel_times)
+            if break_even is None and parallel < serial:
+                break_even = size
+            print(f"{len(analysis):>8} {pages:>6} {serial * 1000:>7.0f}ms {parallel * 1000:>7.0f}ms {serial / parallel:>7.2f}x")
+    finally:
+        await pool.stop()
+
+    if break_even:
+        print(f"Break-even: parallel rendering wins from ~{break_even} chars (RENDER_PARALLEL_MIN_CHARS)")
+    else:
+        print("Break-even not reached: parallel rendering never beat serial at these sizes")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        default=[10000, 20000, 40000, 80000, 160000])
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
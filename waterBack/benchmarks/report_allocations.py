@@ -0,0 +1,64 @@
+"""
+Allocations per report render (inline, without the knowledge base appendix).
+
+Counts flowable/style objects constructed and parsed markup fragments per render,
+and the peak traced memory, for the synthetic analysis used by the local OpenRouter mock.
+
+Run from waterBack/:
+    python -m benchmarks.report_allocations [--renders 20]
+"""
+import argparse
+import tracemalloc
+from collections import Counter
+
+from reportlab.platypus import Paragraph, TableStyle
+from reportlab.platypus.paraparser import ParaFrag
+
+from app.models.water_data import AnalysisContext
+from app.services.report_generator import report_generator
+from tools.mock_openrouter import SYNTHETIC_REPORT
+
+constructed = Counter()
+
+def count_constructions(cls):
+    original_init = cls.__init__
+
+    def counting_init(self, *args, **kwargs):
+        constructed[cls.__name__] += 1
+        original_init(self, *args, **kwargs)
+
+    cls.__init__ = counting_init
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=20)
+    args = parser.parse_args()
+
+    context = AnalysisContext(
+        analysisId="analysis_benchmark",
+        originalFilename="benchmark.pdf",
+        extractedText=""
+    )
+    # Warm up fonts and caches outside the measurement
+    report_generator.render_report(context, SYNTHETIC_REPORT)
+
+    for cls in (Paragraph, TableStyle, ParaFrag):
+        count_constructions(cls)
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(args.renders):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        report_generator.render_report(context, SYNTHETIC_REPORT)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - baseline)
+    tracemalloc.stop()
+
+    print(f"Per render ({args.renders} renders, {len(SYNTHETIC_REPORT)} chars of analysis):")
+    for name in ("Paragraph", "TableStyle", "ParaFrag"):
+        print(f"  {name:<12} {constructed[name] / args.renders:8.1f} constructed")
+    print(f"  peak traced memory {sum(peaks) / len(peaks) / 1024:8.1f} KiB")
+
+if __name__ == "__main__":
+    main()
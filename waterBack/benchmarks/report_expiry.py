@@ -0,0 +1,89 @@
+"""
+Report expiry: periodic sweep versus per-report deadlines.
+
+1. Sweep: one pass of the old cleanup loop over file storage (glob reports/*.pdf, stat every
+   file, compare ages), repeated every interval whether or not anything is due.
+2. Deadlines: registering every report with the DeadlineScheduler, then how late the deletions
+   run after their deadlines (unlink in a worker thread) and how long the event loop was blocked.
+
+Run from waterBack/:
+    python -m benchmarks.report_expiry [--reports 5000] [--spread-ms 500]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from app.services.report_storage import FileReportStorage
+from app.utils.deadline_scheduler import DeadlineScheduler
+
+def fill(storage: FileReportStorage, count: int):
+    for index in range(count):
+        storage.save(f"analysis_{index:08x}", b"%PDF-1.4 benchmark")
+
+def time_sweep(storage: FileReportStorage, lifetime: float) -> float:
+    started = time.perf_counter()
+    now = time.time()
+    expired = [report.analysis_id for report in storage.list_reports() if now - report.created_at > lifetime]
+    assert not expired
+    return time.perf_counter() - started
+
+async def run_deadlines(storage: FileReportStorage, count: int, spread: float):
+    lateness = []
+    longest_block = 0.0
+
+    async def expire(analysis_id: str):
+        lateness.append(time.time() - deadlines[analysis_id])
+        await asyncio.to_thread(storage.delete, analysis_id)
+
+    async def watch_loop():
+        # Largest gap between ticks of a 1ms ticker is how long the loop was blocked
+        nonlocal longest_block
+        previous = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.001)
+            current = time.perf_counter()
+            longest_block = max(longest_block, current - previous - 0.001)
+            previous = current
+
+    scheduler = DeadlineScheduler(expire, "BENCHMARK")
+    await scheduler.start()
+    watcher = asyncio.create_task(watch_loop())
+
+    start = time.time() + 0.1
+    deadlines = {f"analysis_{index:08x}": start + spread * index / count for index in range(count)}
+    registered = time.perf_counter()
+    for analysis_id, due in deadlines.items():
+        scheduler.schedule(analysis_id, due)
+    registered = time.perf_counter() - registered
+
+    while len(lateness) < count:
+        await asyncio.sleep(0.05)
+    await scheduler.stop()
+    watcher.cancel()
+
+    lateness.sort()
+    return registered, lateness, longest_block
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=5000)
+    parser.add_argument("--spread-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="reports_") as directory:
+        storage = FileReportStorage(directory)
+        fill(storage, args.reports)
+        sweep = min(time_sweep(storage, 600) for _ in range(3))
+        print(f"Sweep over {args.reports} reports (nothing due)   {sweep * 1000:8.1f}ms on the event loop per interval")
+
+        registered, lateness, longest_block = asyncio.run(run_deadlines(storage, args.reports, args.spread_ms / 1000))
+        remaining = len(os.listdir(directory))
+        print(f"Deadlines: register {args.reports}               {registered * 1000:8.1f}ms ({registered / args.reports * 1e6:.1f}us each)")
+        print(f"  deletion lateness p50/p99/max            {lateness[len(lateness) // 2] * 1000:.1f}/{lateness[int(len(lateness) * 0.99)] * 1000:.1f}/{lateness[-1] * 1000:.1f}ms")
+        print(f"  longest event loop block                 {longest_block * 1000:8.1f}ms")
+        print(f"  reports left                             {remaining:8d}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Session store: cost of the session reads and writes done on every status poll and progress update.
+
+1. Reads: memory store, SQLite with the read-through cache (no other writer), SQLite while
+   another connection keeps committing (cache entries revalidated by row version) and SQLite
+   without the cache (every read parses the row).
+2. Writes: memory store versus SQLite (WAL, synchronous=NORMAL).
+3. Footprint of a finished session: as it was kept before (full context and result) versus
+   trimmed by the workflow manager and packed by the memory store.
+
+Run from waterBack/:
+    python -m benchmarks.session_store [--sessions 200] [--reads 20000] [--text-kb 20]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from app.models.water_data import AnalysisContext, AnalysisSession, WaterParameter, WaterTestData
+from app.services.session_store import MemorySessionStore, SQLiteSessionStore, estimate_size
+
+def make_session(index: int, text_kb: int) -> AnalysisSession:
+    analysis_id = f"analysis_{index:08x}"
+    return AnalysisSession(
+        id=analysis_id,
+        status="processing",
+        startTime=datetime.now(),
+        currentStep="analysis",
+        progress=40,
+        context=AnalysisContext(
+            analysisId=analysis_id,
+            originalFilename="water_test_results.pdf",
+            extractedText="pH: 7.2 mg/l " * (text_kb * 1024 // 13)
+        )
+    )
+
+async def footprint(text_kb: int):
+    """Bytes held for one finished session, before and after trimming and packing"""
+    session = make_session(0, text_kb)
+    session.context.waterData = WaterTestData(parameters=[
+        WaterParameter(name=f"Parametr {index}", value=index * 0.1, unit="mg/l", range={"min": 0.0, "max": 1.0})
+        for index in range(40)
+    ])
+    # Analysis markdown of realistic size and structure
+    session.result = Path("prompts/complex_schema.md").read_text(encoding="utf-8")[:16000]
+    session.status = "completed"
+    full = estimate_size(session)
+
+    store = MemorySessionStore(max_bytes=1 << 30)
+    session.context.extractedText = ""
+    session.context.waterData = None
+    await store.save(session)
+    packed = (await store.usage(1))["largest"][0]["bytes"]
+    json_size = len(session.model_dump_json())
+    return full, json_size, packed, len(zlib.compress(session.result.encode()))
+
+async def time_reads(store, ids, reads: int, between=None) -> float:
+    started = time.perf_counter()
+    for index in range(reads):
+        if between and index % 10 == 0:
+            await between()
+        await store.get(ids[index % len(ids)])
+    return (time.perf_counter() - started) / reads
+
+async def time_writes(store, sessions, writes: int) -> float:
+    started = time.perf_counter()
+    for index in range(writes):
+        session = sessions[index % len(sessions)]
+        session.progress = index % 100
+        await store.save(session)
+    return (time.perf_counter() - started) / writes
+
+async def run(args):
+    sessions = [make_session(index, args.text_kb) for index in range(args.sessions)]
+    ids = [session.id for session in sessions]
+
+    with tempfile.TemporaryDirectory(prefix="sessions_") as directory:
+        db_path = os.path.join(directory, "sessions.db")
+        memory = MemorySessionStore(max_bytes=1 << 30)
+        cached = SQLiteSessionStore(db_path, cache_size=args.sessions)
+        uncached = SQLiteSessionStore(db_path, cache_size=0)
+        other_worker = SQLiteSessionStore(db_path, cache_size=args.sessions)
+        writes = max(1, args.reads // 10)
+
+        print(f"Writes ({args.sessions} sessions, {args.text_kb}KB extracted text each):")
+        print(f"  memory               {await time_writes(memory, sessions, writes) * 1e6:9.1f}us")
+        print(f"  sqlite               {await time_writes(cached, sessions, writes) * 1e6:9.1f}us")
+
+        # Another worker updating an unrelated session changes PRAGMA data_version
+        unrelated = make_session(args.sessions, 1)
+        async def commit_elsewhere():
+            unrelated.progress += 1
+            await other_worker.save(unrelated)
+
+        print(f"Reads ({args.reads}):")
+        print(f"  memory               {await time_reads(memory, ids, args.reads) * 1e6:9.1f}us")
+        await time_reads(cached, ids, len(ids))
+        print(f"  sqlite cached        {await time_reads(cached, ids, args.reads) * 1e6:9.1f}us")
+        print(f"  sqlite revalidated   {await time_reads(cached, ids, args.reads, commit_elsewhere) * 1e6:9.1f}us  (other worker commits every 10 reads)")
+        print(f"  sqlite no cache      {await time_reads(uncached, ids, args.reads) * 1e6:9.1f}us")
+        print(f"  cache hits/misses    {cached.hits}/{cached.misses}")
+
+    full, trimmed, packed, result_only = await footprint(args.text_kb)
+    print("Finished session footprint:")
+    print(f"  full (text, water data, result) {full / 1024:8.1f}KB")
+    print(f"  trimmed                          {trimmed / 1024:8.1f}KB")
+    print(f"  trimmed and packed               {packed / 1024:8.1f}KB  (result alone compresses to {result_only / 1024:.1f}KB)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--reads", type=int, default=20000)
+    parser.add_argument("--text-kb", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Development and benchmarking tools for Water Test Analyzer
@@ -0,0 +1,442 @@
+"""
+Local OpenRouter stand-in (OpenAI-compatible) for benchmarking and offline CI.
+
+Point the backend at it with:
+    OPENROUTER_BASE_URL=http://localhost:2105/api/v1
+
+Run:
+    python -m tools.mock_openrouter
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from app.utils.logger import log_debug, log_error, log_info, log_warning
+
+
+class MockOpenRouterConfig:
+    # Server
+    HOST: str = os.getenv('MOCK_OPENROUTER_HOST', 'localhost')
+    PORT: int = int(os.getenv('MOCK_OPENROUTER_PORT', '2105'))
+
+    # Mode: synthetic | record | replay
+    MODE: str = os.getenv('MOCK_OPENROUTER_MODE', 'synthetic').lower()
+    FIXTURES_DIR: str = os.getenv('MOCK_OPENROUTER_FIXTURES_DIR', 'tools/fixtures/openrouter')
+    REPLAY_FALLBACK: bool = os.getenv('MOCK_OPENROUTER_REPLAY_FALLBACK', 'false').lower() == 'true'
+
+    # Upstream used in record mode
+    UPSTREAM_URL: str = os.getenv('MOCK_OPENROUTER_UPSTREAM_URL', 'https://openrouter.ai/api/v1')
+    UPSTREAM_API_KEY: str = os.getenv('MOCK_OPENROUTER_UPSTREAM_API_KEY', os.getenv('OPENROUTER_API_KEY', ''))
+    UPSTREAM_TIMEOUT_SECONDS: float = float(os.getenv('MOCK_OPENROUTER_UPSTREAM_TIMEOUT_SECONDS', '300'))
+
+    # Latency before the first byte: fixed | uniform | normal | lognormal | exponential
+    LATENCY_DISTRIBUTION: str = os.getenv('MOCK_OPENROUTER_LATENCY_DISTRIBUTION', 'fixed').lower()
+    LATENCY_MS: float = float(os.getenv('MOCK_OPENROUTER_LATENCY_MS', '500'))
+    LATENCY_JITTER_MS: float = float(os.getenv('MOCK_OPENROUTER_LATENCY_JITTER_MS', '100'))
+
+    # Streaming speed (0 = send the whole completion at once)
+    TOKENS_PER_SECOND: float = float(os.getenv('MOCK_OPENROUTER_TOKENS_PER_SECOND', '80'))
+
+    # Error injection (probabilities 0.0-1.0)
+    ERROR_RATE_429: float = float(os.getenv('MOCK_OPENROUTER_ERROR_RATE_429', '0'))
+    ERROR_RATE_500: float = float(os.getenv('MOCK_OPENROUTER_ERROR_RATE_500', '0'))
+    TIMEOUT_RATE: float = float(os.getenv('MOCK_OPENROUTER_TIMEOUT_RATE', '0'))
+    TIMEOUT_SECONDS: float = float(os.getenv('MOCK_OPENROUTER_TIMEOUT_SECONDS', '600'))
+    RETRY_AFTER_SECONDS: int = int(os.getenv('MOCK_OPENROUTER_RETRY_AFTER_SECONDS', '1'))
+
+    # Seed for reproducible latency/error sequences (empty = random)
+    SEED: str = os.getenv('MOCK_OPENROUTER_SEED', '')
+
+
+SYNTHETIC_REPORT = """# Personalizowana Analiza Twojej Wody
+
+## Krok 1: Podsumowanie
+
+Twoja woda spełnia większość wymagań **Rozporządzenia Ministra Zdrowia**. Poniżej znajdziesz szczegółową ocenę parametrów.
+
+---
+
+## Krok 2: Ocena Parametrów
+
+- pH: 7.4 – W NORMIE
+- Twardość ogólna: 310 mg/L CaCO3 – W NORMIE
+- Żelazo: 0.25 mg/L – PRZEKROCZENIE normy (0.2 mg/L)
+- Azotany: 12 mg/L – W NORMIE
+
+## Krok 3: Rekomendacje
+
+1. Rozważ filtr odżelaziający przed punktem poboru wody pitnej.
+2. Powtórz badanie za 6 miesięcy.
+
+*Raport wygenerowany przez lokalny serwer testowy.*
+"""
+
+_TOKEN_PATTERN = re.compile(r'\S+\s*|\s+')
+
+
+class UpstreamError(Exception):
+    """Upstream answered with an error status (record mode); passed through, never recorded"""
+
+    def __init__(self, status: int, body: bytes, content_type: str, retry_after: Optional[str] = None):
+        super().__init__(f"Upstream returned {status}")
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.retry_after = retry_after
+
+
+class MockOpenRouter:
+    """OpenAI-compatible chat completions stand-in with latency, errors and record/replay"""
+
+    # System prompt hashes remembered for simulated prompt caching (least recently seen dropped)
+    MAX_SEEN_PREFIXES = 1024
+
+    def __init__(self, config: MockOpenRouterConfig = None):
+        self.config = config or MockOpenRouterConfig()
+        self.fixtures_dir = Path(self.config.FIXTURES_DIR)
+        self.rng = random.Random(self.config.SEED or None)
+        self.seen_prefixes: "OrderedDict[str, None]" = OrderedDict()
+        self.stats: Dict[str, int] = {
+            'requests': 0,
+            'streamed': 0,
+            'errors_429': 0,
+            'errors_500': 0,
+            'timeouts': 0,
+            'recorded': 0,
+            'upstream_errors': 0,
+            'replayed': 0,
+            'replay_misses': 0
+        }
+
+        if self.config.MODE not in ('synthetic', 'record', 'replay'):
+            raise ValueError(f"Unknown mock mode: {self.config.MODE}")
+
+        if self.config.MODE in ('record', 'replay'):
+            self.fixtures_dir.mkdir(parents=True, exist_ok=True)
+
+    # ----- Request handling -----
+
+    async def chat_completions(self, body: Dict[str, Any], forced_error: Optional[str] = None):
+        """Handle a single /chat/completions request"""
+        self.stats['requests'] += 1
+        stream = bool(body.get('stream'))
+        model = body.get('model', 'mock/model')
+
+        injected = forced_error or self._draw_error()
+        if injected == '429':
+            self.stats['errors_429'] += 1
+            return self._error_response(429, "Rate limit exceeded (injected)", "rate_limit_exceeded",
+                                        {"Retry-After": str(self.config.RETRY_AFTER_SECONDS)})
+        if injected == '500':
+            self.stats['errors_500'] += 1
+            return self._error_response(500, "Internal server error (injected)", "server_error")
+        if injected == 'timeout':
+            self.stats['timeouts'] += 1
+            log_debug(f"Injecting timeout ({self.config.TIMEOUT_SECONDS}s)", "MOCK_OPENROUTER")
+            await asyncio.sleep(self.config.TIMEOUT_SECONDS)
+            return self._error_response(504, "Upstream timeout (injected)", "timeout")
+
+        try:
+            completion = await self._resolve_completion(body)
+        except UpstreamError as e:
+            self.stats['upstream_errors'] += 1
+            log_warning(f"Passing through upstream error {e.status}", "MOCK_OPENROUTER")
+            return Response(
+                content=e.body,
+                status_code=e.status,
+                media_type=e.content_type,
+                headers={"Retry-After": e.retry_after} if e.retry_after else None
+            )
+        except httpx.HTTPError as e:
+            self.stats['upstream_errors'] += 1
+            return self._error_response(502, f"Upstream request failed: {str(e)}", "upstream_unreachable")
+
+        if completion is None:
+            self.stats['replay_misses'] += 1
+            return self._error_response(404, f"No fixture recorded for request {self.fixture_key(body)}", "fixture_not_found")
+
+        await asyncio.sleep(self._draw_latency())
+
+        if stream:
+            self.stats['streamed'] += 1
+            return StreamingResponse(
+                self._stream_completion(model, completion),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache"}
+            )
+
+        return JSONResponse(content=self._completion_payload(model, completion))
+
+    async def _resolve_completion(self, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return {'content', 'usage'} for the request according to the current mode"""
+        if self.config.MODE == 'replay':
+            fixture = self._load_fixture(body)
+            if fixture:
+                self.stats['replayed'] += 1
+                return fixture['response']
+            if not self.config.REPLAY_FALLBACK:
+                return None
+            return self._synthetic_completion(body)
+
+        if self.config.MODE == 'record':
+            completion = await self._fetch_upstream(body)
+            self._save_fixture(body, completion)
+            self.stats['recorded'] += 1
+            return completion
+
+        return self._synthetic_completion(body)
+
+    def _synthetic_completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a canned completion with plausible token usage"""
+        messages = body.get('messages', [])
+        prompt_tokens = sum(self._estimate_tokens(self._message_text(m)) for m in messages)
+
+        # Simulate provider prompt caching: a repeated system prefix counts as cached
+        system_text = ''.join(self._message_text(m) for m in messages if m.get('role') == 'system')
+        cached_tokens = 0
+        if system_text:
+            prefix_hash = hashlib.sha256(system_text.encode('utf-8')).hexdigest()
+            if prefix_hash in self.seen_prefixes:
+                cached_tokens = self._estimate_tokens(system_text)
+                self.seen_prefixes.move_to_end(prefix_hash)
+            else:
+                self.seen_prefixes[prefix_hash] = None
+                if len(self.seen_prefixes) > self.MAX_SEEN_PREFIXES:
+                    self.seen_prefixes.popitem(last=False)
+
+        completion_tokens = self._estimate_tokens(SYNTHETIC_REPORT)
+        return {
+            'content': SYNTHETIC_REPORT,
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+                'prompt_tokens_details': {'cached_tokens': cached_tokens}
+            }
+        }
+
+    async def _fetch_upstream(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Forward the request (non-streaming) to the real provider"""
+        upstream_body = dict(body)
+        upstream_body['stream'] = False
+        upstream_body.pop('stream_options', None)
+
+        log_info(f"Recording upstream completion for model {body.get('model')}", "MOCK_OPENROUTER")
+        async with httpx.AsyncClient(timeout=self.config.UPSTREAM_TIMEOUT_SECONDS) as client:
+            response = await client.post(
+                f"{self.config.UPSTREAM_URL.rstrip('/')}/chat/completions",
+                json=upstream_body,
+                headers={"Authorization": f"Bearer {self.config.UPSTREAM_API_KEY}"}
+            )
+            if response.status_code >= 400:
+                raise UpstreamError(
+                    response.status_code,
+                    response.content,
+                    response.headers.get("content-type", "application/json"),
+                    response.headers.get("retry-after")
+                )
+            payload = response.json()
+
+        return {
+            'content': payload['choices'][0]['message'].get('content') or '',
+            'usage': payload.get('usage', {})
+        }
+
+    # ----- Fixtures -----
+
+    @staticmethod
+    def fixture_key(body: Dict[str, Any]) -> str:
+        """Deterministic key for a request, independent of streaming flags"""
+        canonical = {
+            'model': body.get('model'),
+            'messages': body.get('messages'),
+            'temperature': body.get('temperature'),
+            'max_tokens': body.get('max_tokens'),
+            'top_p': body.get('top_p')
+        }
+        encoded = json.dumps(canonical, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()[:32]
+
+    def _fixture_path(self, body: Dict[str, Any]) -> Path:
+        return self.fixtures_dir / f"{self.fixture_key(body)}.json"
+
+    def _load_fixture(self, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        path = self._fixture_path(body)
+        if not path.exists():
+            log_warning(f"Replay miss: {path.name}", "MOCK_OPENROUTER")
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_fixture(self, body: Dict[str, Any], completion: Dict[str, Any]):
+        path = self._fixture_path(body)
+        fixture = {
+            'key': self.fixture_key(body),
+            'recordedAt': int(time.time()),
+            'request': {
+                'model': body.get('model'),
+                'messages': body.get('messages')
+            },
+            'response': completion
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=2)
+        log_info(f"Recorded fixture: {path}", "MOCK_OPENROUTER")
+
+    # ----- Randomness -----
+
+    def _draw_error(self) -> Optional[str]:
+        roll = self.rng.random()
+        if roll < self.config.ERROR_RATE_429:
+            return '429'
+        roll -= self.config.ERROR_RATE_429
+        if roll < self.config.ERROR_RATE_500:
+            return '500'
+        roll -= self.config.ERROR_RATE_500
+        if roll < self.config.TIMEOUT_RATE:
+            return 'timeout'
+        return None
+
+    def _draw_latency(self) -> float:
+        """Latency in seconds drawn from the configured distribution"""
+        mean = self.config.LATENCY_MS
+        jitter = self.config.LATENCY_JITTER_MS
+        distribution = self.config.LATENCY_DISTRIBUTION
+
+        if distribution == 'uniform':
+            latency = self.rng.uniform(mean - jitter, mean + jitter)
+        elif distribution == 'normal':
+            latency = self.rng.gauss(mean, jitter)
+        elif distribution == 'lognormal':
+            # Parametrised so that mean/jitter are the mean/stddev of the result
+            if mean > 0:
+                sigma_squared = math.log(1 + (jitter / mean) ** 2)
+                latency = self.rng.lognormvariate(math.log(mean) - sigma_squared / 2, sigma_squared ** 0.5)
+            else:
+                latency = 0
+        elif distribution == 'exponential':
+            latency = self.rng.expovariate(1 / mean) if mean > 0 else 0
+        else:
+            latency = mean
+
+        return max(0.0, latency) / 1000
+
+    # ----- Response builders -----
+
+    async def _stream_completion(self, model: str, completion: Dict[str, Any]) -> AsyncIterator[str]:
+        """Yield OpenAI-style SSE chunks at the configured token rate"""
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        delay = 1 / self.config.TOKENS_PER_SECOND if self.config.TOKENS_PER_SECOND > 0 else 0
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, usage: Optional[Dict] = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            if usage is not None:
+                payload["usage"] = usage
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        yield chunk({"role": "assistant", "content": ""})
+
+        if delay:
+            for token in _TOKEN_PATTERN.findall(completion['content']):
+                yield chunk({"content": token})
+                await asyncio.sleep(delay)
+        else:
+            yield chunk({"content": completion['content']})
+
+        yield chunk({}, finish_reason="stop", usage=completion.get('usage'))
+        yield "data: [DONE]\n\n"
+
+    @staticmethod
+    def _completion_payload(model: str, completion: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": completion['content']},
+                "finish_reason": "stop"
+            }],
+            "usage": completion.get('usage', {})
+        }
+
+    @staticmethod
+    def _error_response(status: int, message: str, code: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+        return JSONResponse(
+            status_code=status,
+            content={"error": {"message": message, "code": code, "type": code}},
+            headers=headers
+        )
+
+    @staticmethod
+    def _message_text(message: Dict[str, Any]) -> str:
+        content = message.get('content') or ''
+        if isinstance(content, list):
+            return ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+        return str(content)
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        return max(1, len(text) // 4)
+
+
+def create_app(config: MockOpenRouterConfig = None) -> FastAPI:
+    """Create the mock server application"""
+    mock = MockOpenRouter(config)
+    app = FastAPI(title="Mock OpenRouter", version="1.0.0")
+    app.state.mock = mock
+
+    @app.post("/api/v1/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        try:
+            body = await request.json()
+        except Exception as e:
+            log_error(f"Invalid request body: {str(e)}", "MOCK_OPENROUTER")
+            return mock._error_response(400, "Invalid JSON body", "invalid_request")
+
+        # Per-request override, e.g. "X-Mock-Error: 429" for deterministic tests
+        forced_error = request.headers.get("x-mock-error")
+        return await mock.chat_completions(body, forced_error)
+
+    @app.get("/api/v1/models")
+    @app.get("/v1/models")
+    async def list_models():
+        return {"data": [{"id": "mock/model", "object": "model", "owned_by": "mock"}]}
+
+    @app.get("/__mock/stats")
+    async def stats():
+        return {"mode": mock.config.MODE, **mock.stats}
+
+    return app
+
+
+app = create_app()
+
+if __name__ == "__main__":
+    import uvicorn
+
+    config = MockOpenRouterConfig()
+    log_info(f"Mock OpenRouter ({config.MODE}) on {config.HOST}:{config.PORT}", "MOCK_OPENROUTER")
+    uvicorn.run(app, host=config.HOST, port=config.PORT, log_level="info")
@@ -0,0 +1,342 @@
+"""
+Local Redis stand-in (RESP2) for running the redis session backend without a Redis server.
+
+Implements the commands the backend uses: strings, hashes, sorted sets, pub/sub and
+MULTI/EXEC. Data lives in memory only and there is no expiry or persistence.
+
+Point the backend at it with:
+    SESSION_STORE_BACKEND=redis
+    REDIS_URL=redis://localhost:6379/0
+
+Run:
+    python -m tools.mock_redis
+"""
+import asyncio
+import fnmatch
+import os
+from typing import Any, Dict, List, Optional, Set
+
+from app.utils.logger import log_debug, log_info
+
+
+class MockRedisConfig:
+    HOST: str = os.getenv('MOCK_REDIS_HOST', 'localhost')
+    PORT: int = int(os.getenv('MOCK_REDIS_PORT', '6379'))
+
+
+class CommandError(Exception):
+    pass
+
+
+class _Error:
+    def __init__(self, message: str):
+        self.message = message
+
+
+def encode(value: Any) -> bytes:
+    """RESP2 encoding of a reply"""
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, _Error):
+        return f"-{value.message}\r\n".encode()
+    if value is True:
+        return b"+OK\r\n"
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+    raise TypeError(f"Cannot encode {type(value)}")
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    """One command as a list of arguments (multibulk or inline), None on EOF"""
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.strip().split()
+
+    args = []
+    for _ in range(int(line[1:])):
+        header = await reader.readline()
+        length = int(header[1:])
+        data = await reader.readexactly(length + 2)
+        args.append(data[:-2])
+    return args
+
+
+def in_range(score: float, minimum: bytes, maximum: bytes) -> bool:
+    """ZRANGEBYSCORE bounds: numbers, -inf/+inf, "(" for exclusive"""
+    def check(bound: bytes, above: bool) -> bool:
+        text = bound.decode().lower()
+        exclusive = text.startswith("(")
+        value = float(text.lstrip("("))
+        if above:
+            return score > value if exclusive else score >= value
+        return score < value if exclusive else score <= value
+    return check(minimum, True) and check(maximum, False)
+
+
+class ZSet(dict):
+    """Sorted set (member -> score), distinct from hashes for type checks"""
+
+
+class MockRedis:
+    """Single-threaded keyspace shared by all connections"""
+
+    def __init__(self):
+        self.data: Dict[bytes, Any] = {}
+        self.channels: Dict[bytes, Set["Connection"]] = {}
+        self.patterns: Dict[bytes, Set["Connection"]] = {}
+        self.stats = {"commands": 0, "published": 0}
+
+    # Keys and strings
+    def cmd_ping(self, conn, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_echo(self, conn, value):
+        return value
+
+    def cmd_select(self, conn, db):
+        return True
+
+    def cmd_client(self, conn, *args):
+        return True
+
+    def cmd_flushall(self, conn, *args):
+        self.data.clear()
+        return True
+
+    cmd_flushdb = cmd_flushall
+
+    def cmd_dbsize(self, conn):
+        return len(self.data)
+
+    def cmd_get(self, conn, key):
+        return self._typed(key, bytes)
+
+    def cmd_set(self, conn, key, value, *options):
+        self.data[key] = value
+        return True
+
+    def cmd_incr(self, conn, key):
+        return self.cmd_incrby(conn, key, b"1")
+
+    def cmd_incrby(self, conn, key, amount):
+        value = int(self._typed(key, bytes) or 0) + int(amount)
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_del(self, conn, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    cmd_unlink = cmd_del
+
+    def cmd_exists(self, conn, *keys):
+        return sum(1 for key in keys if key in self.data)
+
+    def cmd_expire(self, conn, key, seconds):
+        return 1 if key in self.data else 0
+
+    def cmd_keys(self, conn, pattern):
+        return [key for key in self.data if fnmatch.fnmatchcase(key.decode(), pattern.decode())]
+
+    # Hashes
+    def cmd_hset(self, conn, key, *pairs):
+        hash_ = self._typed(key, dict, create=True)
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in hash_
+            hash_[field] = value
+        return added
+
+    def cmd_hget(self, conn, key, field):
+        return (self._typed(key, dict) or {}).get(field)
+
+    def cmd_hmget(self, conn, key, *fields):
+        hash_ = self._typed(key, dict) or {}
+        return [hash_.get(field) for field in fields]
+
+    def cmd_hgetall(self, conn, key):
+        hash_ = self._typed(key, dict) or {}
+        return [item for pair in hash_.items() for item in pair]
+
+    def cmd_hstrlen(self, conn, key, field):
+        return len((self._typed(key, dict) or {}).get(field, b""))
+
+    def cmd_hincrby(self, conn, key, field, amount):
+        hash_ = self._typed(key, dict, create=True)
+        value = int(hash_.get(field, b"0")) + int(amount)
+        hash_[field] = str(value).encode()
+        return value
+
+    def cmd_hdel(self, conn, key, *fields):
+        hash_ = self._typed(key, dict) or {}
+        return sum(1 for field in fields if hash_.pop(field, None) is not None)
+
+    # Sorted sets (member -> score)
+    def cmd_zadd(self, conn, key, *pairs):
+        zset = self._typed(key, ZSet, create=True)
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            added += member not in zset
+            zset[member] = float(score)
+        return added
+
+    def cmd_zrem(self, conn, key, *members):
+        zset = self._typed(key, ZSet) or {}
+        removed = sum(1 for member in members if zset.pop(member, None) is not None)
+        if not zset:
+            self.data.pop(key, None)
+        return removed
+
+    def cmd_zrange(self, conn, key, start, stop, *options):
+        members = [member for member, _ in sorted((self._typed(key, ZSet) or {}).items(), key=lambda item: item[1])]
+        start, stop = int(start), int(stop)
+        return members[start:len(members) + stop + 1 if stop < 0 else stop + 1]
+
+    def cmd_zcard(self, conn, key):
+        return len(self._typed(key, ZSet) or {})
+
+    def cmd_zscore(self, conn, key, member):
+        score = (self._typed(key, ZSet) or {}).get(member)
+        return None if score is None else repr(score)
+
+    def cmd_zrangebyscore(self, conn, key, minimum, maximum, *options):
+        zset = self._typed(key, ZSet) or {}
+        return [member for member, score in sorted(zset.items(), key=lambda item: item[1]) if in_range(score, minimum, maximum)]
+
+    def cmd_zcount(self, conn, key, minimum, maximum):
+        return len(self.cmd_zrangebyscore(conn, key, minimum, maximum))
+
+    # Pub/sub
+    def cmd_publish(self, conn, channel, message):
+        receivers = set(self.channels.get(channel, ()))
+        for pattern, subscribers in self.patterns.items():
+            if fnmatch.fnmatchcase(channel.decode(), pattern.decode()):
+                for subscriber in subscribers:
+                    subscriber.send([b"pmessage", pattern, channel, message])
+        for subscriber in receivers:
+            subscriber.send([b"message", channel, message])
+        self.stats["published"] += 1
+        return len(receivers)
+
+    def _typed(self, key: bytes, kind: type, create: bool = False):
+        value = self.data.get(key)
+        if value is None:
+            if create:
+                value = self.data[key] = kind()
+            return value
+        if type(value) is not kind:
+            raise CommandError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def execute(self, conn: "Connection", args: List[bytes]) -> Any:
+        self.stats["commands"] += 1
+        name = args[0].decode().lower()
+        handler = getattr(self, f"cmd_{name}", None)
+        if handler is None:
+            return _Error(f"ERR unknown command '{name}'")
+        try:
+            return handler(conn, *args[1:])
+        except CommandError as e:
+            return _Error(str(e))
+        except (TypeError, ValueError) as e:
+            return _Error(f"ERR {name}: {str(e)}")
+
+
+class Connection:
+    """Client connection; MULTI queues commands, SUBSCRIBE switches it to pub/sub mode"""
+
+    def __init__(self, server: MockRedis, writer: asyncio.StreamWriter):
+        self.server = server
+        self.writer = writer
+        self.queued: Optional[List[List[bytes]]] = None
+        self.channels: Set[bytes] = set()
+        self.patterns: Set[bytes] = set()
+
+    def send(self, value: Any):
+        self.writer.write(encode(value))
+
+    def handle(self, args: List[bytes]):
+        name = args[0].decode().lower()
+
+        if name == "multi":
+            self.queued = []
+            return self.send(True)
+        if name == "exec":
+            queued, self.queued = self.queued or [], None
+            return self.send([self.server.execute(self, command) for command in queued])
+        if name == "discard":
+            self.queued = None
+            return self.send(True)
+        if self.queued is not None:
+            self.queued.append(args)
+            return self.writer.write(b"+QUEUED\r\n")
+
+        if name in ("subscribe", "psubscribe"):
+            registry = self.server.channels if name == "subscribe" else self.server.patterns
+            own = self.channels if name == "subscribe" else self.patterns
+            for channel in args[1:]:
+                registry.setdefault(channel, set()).add(self)
+                own.add(channel)
+                self.send([name.encode(), channel, len(self.channels) + len(self.patterns)])
+            return
+        if name in ("unsubscribe", "punsubscribe"):
+            registry = self.server.channels if name == "unsubscribe" else self.server.patterns
+            own = self.channels if name == "unsubscribe" else self.patterns
+            for channel in list(args[1:] or own):
+                registry.get(channel, set()).discard(self)
+                own.discard(channel)
+                self.send([name.encode(), channel, len(self.channels) + len(self.patterns)])
+            return
+        if name == "ping" and (self.channels or self.patterns):
+            return self.send([b"pong", args[1] if len(args) > 1 else b""])
+
+        self.send(self.server.execute(self, args))
+
+    def close(self):
+        for channel in self.channels:
+            self.server.channels.get(channel, set()).discard(self)
+        for pattern in self.patterns:
+            self.server.patterns.get(pattern, set()).discard(self)
+
+
+async def serve(config: MockRedisConfig = None) -> asyncio.AbstractServer:
+    config = config or MockRedisConfig()
+    server = MockRedis()
+
+    async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = Connection(server, writer)
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                if args:
+                    connection.handle(args)
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            connection.close()
+            writer.close()
+            log_debug("Mock Redis client disconnected", "MOCK_REDIS")
+
+    return await asyncio.start_server(handle_client, config.HOST, config.PORT)
+
+
+async def main():
+    config = MockRedisConfig()
+    server = await serve(config)
+    log_info(f"Mock Redis on {config.HOST}:{config.PORT}", "MOCK_REDIS")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,8 +2,6 @@ import { useState } from 'react';
 import { motion } from 'framer-motion';
 import { AnalysisResult } from '../types';
 import waterAnalysisApi from '../services/api';
-import ReactMarkdown from 'react-markdown';
-import remarkGfm from 'remark-gfm';
 import { 
   Download, 
   Eye, 
@@ -75,8 +73,11 @@ const ResultsPanel: React.FC<ResultsPanelProps> = ({ result, analysisId, onReset
         console.log('👁️ [ResultsPanel] Loading preview...');
       }
       
-      const preview = await waterAnalysisApi.getAnalysisPreview(analysisId);
-      setPreviewContent(preview.markdown);
+      const preview = await waterAnalysisApi.getAnalysisPreviewHtml(analysisId);
+      const knowledgeBase = preview.knowledgeBaseUrl
+        ? await waterAnalysisApi.getKnowledgeBaseHtml(preview.knowledgeBaseUrl)
+        : '';
+      setPreviewContent(knowledgeBase ? `${preview.html}<hr/>${knowledgeBase}` : preview.html);
       setShowPreview(true);
       
     } catch (error) {
@@ -217,22 +218,11 @@ const ResultsPanel: React.FC<ResultsPanelProps> = ({ result, analysisId, onReset
             </div>
             
             <div className="p-6 overflow-y-auto max-h-[70vh]">
-              <div className="prose prose-water-blue max-w-none">
-                <ReactMarkdown
-                  remarkPlugins={[remarkGfm]}
-                  components={{
-                    h1: ({ children }) => <h1 className="text-2xl font-bold text-water-blue-800 mb-4">{children}</h1>,
-                    h2: ({ children }) => <h2 className="text-xl font-semibold text-water-blue-700 mb-3">{children}</h2>,
-                    h3: ({ children }) => <h3 className="text-lg font-medium text-water-blue-600 mb-2">{children}</h3>,
-                    p: ({ children }) => <p className="text-gray-700 mb-4 leading-relaxed">{children}</p>,
-                    ul: ({ children }) => <ul className="list-disc pl-6 mb-4 space-y-1">{children}</ul>,
-                    ol: ({ children }) => <ol className="list-decimal pl-6 mb-4 space-y-1">{children}</ol>,
-                    li: ({ children }) => <li className="text-gray-700">{children}</li>,
-                  }}
-                >
-                  {previewContent}
-                </ReactMarkdown>
-              </div>
+              {/* HTML is rendered and sanitised by the backend */}
+              <div
+                className="prose prose-water-blue max-w-none [&_h1]:text-2xl [&_h1]:font-bold [&_h1]:text-water-blue-800 [&_h1]:mb-4 [&_h2]:text-xl [&_h2]:font-semibold [&_h2]:text-water-blue-700 [&_h2]:mb-3 [&_h3]:text-lg [&_h3]:font-medium [&_h3]:text-water-blue-600 [&_h3]:mb-2 [&_p]:text-gray-700 [&_p]:mb-4 [&_p]:leading-relaxed [&_ul]:list-disc [&_ul]:pl-6 [&_ul]:mb-4 [&_ol]:list-decimal [&_ol]:pl-6 [&_ol]:mb-4 [&_li]:text-gray-700 [&_hr]:my-6 [&_table]:mb-4 [&_th]:border [&_th]:px-2 [&_td]:border [&_td]:px-2"
+                dangerouslySetInnerHTML={{ __html: previewContent }}
+              />
             </div>
           </motion.div>
         </motion.div>
@@ -4,6 +4,7 @@ import {
   AnalysisStatus, 
   AnalysisResult, 
   AnalysisPreview, 
+  AnalysisPreviewHtml, 
   ApiError, 
   AnalysisWorkflow 
 } from '../types'
@@ -89,6 +90,44 @@ class WaterAnalysisApiService {
     });
   }
 
+  // Sanitised HTML preview (cached by the browser via ETag) plus the knowledge base URL from the Link header
+  async getAnalysisPreviewHtml(analysisId: string): Promise<AnalysisPreviewHtml> {
+    const response = await fetch(`${API_BASE_URL}/api/preview/${analysisId}/html`, {
+      method: 'GET',
+      headers: {
+        'Accept': 'text/html',
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    }
+
+    const link = response.headers.get('Link');
+    const match = link ? link.match(/<([^>]+)>/) : null;
+
+    return {
+      html: await response.text(),
+      knowledgeBaseUrl: match ? match[1] : undefined,
+    };
+  }
+
+  // Knowledge base HTML lives at an immutable URL, so repeated previews hit the browser cache
+  async getKnowledgeBaseHtml(knowledgeBaseUrl: string): Promise<string> {
+    const response = await fetch(`${API_BASE_URL}${knowledgeBaseUrl}`, {
+      method: 'GET',
+      headers: {
+        'Accept': 'text/html',
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    }
+
+    return response.text();
+  }
+
   async downloadAnalysisPDF(analysisId: string): Promise<Blob> {
     const url = `${API_BASE_URL}/api/download/${analysisId}`;
     
@@ -123,67 +162,95 @@ class WaterAnalysisApiService {
     }
   }
 
-  // Stream analysis workflow updates
+  // Stream analysis workflow updates, resuming with Last-Event-ID after a dropped connection
   async streamAnalysisWorkflow(
     analysisId: string,
     onUpdate: (update: AnalysisWorkflow) => void
   ): Promise<void> {
     const url = `${API_BASE_URL}/api/stream/${analysisId}`;
+    const maxReconnects = 5;
+    let lastEventId: string | null = null;
+    let finished = false;
     
     if (import.meta.env.VITE_TEST_ENV === 'true') {
       console.log('🌊 [Water API] Starting workflow stream for:', analysisId);
     }
 
-    try {
-      const response = await fetch(url, {
-        method: 'GET',
-        headers: {
+    let attempt = 0;
+    while (!finished) {
+      const resumedFrom = lastEventId;
+      try {
+        const headers: Record<string, string> = {
           'Accept': 'text/event-stream',
           'Cache-Control': 'no-cache',
-        },
-      });
+        };
+        if (lastEventId !== null) {
+          headers['Last-Event-ID'] = lastEventId;
+        }
 
-      if (!response.ok) {
-        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-      }
+        const response = await fetch(url, { method: 'GET', headers });
 
-      const reader = response.body?.getReader();
-      if (!reader) {
-        throw new Error('No response body reader available');
-      }
+        if (!response.ok) {
+          throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
 
-      const decoder = new TextDecoder();
-      let buffer = '';
+        const reader = response.body?.getReader();
+        if (!reader) {
+          throw new Error('No response body reader available');
+        }
 
-      while (true) {
-        const { done, value } = await reader.read();
-        if (done) break;
+        const decoder = new TextDecoder();
+        let buffer = '';
 
-        buffer += decoder.decode(value, { stream: true });
-        const lines = buffer.split('\n');
-        buffer = lines.pop() || '';
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
 
-        for (const line of lines) {
-          if (line.startsWith('data: ')) {
-            try {
-              const jsonStr = line.slice(6);
-              if (jsonStr.trim()) {
-                const update: AnalysisWorkflow = JSON.parse(jsonStr);
-                onUpdate(update);
-              }
-            } catch (error) {
-              if (import.meta.env.VITE_TEST_ENV === 'true') {
-                console.error('❌ [Water API] Error parsing workflow update:', error);
+          buffer += decoder.decode(value, { stream: true });
+          const lines = buffer.split('\n');
+          buffer = lines.pop() || '';
+
+          for (const line of lines) {
+            if (line.startsWith('id: ')) {
+              lastEventId = line.slice(4).trim();
+            } else if (line.startsWith('data: ')) {
+              try {
+                const jsonStr = line.slice(6);
+                if (jsonStr.trim()) {
+                  const update: AnalysisWorkflow = JSON.parse(jsonStr);
+                  if (update.status === 'error' || (update.step === 'complete' && update.status === 'completed')) {
+                    finished = true;
+                  }
+                  onUpdate(update);
+                }
+              } catch (error) {
+                if (import.meta.env.VITE_TEST_ENV === 'true') {
+                  console.error('❌ [Water API] Error parsing workflow update:', error);
+                }
               }
             }
           }
         }
+
+        if (!finished) {
+          // Closed before the final update (server drain or restart): resume with Last-Event-ID
+          throw new Error('Workflow stream closed before the analysis finished');
+        }
+      } catch (error) {
+        if (import.meta.env.VITE_TEST_ENV === 'true') {
+          console.error(`❌ [Water API] Workflow stream failed:`, error);
+        }
+        // A connection that delivered new events starts a fresh round of reconnects
+        if (lastEventId !== resumedFrom) {
+          attempt = 0;
+        }
+        if (attempt >= maxReconnects) {
+          throw error;
+        }
+        // Back off, then resume from the last received event
+        await new Promise(resolve => setTimeout(resolve, Math.min(1000 * 2 ** attempt, 8000)));
+        attempt++;
       }
-    } catch (error) {
-      if (import.meta.env.VITE_TEST_ENV === 'true') {
-        console.error(`❌ [Water API] Workflow stream failed:`, error);
-      }
-      throw error;
     }
   }
 
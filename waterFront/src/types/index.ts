@@ -18,6 +18,10 @@ export interface AnalysisStatus {
   startTime: Date;
   completedTime?: Date;
   error?: string;
+  queuePosition?: number;
+  etaSeconds?: number;
+  stageTimings?: Record<string, { start: number; end: number; duration: number }>;
+  criticalPath?: string[];
 }
 
 export interface AnalysisResult {
@@ -38,6 +42,13 @@ export interface AnalysisPreview {
     analysisDate: string;
     processingTime: number;
   };
+  htmlUrl?: string;
+  knowledgeBaseUrl?: string;
+}
+
+export interface AnalysisPreviewHtml {
+  html: string;
+  knowledgeBaseUrl?: string;
 }
 
 export interface ApiError {
@@ -73,4 +84,5 @@ export interface AnalysisWorkflow {
   message: string;
   progress: number;
   elapsedTime: number;
+  eventId?: number | null;
 } 
\ No newline at end of file